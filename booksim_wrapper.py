@@ -1,10 +1,15 @@
 # Import python libraries
+import sys
 import math
 import copy
 import subprocess
+import numpy as np
 
 # Import RapidChiplet files
 import helpers as hlp
+import ici_core as icc
+import trace_store as trs
+import compact_routing_table as crt
 
 # Export the BookSim configuration file
 def export_booksim_config(inputs, run_identifier, load):
@@ -81,8 +86,9 @@ def export_booksim_topology(inputs, intermediates, run_identifier):
 	topology = inputs["topology"]
 	n_chiplets = len(placement["chiplets"])
 	# Compute intermediates
-	required_intermediates = ["link_latencies"]
+	required_intermediates = ["ici_core","link_latencies"]
 	hlp.compute_required_intermediates(inputs, intermediates, required_intermediates)
+	ici_core = intermediates["ici_core"]
 	link_latencies = intermediates["link_latencies"]
 	# Load or compute additional information 
 	ici_graph = hlp.construct_ici_graph(chiplets, placement, topology)
@@ -109,7 +115,7 @@ def export_booksim_topology(inputs, intermediates, run_identifier):
 		for (cnt, (otype, oid)) in enumerate(sorted(adj_list[("chiplet", cid)], key=lambda x: (0 if x[0] == "chiplet" else 1, x[1]))):
 			ophy_latency = technologies[chiplet["technology"]]["phy_latency"] if otype == "chiplet" else 0
 			bs_oid = oid if otype == "chiplet" else n_chiplets + oid
-			lat = phy_latency + link_latencies[(("chiplet",cid),(otype,oid))] + ophy_latency
+			lat = phy_latency + link_latencies[icc.get_link_id(ici_core, ("chiplet",cid), (otype,oid))] + ophy_latency
 			line += " router %d %d" % (bs_oid, lat)
 			port_map_entry[(otype,oid)] = chiplet["unit_count"] + cnt
 		topology_lines.append(line)
@@ -123,7 +129,7 @@ def export_booksim_topology(inputs, intermediates, run_identifier):
 		for (cnt, (otype, oid)) in enumerate(sorted(adj_list[("irouter",rid)], key=lambda x: (0 if x[0] == "chiplet" else 1, x[1]))):
 			ophy_latency = technologies[chiplet["technology"]]["phy_latency"] if otype == "chiplet" else 0
 			bs_oid = oid if otype == "chiplet" else n_chiplets + oid
-			lat = link_latencies[(("irouter",rid),(otype,oid))] + ophy_latency
+			lat = link_latencies[icc.get_link_id(ici_core, ("irouter",rid), (otype,oid))] + ophy_latency
 			line += " router %d %d" % (bs_oid, lat)
 			port_map_entry[(otype,oid)] = cnt
 		topology_lines.append(line)
@@ -150,11 +156,18 @@ def export_routing_table(inputs, intermediates, port_map, run_identifier):
 	hlp.read_required_inputs(inputs, required_inputs)
 	chiplets = inputs["chiplets"]
 	placement = inputs["placement"]
-	routing_table_ = inputs["routing_table"]
-	routing_table_type = routing_table_["type"]
-	routing_table = routing_table_["table"]
+	routing_table = crt.as_compact_routing_table(inputs["routing_table"])
+	routing_table_type = routing_table.routing_table_type
 	n_chiplets = len(placement["chiplets"])
 	n_irouters = len(placement["interposer_routers"])
+	# Next hops as lists: next_hops[nid][dst] ("default") or entries[nid * c + dst] = [(prev, next), ...] ("extended")
+	nodes = [routing_table.get_node(nid) for nid in range(routing_table.n_nodes)]
+	if routing_table_type == "default":
+		next_hops = routing_table.next_hops.tolist()
+	elif routing_table_type == "extended":
+		entry_ptr = routing_table.entry_ptr.tolist()
+		entries = list(zip(routing_table.entry_prev.tolist(), routing_table.entry_next.tolist()))
+		get_entries = lambda nid, dst: entries[entry_ptr[nid * routing_table.n_chiplets + dst]:entry_ptr[nid * routing_table.n_chiplets + dst + 1]]
 	# Units in RapidChiplet correspond to nodes in BookSim. They are the destination of packets in BookSim
 	# This map maps unit-ids to the chiplet-id that they are part of
 	unit_id_to_chiplet_id = {}
@@ -189,21 +202,22 @@ def export_routing_table(inputs, intermediates, port_map, run_identifier):
 			else:
 				# Default routing table type: Only one next hop
 				if routing_table_type == "default":
-					(next_type, next_id) = routing_table[("chiplet",cid)][("chiplet",units_partent_cid)]
+					(next_type, next_id) = nodes[next_hops[cid][units_partent_cid]]
 					sub_table[uid] = port_map[("chiplet",cid)][next_type,next_id]
 				# Extended routing table type: Next-hop depends on input port
 				elif routing_table_type == "extended":
 					sub_sub_table = {}
+					cur_entries = get_entries(cid, units_partent_cid)
 					# Routing for packets that are injected at the current chiplet
 					for local_unit in range(chiplets[placement["chiplets"][cid]["name"]]["unit_count"]):
 						prev_port = port_map[("chiplet",cid)][("unit",next_local_unit_id + local_unit)]
-						(next_type, next_id) = routing_table[("chiplet",cid)][("chiplet",units_partent_cid)]["-1"]
+						(next_type, next_id) = nodes[dict(cur_entries)[-1]]
 						sub_sub_table[prev_port] = port_map[("chiplet",cid)][next_type,next_id]
 					# Routing for packets that are not injected at the current chiplet
-					for prev in routing_table[("chiplet",cid)][("chiplet",units_partent_cid)].keys():
-						if prev != "-1":
-							prev_port = port_map[("chiplet",cid)][prev]
-							(next_type, next_id) = routing_table[("chiplet",cid)][("chiplet",units_partent_cid)][prev]
+					for (prev, nxt) in cur_entries:
+						if prev != -1:
+							prev_port = port_map[("chiplet",cid)][nodes[prev]]
+							(next_type, next_id) = nodes[nxt]
 							sub_sub_table[prev_port] = port_map[("chiplet",cid)][next_type,next_id]
 					sub_table[uid] = sub_sub_table
 				else:
@@ -215,18 +229,20 @@ def export_routing_table(inputs, intermediates, port_map, run_identifier):
 	# Add all interposer-routers to the table
 	for rid in range(n_irouters):
 		sub_table = {}
+		nid = crt.get_node_id(routing_table, ("irouter",rid))
 		# Add all units/nodes to the table
 		for	uid in range(n_units):
 			# Default routing table type: Only one next hop
 			if routing_table_type == "default":
-				(next_type, next_id) = routing_table[("irouter",rid)][("chiplet",unit_id_to_chiplet_id[uid])]
+				(next_type, next_id) = nodes[next_hops[nid][unit_id_to_chiplet_id[uid]]]
 				sub_table[uid] = port_map[("irouter",rid)][next_type,next_id]
 			# Extended routing table type: Next-hop depends on input port
 			elif routing_table_type == "extended":
 				sub_sub_table = {}
+				cur_entries = dict(get_entries(nid, unit_id_to_chiplet_id[uid]))
 				for (prev_type, prev_id) in port_map[("irouter",rid)].keys():
 					prev_port = port_map[("irouter",rid)][(prev_type,prev_id)]
-					(next_type, next_id) = routing_table[("irouter",rid)][("chiplet",unit_id_to_chiplet_id[uid])][(prev_type,prev_id)]
+					(next_type, next_id) = nodes[cur_entries[crt.get_node_id(routing_table, (prev_type,prev_id))]]
 					sub_sub_table[prev_port] = port_map[("irouter",rid)][next_type,next_id]
 				sub_table[uid] = sub_sub_table
 			else:
@@ -273,34 +289,35 @@ def export_trace(inputs, intermediates, run_identifier):
 	chiplets = inputs["chiplets"]
 	placement = inputs["placement"]
 	trace = inputs["trace"]
-	# Construct a map that maps (chiplet-id, unit-id)-pairs to the corresponding BookSim node-id
-	cid_and_uid_to_bsnid = {}
-	n_nodes = 0
-	for (cid, chiplet_desc) in enumerate(placement["chiplets"]):
-		chiplet = chiplets[chiplet_desc["name"]]
-		for uid in range(chiplet["unit_count"]):
-			cid_and_uid_to_bsnid[(cid,uid)] = n_nodes 
-			n_nodes += 1
-	# Construct the trace file for BookSim
-	bs_trace = []
-	num_deps = {packet["id"] : 0 for packet in trace}
-	for packet in trace:	
-		bs_packet = {}
-		bs_packet["id"] = packet["id"]
-		bs_packet["cycle"] = packet["injection_cycle"]
-		bs_packet["src"] = cid_and_uid_to_bsnid[(packet["source_chiplet"],packet["source_unit"])]
-		bs_packet["dst"] = cid_and_uid_to_bsnid[(packet["destination_chiplet"],packet["destination_unit"])]
-		bs_packet["rev_deps"] = packet["reverse_dependencies"]
-		bs_packet["num_flits"] = packet["size_in_flits"]
-		for rev_dep in packet["reverse_dependencies"]:
-			num_deps[rev_dep] += 1
-		bs_trace.append(bs_packet)
-	# Add the number of dependencies per packet
-	for packet in bs_trace:
-		packet["num_deps"] = num_deps[packet["id"]]
+	# The BookSim node-id of a (chiplet-id, unit-id)-pair is the id of the first node of the chiplet plus the unit-id
+	unit_counts = [chiplets[chiplet_desc["name"]]["unit_count"] for chiplet_desc in placement["chiplets"]]
+	first_bsnid = np.concatenate(([0], np.cumsum(unit_counts)[:-1])).astype(np.int64)
+	# Number of dependencies per packet
+	num_deps = trs.get_dependency_counts(trace)
+	# Construct the trace file for BookSim chunk by chunk
+	def get_bs_packets():
+		for (start, packets, offsets, rev_deps) in trs.iterate_trace_chunks(trace):
+			ids = packets["id"].tolist()
+			cycles = packets["injection_cycle"].tolist()
+			srcs = (first_bsnid[packets["source_chiplet"]] + packets["source_unit"]).tolist()
+			dsts = (first_bsnid[packets["destination_chiplet"]] + packets["destination_unit"]).tolist()
+			num_flits = packets["size_in_flits"].tolist()
+			chunk_num_deps = num_deps[start:start + len(packets)].tolist()
+			rev_deps = rev_deps.tolist()
+			offsets = offsets.tolist()
+			for i in range(len(packets)):
+				bs_packet = {}
+				bs_packet["id"] = ids[i]
+				bs_packet["cycle"] = cycles[i]
+				bs_packet["src"] = srcs[i]
+				bs_packet["dst"] = dsts[i]
+				bs_packet["rev_deps"] = rev_deps[offsets[i]:offsets[i + 1]]
+				bs_packet["num_flits"] = num_flits[i]
+				bs_packet["num_deps"] = chunk_num_deps[i]
+				yield bs_packet
 	# Store the file
 	save_path = "booksim2/src/rc_traces/%s.json" % run_identifier
-	hlp.write_json(save_path, bs_trace)
+	hlp.write_json_list(save_path, get_bs_packets())
 
 # Print BookSim errors
 def print_booksim_error_if_applicable(out, err):
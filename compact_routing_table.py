@@ -0,0 +1,271 @@
+# Import python libraries
+import sys
+import argparse
+import numpy as np
+import collections.abc
+
+# Import RapidChiplet files
+import helpers as hlp
+
+# Compact routing table: The next hops are stored in integer arrays instead of nested dictionaries. Nodes have the
+# same ids as in the ICI core, i.e., chiplets have the ids 0 to c-1 and interposer-routers the ids c to c+r-1.
+# Only chiplets can be destinations.
+# - "default" routing tables: next_hops[node, destination] is the id of the next node
+# - "extended" routing tables: The entries of (node, destination) are entry_prev[p:q] -> entry_next[p:q] with
+#   p = entry_ptr[node * c + destination] and q = entry_ptr[node * c + destination + 1]. The previous node of packets
+#   that are injected at the node is -1.
+# The table can be used like the dictionary {"type" : <type>, "table" : <table>} of the JSON format (see TableView).
+
+# Next hop of entries that are None (no route) and of entries that are not present in the table
+no_route = -1
+no_entry = -2
+
+class CompactRoutingTable:
+
+	def __init__(self, routing_table_type, n_chiplets, n_irouters, has_node, next_hops = None, has_destination = None,
+				 entry_ptr = None, entry_prev = None, entry_next = None):
+		self.routing_table_type = routing_table_type
+		self.n_chiplets = n_chiplets
+		self.n_irouters = n_irouters
+		self.n_nodes = n_chiplets + n_irouters
+		# Whether a node has an entry in the table
+		self.has_node = has_node
+		# "default" routing tables
+		self.next_hops = next_hops
+		# "extended" routing tables: Whether (node, destination) has an entry in the table, and the entries in CSR format
+		self.has_destination = has_destination
+		self.entry_ptr = entry_ptr
+		self.entry_prev = entry_prev
+		self.entry_next = entry_next
+
+	################################################################################################################
+	# Node labels
+	################################################################################################################
+
+	# Label of a node, e.g., (chiplet, 0) or (irouter, 7)
+	def get_node(self, nid):
+		return ("chiplet", nid) if nid < self.n_chiplets else ("irouter", nid - self.n_chiplets)
+
+	# Ids of all nodes of this table in another indexing of the nodes (e.g., the node_index of the ICI core).
+	# Nodes that do not exist in the other indexing have the id -1.
+	def map_node_ids(self, node_index):
+		return np.array([node_index.get(self.get_node(nid), -1) for nid in range(self.n_nodes)], dtype = np.int64)
+
+	################################################################################################################
+	# Dictionary-like view (backward compatibility with the JSON format)
+	################################################################################################################
+
+	def __getitem__(self, key):
+		if key == "type":
+			return self.routing_table_type
+		elif key == "table":
+			return TableView(self)
+		raise KeyError(key)
+
+	def __contains__(self, key):
+		return key in ["type", "table"]
+
+	def get(self, key, default = None):
+		return self[key] if key in self else default
+
+	def keys(self):
+		return ["type", "table"]
+
+	# Convert to the dictionary of the JSON format
+	def to_dict(self):
+		table = TableView(self)
+		if self.routing_table_type == "default":
+			return {"type" : "default", "table" : {node : dict(sub_table) for (node, sub_table) in table.items()}}
+		return {"type" : "extended", "table" : {node : {dst : sub_table[dst] for dst in sub_table} for (node, sub_table) in table.items()}}
+
+# Read-only view of a compact routing table that behaves like the "table" of the JSON format
+class TableView(collections.abc.Mapping):
+
+	def __init__(self, routing_table):
+		self.routing_table = routing_table
+
+	def __getitem__(self, node):
+		nid = get_node_id(self.routing_table, node)
+		if nid < 0 or not self.routing_table.has_node[nid]:
+			raise KeyError(node)
+		return NodeView(self.routing_table, nid)
+
+	def __iter__(self):
+		return (self.routing_table.get_node(nid) for nid in np.flatnonzero(self.routing_table.has_node).tolist())
+
+	def __len__(self):
+		return int(np.count_nonzero(self.routing_table.has_node))
+
+# Read-only view of the entries of one node: {destination -> next hop} or {destination -> {previous hop -> next hop}}
+class NodeView(collections.abc.Mapping):
+
+	def __init__(self, routing_table, nid):
+		self.routing_table = routing_table
+		self.nid = nid
+
+	def get_destinations(self):
+		routing_table = self.routing_table
+		if routing_table.routing_table_type == "default":
+			return np.flatnonzero(routing_table.next_hops[self.nid] != no_entry)
+		return np.flatnonzero(routing_table.has_destination[self.nid])
+
+	def __getitem__(self, dst):
+		routing_table = self.routing_table
+		if not (isinstance(dst, tuple) and len(dst) == 2 and dst[0] == "chiplet" and 0 <= dst[1] < routing_table.n_chiplets):
+			raise KeyError(dst)
+		if routing_table.routing_table_type == "default":
+			nxt = int(routing_table.next_hops[self.nid, dst[1]])
+			if nxt == no_entry:
+				raise KeyError(dst)
+			return routing_table.get_node(nxt) if nxt >= 0 else None
+		if not routing_table.has_destination[self.nid, dst[1]]:
+			raise KeyError(dst)
+		(start, end) = routing_table.entry_ptr[self.nid * routing_table.n_chiplets + dst[1]:][:2].tolist()
+		prevs = routing_table.entry_prev[start:end].tolist()
+		nexts = routing_table.entry_next[start:end].tolist()
+		return {(routing_table.get_node(prv) if prv >= 0 else "-1") : (routing_table.get_node(nxt) if nxt >= 0 else None) for (prv, nxt) in zip(prevs, nexts)}
+
+	def __iter__(self):
+		return (("chiplet", dst) for dst in self.get_destinations().tolist())
+
+	def __len__(self):
+		return len(self.get_destinations())
+
+# Id of a node given as label (-1 if the node does not exist)
+def get_node_id(routing_table, node):
+	if not (isinstance(node, (tuple, list)) and len(node) == 2 and isinstance(node[1], int) and node[1] >= 0):
+		return -1
+	if node[0] == "chiplet" and node[1] < routing_table.n_chiplets:
+		return node[1]
+	if node[0] == "irouter" and node[1] < routing_table.n_irouters:
+		return routing_table.n_chiplets + node[1]
+	return -1
+
+# Smallest integer type that can store node ids (and the special values no_route and no_entry)
+def get_node_id_dtype(n_nodes):
+	return np.int16 if n_nodes <= np.iinfo(np.int16).max else np.int32
+
+# Convert a routing table in the JSON format ({"type" : <type>, "table" : <table>}) to a compact routing table.
+# The number of chiplets and interposer-routers is derived from the largest ids in the table.
+def convert_routing_table(routing_table_):
+	routing_table_type = routing_table_["type"]
+	table = routing_table_["table"]
+	if routing_table_type not in ["default", "extended"]:
+		print("ERROR: Unknown routing table type %s" % routing_table_type)
+		sys.exit(1)
+	extended = routing_table_type == "extended"
+	# Collect the labels of all nodes in the table
+	# (next hops can be lists if the table was read from JSON, these are converted to tuples before they are hashed)
+	labels = set(table)
+	destinations = set()
+	for sub_table in table.values():
+		destinations.update(sub_table)
+		if not extended:
+			labels.update(tuple(nxt) if isinstance(nxt, list) else nxt for nxt in sub_table.values())
+		for value in (sub_table.values() if extended else []):
+			if value is not None:
+				labels.update(value)
+				labels.update(tuple(nxt) if isinstance(nxt, list) else nxt for nxt in value.values())
+	for label in [None, "-1", -1]:
+		labels.discard(label)
+	for label in labels | destinations:
+		if not (isinstance(label, tuple) and len(label) == 2 and label[0] in ["chiplet", "irouter"] and isinstance(label[1], int) and label[1] >= 0):
+			print("ERROR: Invalid node %s in the routing table." % str(label))
+			sys.exit(1)
+	for dst in destinations:
+		if dst[0] != "chiplet":
+			print("ERROR: Invalid destination %s in the routing table. Only chiplets can be destinations." % str(dst))
+			sys.exit(1)
+	n_chiplets = max([label[1] + 1 for label in labels | destinations if label[0] == "chiplet"], default = 0)
+	n_irouters = max([label[1] + 1 for label in labels if label[0] == "irouter"], default = 0)
+	n_nodes = n_chiplets + n_irouters
+	node_ids = {label : (label[1] if label[0] == "chiplet" else n_chiplets + label[1]) for label in labels}
+	node_ids["-1"] = node_ids[-1] = -1
+	dtype = get_node_id_dtype(n_nodes)
+	has_node = np.zeros(n_nodes, dtype = bool)
+	# Default routing table: One next hop per (node, destination)
+	if not extended:
+		next_hops = np.full((n_nodes, n_chiplets), no_entry, dtype = dtype)
+		for (node, sub_table) in table.items():
+			nid = node_ids[tuple(node)]
+			has_node[nid] = True
+			dsts = np.fromiter((dst[1] for dst in sub_table), dtype = np.int64, count = len(sub_table))
+			nexts = np.fromiter((node_ids[tuple(nxt)] if nxt is not None else no_route for nxt in sub_table.values()), dtype = np.int64, count = len(sub_table))
+			next_hops[nid, dsts] = nexts
+		return CompactRoutingTable("default", n_chiplets, n_irouters, has_node, next_hops = next_hops)
+	# Extended routing table: Entries (previous hop -> next hop) per (node, destination)
+	has_destination = np.zeros((n_nodes, n_chiplets), dtype = bool)
+	(pairs, prevs, nexts) = ([], [], [])
+	for (node, sub_table) in table.items():
+		nid = node_ids[tuple(node)]
+		has_node[nid] = True
+		for (dst, entries) in sub_table.items():
+			has_destination[nid, dst[1]] = True
+			for (prv, nxt) in (entries.items() if entries is not None else []):
+				pairs.append(nid * n_chiplets + dst[1])
+				prevs.append(node_ids[prv if isinstance(prv, (str, int)) else tuple(prv)])
+				nexts.append(node_ids[tuple(nxt)] if nxt is not None else no_route)
+	# Sort the entries by (node, destination), the order of the entries of one (node, destination) is kept
+	pairs = np.array(pairs, dtype = np.int64)
+	order = np.argsort(pairs, kind = "stable")
+	entry_ptr = np.concatenate(([0], np.cumsum(np.bincount(pairs, minlength = n_nodes * n_chiplets)))).astype(np.int64)
+	entry_prev = np.array(prevs, dtype = dtype)[order]
+	entry_next = np.array(nexts, dtype = dtype)[order]
+	return CompactRoutingTable("extended", n_chiplets, n_irouters, has_node, has_destination = has_destination,
+							   entry_ptr = entry_ptr, entry_prev = entry_prev, entry_next = entry_next)
+
+# Return a routing table as compact routing table (routing tables in the JSON format are converted)
+def as_compact_routing_table(routing_table_):
+	if isinstance(routing_table_, CompactRoutingTable):
+		return routing_table_
+	return convert_routing_table(routing_table_)
+
+# Arrays of a compact routing table in the binary format
+def get_routing_table_arrays(routing_table):
+	arrays = {
+		"type" : np.array(routing_table.routing_table_type),
+		"n_chiplets" : np.array(routing_table.n_chiplets),
+		"n_irouters" : np.array(routing_table.n_irouters),
+		"has_node" : routing_table.has_node,
+	}
+	if routing_table.routing_table_type == "default":
+		arrays["next_hops"] = routing_table.next_hops
+	else:
+		for name in ["has_destination", "entry_ptr", "entry_prev", "entry_next"]:
+			arrays[name] = getattr(routing_table, name)
+	return arrays
+
+# Write a routing table: Binary format (NumPy .npz file) if the filename ends with .npz, JSON format otherwise
+def write_routing_table(filename, routing_table_):
+	if filename.endswith(".npz"):
+		file = open(filename, "wb")
+		np.savez(file, **get_routing_table_arrays(as_compact_routing_table(routing_table_)))
+		file.close()
+	else:
+		hlp.write_json(filename, routing_table_.to_dict() if isinstance(routing_table_, CompactRoutingTable) else routing_table_)
+
+# Read a routing table in the binary format
+def read_binary_routing_table(filename):
+	with np.load(filename, allow_pickle = False) as arrays:
+		if "type" not in arrays.files or "has_node" not in arrays.files:
+			print("ERROR: \"%s\" is not a routing table in the binary format." % filename)
+			sys.exit(1)
+		routing_table_type = str(arrays["type"])
+		(n_chiplets, n_irouters) = (int(arrays["n_chiplets"]), int(arrays["n_irouters"]))
+		names = ["next_hops"] if routing_table_type == "default" else ["has_destination", "entry_ptr", "entry_prev", "entry_next"]
+		return CompactRoutingTable(routing_table_type, n_chiplets, n_irouters, arrays["has_node"], **{name : arrays[name] for name in names})
+
+# Read a routing table (binary format, JSON format, or section of a design bundle) as compact routing table
+def read_routing_table(filename):
+	if filename.endswith(".npz"):
+		return read_binary_routing_table(filename)
+	return convert_routing_table(hlp.read_input(filename))
+
+if __name__ == "__main__":
+	# Read command line arguments
+	parser = argparse.ArgumentParser()
+	parser.add_argument("-if", "--input_file", required = True, help = "Path to the \"routing_table\" input file (JSON or binary format)")
+	parser.add_argument("-of", "--output_file", required = True, help = "Path to the converted routing table (binary format if it ends with .npz, JSON format otherwise)")
+	args = parser.parse_args()
+	# Convert the routing table
+	write_routing_table(args.output_file, read_routing_table(args.input_file))
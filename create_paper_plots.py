@@ -1,5 +1,4 @@
 # Python modules
-import os
 import sys
 import argparse
 import matplotlib.pyplot as plt
@@ -9,13 +8,31 @@ import matplotlib.ticker as mtick
 import helpers as hlp
 import global_config as cfg
 import run_experiment as re 
+import results_database as rdb
 
-def read_results(prefix, suffix, n_units):
+# Parts of the evaluation (experiments) and the metric that is read from each part
+evaluation_parts = {"latency" : "latency", "throughput" : "throughput", "booksim" : "booksim_simulation", "links" : "link_summary"}
+
+def read_evaluation_results(database, experiment_name):
+	# Read the results of all parts of the evaluation (one query per part), indexed by (topology, scale, traffic)
+	results = {}
+	for (part, metric) in evaluation_parts.items():
+		results[part] = {}
+		for run in rdb.read_runs(database, "%s_%s" % (experiment_name, part), metrics = [metric]):
+			params = run["parameters"]
+			results[part][(params["topology"], params["grid_scale"], params["traffic_pattern"])] = run["results"]
+	return results
+
+def read_results(results, key, n_units):
 	data = {}
-	results_lat = hlp.read_json("results/%slatency%s.json" % (prefix, suffix))
-	results_tp = hlp.read_json("results/%sthroughput%s.json" % (prefix, suffix))
-	results_bs = hlp.read_json("results/%sbooksim%s.json" % (prefix, suffix))
-	results_link = hlp.read_json("results/%slinks%s.json" % (prefix, suffix))
+	for part in evaluation_parts:
+		if key not in results[part]:
+			print("ERROR: The results database does not contain the results of \"%s\" for %s" % (part, "-".join(key)))
+			sys.exit(1)
+	results_lat = results["latency"][key]
+	results_tp = results["throughput"][key]
+	results_bs = results["booksim"][key]
+	results_link = results["links"][key]
 	data["latency"] = results_lat["latency"]["avg"]
 	data["throughput"] = results_tp["throughput"]["aggregate_throughput"]
 	data["bs_latency"] = results_bs["booksim_simulation"]["0.001"]["packet_latency"]["avg"]
@@ -48,16 +65,17 @@ def create_evaluation_plot():
 	scales = ranged_params["grid_scale"]
 	topologies = ranged_params["topology"]
 	traffics = ranged_params["traffic_pattern"]
-	# Create a list of files that contain the results needed for the accuracy plot
+	# Read the results needed for the accuracy plot from the results database
+	database = rdb.open_results_database()
+	results = read_evaluation_results(database, experiment_name)
+	database.close()
 	data = []
 	for topology in topologies:
 		for scale in scales:
 			for traffic in traffics:
-				prefix = experiment_name + "_"
-				suffix = "-%s-%s-%s" % (topology, scale, traffic)
 				n_chiplets = int(scale.split("x")[0]) * int(scale.split("x")[1])
 				n_units = n_chiplets * units_per_chiplet
-				entry = read_results(prefix, suffix, n_units)
+				entry = read_results(results, (topology, scale, traffic), n_units)
 				entry["topology"] = topology
 				entry["scale"] = scale
 				entry["traffic"] = traffic
@@ -146,16 +164,17 @@ def create_extended_evaluation_plot():
 	scales = ranged_params["grid_scale"]
 	topologies = ranged_params["topology"]
 	traffics = ranged_params["traffic_pattern"]
-	# Create a list of files that contain the results needed for the accuracy plot
+	# Read the results needed for the accuracy plot from the results database
+	database = rdb.open_results_database()
+	results = read_evaluation_results(database, experiment_name)
+	database.close()
 	data = []
 	for topology in topologies:
 		for scale in scales:
 			for traffic in traffics:
-				prefix = experiment_name + "_"
-				suffix = "-%s-%s-%s" % (topology, scale, traffic)
 				n_chiplets = int(scale.split("x")[0]) * int(scale.split("x")[1])
 				n_units = n_chiplets * units_per_chiplet
-				entry = read_results(prefix, suffix, n_units)
+				entry = read_results(results, (topology, scale, traffic), n_units)
 				entry["topology"] = topology
 				entry["scale"] = scale
 				entry["traffic"] = traffic
@@ -233,16 +252,18 @@ def create_extended_evaluation_plot():
 
 def create_case_study_plot():
 	data = []
-	# Read all files in the results directory
-	for file in os.listdir("results"):
-		if file.startswith("case_study") and file.endswith(".json"):
-			results = hlp.read_json("results/%s" % file)
-			lat = results["latency"]["avg"]
-			tp = results["throughput"]["aggregate_throughput"] * 1e-3	# bits/cycle to kbits/cycle
-			area = results["area_summary"]["total_chiplet_area"] * 1e-2	# mm^2 to cm^2
-			config = file.split(".")[0].split("-")[1:]
-			entry = {"latency": lat, "throughput": tp, "area": area, "config": config}
-			data.append(entry)
+	# Read all runs of the case study from the results database
+	database = rdb.open_results_database()
+	runs = rdb.read_runs(database, "case_study", metrics = ["latency", "throughput", "area_summary"])
+	database.close()
+	for run in runs:
+		results = run["results"]
+		lat = results["latency"]["avg"]
+		tp = results["throughput"]["aggregate_throughput"] * 1e-3	# bits/cycle to kbits/cycle
+		area = results["area_summary"]["total_chiplet_area"] * 1e-2	# mm^2 to cm^2
+		config = [run["parameters"]["shg_sr"], run["parameters"]["shg_sc"]]
+		entry = {"latency": lat, "throughput": tp, "area": area, "config": config}
+		data.append(entry)
 	print("Total number of points: %d" % len(data))
 	# Remove duplicates and close-to-duplicates since 65k points leads to a too large PDF
 	unique_points = []
@@ -270,9 +291,9 @@ def create_case_study_plot():
 	mesh = None
 	flattened_bf = None
 	for x in data:
-		if x["config"] == ["_","_"]:
+		if x["config"] == [[], []]:
 			mesh = x
-		elif x["config"] == ["2_3_4_5_6_7_8_9","2_3_4_5_6_7_8_9"]:
+		elif x["config"] == [[2, 3, 4, 5, 6, 7, 8, 9], [2, 3, 4, 5, 6, 7, 8, 9]]:
 			flattened_bf = x
 	col = cmap((mesh["area"] - min_area) / (max_area - min_area))
 	ax.scatter(mesh["latency"], mesh["throughput"], s=15, marker = "*", zorder=4, color = col)
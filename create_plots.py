@@ -6,6 +6,7 @@ import matplotlib.pyplot as plt
 
 # RapidChiplet modules
 import helpers as hlp
+import results_database as rdb
 
 def create_latency_vs_load_plot(results):
 	# Verify that the results file contains the necessary information
@@ -29,12 +30,28 @@ def create_latency_vs_load_plot(results):
 
 if __name__ == "__main__":
 	parser = argparse.ArgumentParser()
-	parser.add_argument("-rf", "--results_file", type=str, help="Results file to plot", required=True)
+	parser.add_argument("-rf", "--results_file", type=str, help="Results file to plot")
+	parser.add_argument("-e", "--experiment", type=str, help="Name of the experiment whose run is plotted (read from the results database)")
+	parser.add_argument("-rn", "--run_name", type=str, help="Name of the run to plot (read from the results database)")
+	parser.add_argument("-db", "--database", type=str, default=rdb.results_database_file, help="Path to the results database (default: %s)" % rdb.results_database_file)
 	parser.add_argument("-pt", "--plot_type", type=str, help="Type of plot to create", required=True)
+	parser.add_argument("-m", "--metric", type=str, default="booksim_simulation", help="Metric to plot the latency-vs-load curve of (booksim_simulation or latency_under_load)")
 	args = parser.parse_args()
-	results = hlp.read_json(args.results_file)
+	# Read the results from a results file or from the results database
+	if args.results_file is not None:
+		results = hlp.read_json(args.results_file)
+	elif args.experiment is not None and args.run_name is not None:
+		database = rdb.open_results_database(args.database)
+		results = rdb.read_run_results(database, args.experiment, args.run_name)
+		database.close()
+		if results is None:
+			print("ERROR: The results database does not contain the run \"%s\" of the experiment \"%s\"" % (args.run_name, args.experiment))
+			sys.exit(1)
+	else:
+		print("ERROR: Either a results file (-rf) or an experiment and run name (-e and -rn) are required")
+		sys.exit(1)
 	if args.plot_type == "latency_vs_load":
-		create_latency_vs_load_plot(results)
+		create_latency_vs_load_plot({"booksim_simulation" : results[args.metric]} if args.metric in results else results)
 	else:	
 		print("Invalid plot type \"%s\". Valid plot types are: latency_vs_load" % args.plot_type)
 
@@ -0,0 +1,238 @@
+# Import python libraries
+import os
+import sys
+import json
+import argparse
+import itertools
+import numpy as np
+
+# Import RapidChiplet files
+import helpers as hlp
+
+# Binary design bundle: All inputs of a design in a single NumPy .npz file. Every input is stored as a section that
+# consists of a schema (JSON string stored as "<section>/schema") and typed arrays:
+# - Dictionaries with tuple keys (routing tables, traffic) are stored as tables: The keys of each level of nesting
+#   and the leaf values are stored column-wise, the nesting is stored as the number of entries per dictionary.
+# - Lists of uniform entries (e.g., the links in the topology or the chiplets in the placement) are stored column-wise.
+# - Dictionaries with string keys are stored entry by entry, small or irregular values are stored in the schema.
+# Columns are typed by the signature of the entries, e.g., ("t", "s", "i") for ("chiplet", 3). Entries with different
+# signatures in the same column are stored as separate groups, i.e., the conversion is lossless.
+# Sections are only read when requested; reading a section only loads the arrays of that section.
+
+# Lists and dictionaries with fewer entries than this are stored in the schema instead of as arrays
+bundle_min_array_length = 16
+
+# Signature of a value that can be stored column-wise (None if the value can not be stored column-wise)
+def get_signature(value):
+	if value is None:
+		return "n"
+	if isinstance(value, bool):
+		return "b"
+	if isinstance(value, int):
+		return "i"
+	if isinstance(value, float):
+		return "f"
+	if isinstance(value, str):
+		return "s"
+	if isinstance(value, tuple):
+		signatures = tuple(get_signature(x) for x in value)
+		return None if any(s is None for s in signatures) else ("t",) + signatures
+	if isinstance(value, dict) and all(isinstance(key, str) for key in value):
+		signatures = tuple((key, get_signature(x)) for (key, x) in value.items())
+		return None if any(s is None for (_, s) in signatures) else ("d",) + signatures
+	return None
+
+# Types of the columns (one per leaf, in order) of values with the given signature
+def get_column_types(signature):
+	if isinstance(signature, str):
+		return [] if signature == "n" else [signature]
+	if signature[0] == "t":
+		return [t for s in signature[1:] for t in get_column_types(s)]
+	return [t for (_, s) in signature[1:] for t in get_column_types(s)]
+
+# Split values with the same signature into one list per leaf
+def get_columns(values, signature, columns):
+	if isinstance(signature, str):
+		if signature != "n":
+			columns.append(values)
+	elif signature[0] == "t":
+		parts = list(zip(*values)) if len(values) > 0 else [()] * (len(signature) - 1)
+		for (part, s) in zip(parts, signature[1:]):
+			get_columns(part, s, columns)
+	else:
+		for (key, s) in signature[1:]:
+			get_columns([value[key] for value in values], s, columns)
+
+# Inverse of get_columns: Assemble n values with the given signature from an iterator over the columns
+def build_values(signature, columns, n):
+	if isinstance(signature, str):
+		return [None] * n if signature == "n" else next(columns)
+	if signature[0] == "t":
+		return list(zip(*[build_values(s, columns, n) for s in signature[1:]])) if len(signature) > 1 else [()] * n
+	keys = [key for (key, _) in signature[1:]]
+	parts = [build_values(s, columns, n) for (_, s) in signature[1:]]
+	return [dict(zip(keys, x)) for x in zip(*parts)] if len(keys) > 0 else [{} for _ in range(n)]
+
+# Store a list of values column-wise, one group of columns per signature. Returns the schema or None.
+def encode_values(values, prefix, arrays):
+	signatures = [get_signature(value) for value in values]
+	unique_signatures = list(dict.fromkeys(signatures))
+	if None in unique_signatures:
+		return None
+	# Group of each value (only stored if there are multiple groups)
+	if len(unique_signatures) > 1:
+		signature_ids = {s : i for (i, s) in enumerate(unique_signatures)}
+		arrays[prefix + "/signature"] = np.array([signature_ids[s] for s in signatures], dtype = np.int32)
+	for (sid, signature) in enumerate(unique_signatures):
+		group = values if len(unique_signatures) == 1 else [v for (v, s) in zip(values, signatures) if s == signature]
+		columns = []
+		get_columns(group, signature, columns)
+		for (cid, (column_type, column)) in enumerate(zip(get_column_types(signature), columns)):
+			name = "%s/%d/%d" % (prefix, sid, cid)
+			if column_type == "s":
+				(vocabulary, codes) = np.unique(np.array(column, dtype = str), return_inverse = True)
+				arrays[name + "/vocabulary"] = vocabulary
+				arrays[name] = codes.astype(np.int32)
+			else:
+				arrays[name] = np.array(column, dtype = {"i" : np.int64, "f" : np.float64, "b" : bool}[column_type])
+	return {"n" : len(values), "signatures" : unique_signatures}
+
+# Inverse of encode_values
+def decode_values(schema, prefix, bundle):
+	n = schema["n"]
+	signatures = schema["signatures"]
+	values = [None] * n if len(signatures) > 1 else None
+	for (sid, signature) in enumerate(signatures):
+		columns = []
+		for (cid, column_type) in enumerate(get_column_types(signature)):
+			name = "%s/%d/%d" % (prefix, sid, cid)
+			if column_type == "s":
+				columns.append(bundle[name + "/vocabulary"].astype(object)[bundle[name]].tolist())
+			else:
+				columns.append(bundle[name].tolist())
+		if len(signatures) == 1:
+			return build_values(signature, iter(columns), n)
+		positions = np.flatnonzero(bundle[prefix + "/signature"] == sid).tolist()
+		for (pos, value) in zip(positions, build_values(signature, iter(columns), len(positions))):
+			values[pos] = value
+	return values if values is not None else []
+
+# Whether a value is a dictionary with tuple keys (or other non-string keys), e.g., a routing table or a traffic
+def is_table(value):
+	return isinstance(value, dict) and not any(isinstance(key, str) for key in value)
+
+# Store a dictionary with tuple keys: Nested dictionaries are flattened level by level (the keys of nested dictionaries
+# can be of any type, e.g., the previous node or "-1" in extended routing tables). Returns the schema or None.
+def encode_table(table, prefix, arrays):
+	levels = []
+	dicts = [table]
+	while True:
+		keys = [key for d in dicts for key in d]
+		values = [value for d in dicts for value in d.values()]
+		arrays["%s/%d/counts" % (prefix, len(levels))] = np.array([len(d) for d in dicts], dtype = np.int64)
+		key_schema = encode_values(keys, "%s/%d/keys" % (prefix, len(levels)), arrays)
+		if key_schema is None:
+			return None
+		levels.append(key_schema)
+		# Descend into the next level if all values are dictionaries
+		if len(values) == 0 or not all(isinstance(value, dict) for value in values):
+			break
+		dicts = values
+	value_schema = encode_values(values, prefix + "/values", arrays)
+	if value_schema is None:
+		return None
+	return {"kind" : "table", "levels" : levels, "values" : value_schema}
+
+# Inverse of encode_table: Assemble the dictionaries from the innermost level outwards
+def decode_table(schema, prefix, bundle):
+	values = decode_values(schema["values"], prefix + "/values", bundle)
+	for level in range(len(schema["levels"]) - 1, -1, -1):
+		keys = decode_values(schema["levels"][level], "%s/%d/keys" % (prefix, level), bundle)
+		items = zip(keys, values)
+		values = [dict(itertools.islice(items, count)) for count in bundle["%s/%d/counts" % (prefix, level)].tolist()]
+	return values[0]
+
+# Store a value (an input or a part of it). Large tables and lists are stored as arrays, the rest in the schema.
+def encode_value(value, prefix, arrays):
+	schema = None
+	if isinstance(value, dict) and len(value) > 0 and all(isinstance(key, str) for key in value):
+		items = [[key, encode_value(x, "%s/%d" % (prefix, i), arrays)] for (i, (key, x)) in enumerate(value.items())]
+		schema = {"kind" : "dict", "items" : items}
+	elif is_table(value) and len(value) >= bundle_min_array_length:
+		schema = encode_table(value, prefix, arrays)
+	elif isinstance(value, list) and len(value) >= bundle_min_array_length:
+		values_schema = encode_values(value, prefix, arrays)
+		schema = {"kind" : "list", "values" : values_schema} if values_schema is not None else None
+	# Fall back to storing the value in the schema
+	if schema is None:
+		for name in [name for name in arrays if name.startswith(prefix + "/")]:
+			del arrays[name]
+		schema = {"kind" : "json", "value" : hlp.encode_data(value)}
+	return schema
+
+# Inverse of encode_value
+def decode_value(schema, prefix, bundle):
+	if schema["kind"] == "dict":
+		return {key : decode_value(x, "%s/%d" % (prefix, i), bundle) for (i, (key, x)) in enumerate(schema["items"])}
+	elif schema["kind"] == "table":
+		return decode_table(schema, prefix, bundle)
+	elif schema["kind"] == "list":
+		return decode_values(schema["values"], prefix, bundle)
+	return hlp.decode_data(schema["value"])
+
+# Write a design bundle. The design contains the entries of the design file that are not stored as sections
+# (e.g., the design name), the sections contain the inputs (e.g., {"chiplets" : chiplets, "placement" : placement})
+def write_design_bundle(filename, design, sections):
+	arrays = {"design" : np.array(json.dumps(hlp.encode_data(design)))}
+	for (section, content) in sections.items():
+		schema = encode_value(content, section, arrays)
+		arrays[section + "/schema"] = np.array(json.dumps(schema))
+	file = open(filename, "wb")
+	np.savez(file, **arrays)
+	file.close()
+
+# Read the design of a design bundle. Inputs that are stored in the bundle are referenced as "<bundle file>#<section>"
+# and are read when needed (see hlp.read_input).
+def read_design_bundle(filename):
+	with np.load(filename, allow_pickle = False) as bundle:
+		design = hlp.decode_data(json.loads(str(bundle["design"])))
+		for name in bundle.files:
+			if name.endswith("/schema"):
+				design[name[:-len("/schema")]] = "%s#%s" % (filename, name[:-len("/schema")])
+	return design
+
+# Read one section (input) of a design bundle
+def read_bundle_section(filename, section):
+	with np.load(filename, allow_pickle = False) as bundle:
+		if section + "/schema" not in bundle.files:
+			print("ERROR: The design bundle \"%s\" does not contain the input \"%s\"." % (filename, section))
+			sys.exit(1)
+		schema = json.loads(str(bundle[section + "/schema"]))
+		return decode_value(schema, section, bundle)
+
+# Convert a design file and all input files that it references to a design bundle
+def convert_design_to_bundle(design_file, bundle_file):
+	design = hlp.read_json(design_file)
+	bundle_design = {}
+	sections = {}
+	for (name, value) in design.items():
+		# Inputs in a binary format (e.g., routing tables stored as .npz file) are kept as references
+		if name != "design_name" and isinstance(value, str) and os.path.isfile(value) and not value.endswith(".npz"):
+			sections[name] = hlp.read_json(value)
+		else:
+			bundle_design[name] = value
+	write_design_bundle(bundle_file, bundle_design, sections)
+	# Check that the conversion is lossless
+	for (name, content) in sections.items():
+		if json.dumps(hlp.encode_data(read_bundle_section(bundle_file, name))) != json.dumps(hlp.encode_data(content)):
+			print("ERROR: The input \"%s\" was not converted losslessly." % name)
+			sys.exit(1)
+
+if __name__ == "__main__":
+	# Read command line arguments
+	parser = argparse.ArgumentParser()
+	parser.add_argument("-df", "--design_file", required = True, help = "Path to the \"design\" input file")
+	parser.add_argument("-bf", "--bundle_file", required = True, help = "Path to the design bundle that is created (.npz)")
+	args = parser.parse_args()
+	# Convert the design
+	convert_design_to_bundle(args.design_file, args.bundle_file)
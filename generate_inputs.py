@@ -13,7 +13,8 @@ import generate_traffic as trgen
 import inputs.trace_to_traffic as t2t
 
 # Generates most of the RapidChiplet input files
-# Files automatically written: chiplets, design, placement, routing_table, topology, traffic_by_unit, traffic_by_chiplet
+# Files automatically written: chiplets, design, placement, routing_table, topology, traffic_by_unit, traffic_by_chiplet,
+# symmetry (only if declare_symmetry is set)
 # Files modified based on the existing file: booksim_config
 # Files not written by the script (must be written manually): technologies, packaging
 def generate_inputs(params, design_name, do_write = True):
@@ -111,10 +112,21 @@ def generate_inputs(params, design_name, do_write = True):
 	design["topology"] = "inputs/topologies/topology_%s.json" % design_name
 	# Packaging: Nothing to generate here as the packaging file needs to be written manually.
 	design["packaging"] = params["packaging_file"]
+	# Symmetry: If requested, the symmetries of the topology are declared and the routing is made invariant under them,
+	# such that RapidChiplet only needs to evaluate one destination per orbit (see compute_symmetry in rapidchiplet.py)
+	symmetry = None
+	if params.get("declare_symmetry", False):
+		if topology_name not in tgen.topology_symmetry_functions or use_memory or params["routing_algorithm"] != "splif":
+			print("ERROR: Declared symmetries are only supported for the topologies %s without memory chiplets and with splif routing." % ", ".join(tgen.topology_symmetry_functions))
+			sys.exit(1)
+		symmetry = tgen.topology_symmetry_functions[topology_name](params)
+		hlp.write_json("inputs/symmetries/symmetry_%s.json" % design_name, symmetry) if do_write else None
+		files["symmetry"] = symmetry
+		design["symmetry"] = "inputs/symmetries/symmetry_%s.json" % design_name
 	# Routing table
 	routing_algo = params["routing_algorithm"]
 	routing_file = "routing_table_%s" % design_name
-	routing_table = rgen.generate_routing(chiplets, placement, topology, routing_algo)
+	routing_table = rgen.generate_routing(chiplets, placement, topology, routing_algo, symmetry)
 	hlp.write_json("inputs/routing_tables/%s.json" % routing_file, routing_table) if do_write else None
 	files["routing_table"] = routing_table
 	design["routing_table"] = "inputs/routing_tables/%s.json" % routing_file 
@@ -5,9 +5,12 @@ import argparse
 import random
 import queue
 import sys
+import numpy as np
 
 # Import RapidChiplet files
 import helpers as hlp
+import ici_core as icc
+import compact_routing_table as crt
 import routing_utils as utils
 
 #########################################################################################################
@@ -17,12 +20,13 @@ import routing_utils as utils
 # The fact that we always use the shortest path with the lowest next-hop-id results in deterministic,
 # deadlock-free routing. However, the path diversity is not exploited, and congestion may occur.
 # Consider all chiplets as lower-id than all interposer-routers.
-def shortest_path_lowest_id_first_routing(ici_graph):	
+# If destinations is given, only the routes towards these chiplets are computed.
+def shortest_path_lowest_id_first_routing(ici_graph, destinations = None):	
 	# Input: ICI graph
 	nodes = ici_graph["nodes"]
 	relay_map = ici_graph["relay_map"]
 	adj_list = ici_graph["adj_list"]
-	chiplets = [x for x in nodes if x[0] == "chiplet"]
+	chiplets = [x for x in nodes if x[0] == "chiplet"] if destinations is None else destinations
 	# Output: One routing table for each node. Only chiplets are possible destinations.
 	routing_table = {node : {dst : None for dst in chiplets} for node in nodes}
 	# Run Dijkstra's algorithm. Only use chiplets as possible destinations.
@@ -164,11 +168,44 @@ def shortest_path_turn_model_random(ici_graph):
 					curr = next
 	return {"type" : "extended", "table" : routing_table}
 
-def generate_routing(chiplets, placement, topology, routing_algorithm):
+# Routing that is invariant under a declared symmetry (see generate_topology.py): The routes towards one representative
+# chiplet per orbit are computed with shortest-path-lowest-id-first routing, the routes towards every other chiplet d
+# are the images of the routes towards its representative under the group element that maps the representative to d.
+# The images of shortest paths are shortest paths, only the tie-breaking between paths of equal length differs.
+def symmetric_shortest_path_lowest_id_first_routing(ici_graph, symmetry):
+	nodes = ici_graph["nodes"]
+	n_chiplets = len([x for x in nodes if x[0] == "chiplet"])
+	if len(nodes) > n_chiplets:
+		print("ERROR: Symmetric routing is only supported for designs without interposer-routers")
+		sys.exit(1)
+	# Representative of each chiplet and the group element that maps it to the chiplet
+	generators = [np.array(generator, dtype = np.int64) for generator in symmetry["generators"]]
+	orbits = icc.get_permutation_orbits(generators, n_chiplets)
+	(representatives, source_maps) = icc.get_transversal(generators, orbits)
+	node_maps = np.argsort(source_maps, axis = 1)
+	# Routes towards the representatives
+	representative_table = shortest_path_lowest_id_first_routing(ici_graph, [("chiplet", int(rep)) for rep in representatives])["table"]
+	# Map the routes to all destinations
+	routing_table = {node : {} for node in nodes}
+	for dst in range(n_chiplets):
+		rep = ("chiplet", int(orbits[dst]))
+		node_map = node_maps[dst].tolist()
+		for (node, sub_table) in representative_table.items():
+			nxt = sub_table[rep]
+			routing_table[("chiplet", node_map[node[1]])][("chiplet", dst)] = ("chiplet", node_map[nxt[1]]) if nxt is not None else None
+	return {"type" : "default", "table" : routing_table}
+
+# If a symmetry is declared, the routing is invariant under it (only supported for splif)
+def generate_routing(chiplets, placement, topology, routing_algorithm, symmetry = None):
 	# Construct ICI graph
 	ici_graph = hlp.construct_ici_graph(chiplets, placement, topology)
 	# Construct routing table
-	if routing_algorithm == "splif":
+	if symmetry is not None and routing_algorithm != "splif":
+		print("ERROR: Routing that is invariant under a declared symmetry is only supported for splif")
+		sys.exit(1)
+	if routing_algorithm == "splif" and symmetry is not None:
+		routing_table = symmetric_shortest_path_lowest_id_first_routing(ici_graph, symmetry)
+	elif routing_algorithm == "splif":
 		routing_table = shortest_path_lowest_id_first_routing(ici_graph)
 	elif routing_algorithm == "sptmr":
 		routing_table = shortest_path_turn_model_random(ici_graph)
@@ -184,14 +221,17 @@ if __name__ == "__main__":
 	parser.add_argument("-df", "--design_file", required = True, help = "Path to the \"design\" input file")
 	parser.add_argument("-rtf", "--routing_table_file", required = True, help = "Name of the routing table file (is stored in ./inputs/routing_tables)")
 	parser.add_argument("-ra", "--routing_algorithm", required = True, help = "Routing algorithm to use. Options: splif")
+	parser.add_argument("-bin", "--binary", required = False, action = "store_true", help = "Store the routing table in the binary format (.npz) instead of JSON")
 	args = parser.parse_args()
 	# Read input files
-	design = hlp.read_json(filename = args.design_file)
-	chiplets = hlp.read_json(filename = design["chiplets"])
-	placement = hlp.read_json(filename = design["placement"])
-	topology = hlp.read_json(filename = design["topology"])
+	design = hlp.read_design(filename = args.design_file)
+	chiplets = hlp.read_input(filename = design["chiplets"])
+	placement = hlp.read_input(filename = design["placement"])
+	topology = hlp.read_input(filename = design["topology"])
+	# If the design declares a symmetry, the routing is made invariant under it
+	symmetry = hlp.read_input(filename = design["symmetry"]) if "symmetry" in design else None
 	# Generate routing table
-	routing_table = generate_routing(chiplets, placement, topology, args.routing_algorithm)
+	routing_table = generate_routing(chiplets, placement, topology, args.routing_algorithm, symmetry)
 	# Write routing
-	hlp.write_json("./inputs/routing_tables/%s.json" % args.routing_table_file, routing_table)
+	crt.write_routing_table("./inputs/routing_tables/%s.%s" % (args.routing_table_file, "npz" if args.binary else "json"), routing_table)
 
@@ -910,6 +910,45 @@ def generate_sparse_hamming_graph_topology(params):
 	# Return the links
 	return links	
 
+###############################################################################
+# Declared Symmetries
+###############################################################################
+
+# Some topologies are vertex-transitive: A translation maps every chiplet to another chiplet such that the topology
+# is mapped onto itself. The generators of such a translation group are declared together with the topology, the
+# routing is made invariant under them (see generate_routing.py), and RapidChiplet evaluates one representative
+# destination per orbit instead of all destinations. Each generator is a permutation of the chiplet-ids.
+# The functions assume the same chiplet-ids as the corresponding topology generators.
+
+# Cyclic shift of the chiplets along the rings of the rows and along the rings of the columns.
+# ring_order[k] is the column (row) at position k of the ring.
+def get_ring_shift_generators(rows, cols, row_ring_order, col_ring_order):
+	generators = []
+	if cols > 1:
+		next_col = {row_ring_order[k] : row_ring_order[(k + 1) % cols] for k in range(cols)}
+		generators.append([row * cols + next_col[col] for row in range(rows) for col in range(cols)])
+	if rows > 1:
+		next_row = {col_ring_order[k] : col_ring_order[(k + 1) % rows] for k in range(rows)}
+		generators.append([next_row[row] * cols + col for row in range(rows) for col in range(cols)])
+	return generators
+
+# Torus: The rings are the rows and columns in their natural order
+def generate_torus_symmetry(params):
+	(rows, cols) = (params["rows"], params["cols"])
+	return {"generators" : get_ring_shift_generators(rows, cols, list(range(cols)), list(range(rows)))}
+
+# FoldedTorus: Each ring visits the even positions in ascending order and the odd positions in descending order
+def generate_folded_torus_symmetry(params):
+	(rows, cols) = (params["rows"], params["cols"])
+	def folded_ring_order(n):
+		return list(range(0, n, 2)) + list(range(n - 1 - (n % 2), 0, -2))
+	return {"generators" : get_ring_shift_generators(rows, cols, folded_ring_order(cols), folded_ring_order(rows))}
+
+# Hypercube: Flipping one bit of the chiplet-id
+def generate_hypercube_symmetry(params):
+	N = params["rows"] * params["cols"]
+	return {"generators" : [[cid ^ (1 << bit) for cid in range(N)] for bit in range(int(math.log2(N)))]}
+
 
 topology_generation_functions = {
 	"mesh" 					: generate_mesh_topology,
@@ -980,3 +1019,9 @@ topology_to_phy_placement = {
 	"sparse_hamming_graph"	: "xPHY_yPHY",
 }
 
+# Topologies whose generators declare a symmetry (see above)
+topology_symmetry_functions = {
+	"torus" 				: generate_torus_symmetry,
+	"folded_torus" 			: generate_folded_torus_symmetry,
+	"hypercube" 			: generate_hypercube_symmetry,
+}
@@ -142,9 +142,9 @@ if __name__ == "__main__":
 	parser.add_argument("-par", "--parameters", required = False, help = "Additional parameters for the specified traffic pattern")
 	args = parser.parse_args()
 	# Read input files
-	design = hlp.read_json(filename = args.design_file)
-	chiplets = hlp.read_json(filename = design["chiplets"])
-	placement = hlp.read_json(filename = design["placement"])
+	design = hlp.read_design(filename = args.design_file)
+	chiplets = hlp.read_input(filename = design["chiplets"])
+	placement = hlp.read_input(filename = design["placement"])
 	# Generate synthetic traffic
 	parameters = eval(args.parameters) if args.parameters is not None else []
 	traffic_file = args.traffic_file
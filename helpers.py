@@ -1,11 +1,22 @@
 # Python libraries
+import os
+import re
+import ast
 import json
-import copy
 import math
+import time
+import hashlib
+import itertools
+import threading
+import numpy as np
+import concurrent.futures
 
 # RapidChiplet libraries
 import rapidchiplet as rc
 import validation as val
+import design_bundle as bdl
+import trace_store as trs
+import compact_routing_table as crt
 
 # Check if a string can be converted to an float
 def is_float(value):
@@ -50,52 +61,564 @@ def decode_data(data):
     else:
         return data
 
+# Tuple keys used in the inputs: Node labels, e.g., ("chiplet", 0) in routing tables, pairs of ids, e.g., (0, 16) in
+# traffic_by_chiplet, and pairs of pairs, e.g., ((0, 0), (16, 0)) in traffic_by_unit. Other keys are decoded with decode_key.
+tuple_key_pattern = re.compile(r'__tuple__:\[(?:"([a-z_]+)", (-?\d+)|(-?\d+), (-?\d+)|"__tuple__:\[(-?\d+), (-?\d+)\]", "__tuple__:\[(-?\d+), (-?\d+)\]")\]$')
+
+# Patterns of the same keys (one key per line) and functions that build the keys from all matches at once.
+# Components of the keys (ids and pairs of ids) are converted once and shared between keys.
+def build_node_keys(matches):
+	ids = {x : int(x) for x in set(m[1] for m in matches)}
+	return [(m[0], ids[m[1]]) for m in matches]
+
+def build_pair_keys(matches):
+	ids = {x : int(x) for x in set(itertools.chain.from_iterable(matches))}
+	return [(ids[x], ids[y]) for (x, y) in matches]
+
+def build_pair_of_pairs_keys(matches):
+	pairs = {x : tuple(int(y) for y in x.split(", ")) for x in set(itertools.chain.from_iterable(matches))}
+	return [(pairs[x], pairs[y]) for (x, y) in matches]
+
+tuple_key_shapes = [
+	(re.compile(r'^__tuple__:\["([a-z_]+)", (-?\d+)\]$', re.M), build_node_keys),
+	(re.compile(r'^__tuple__:\[(-?\d+), (-?\d+)\]$', re.M), build_pair_keys),
+	(re.compile(r'^__tuple__:\["__tuple__:\[(-?\d+, -?\d+)\]", "__tuple__:\[(-?\d+, -?\d+)\]"\]$', re.M), build_pair_of_pairs_keys),
+]
+
+# Objects with at least this many keys are decoded in one pass (smaller objects are decoded key by key)
+tuple_key_batch_size = 1000
+
+# Decode a tuple key (equivalent to decode_key)
+def decode_tuple_key(key):
+	match = tuple_key_pattern.match(key)
+	if match is None:
+		return decode_key(key)
+	groups = match.groups()
+	if groups[0] is not None:
+		return (groups[0], int(groups[1]))
+	if groups[2] is not None:
+		return (int(groups[2]), int(groups[3]))
+	return ((int(groups[4]), int(groups[5])), (int(groups[6]), int(groups[7])))
+
+# Decode many tuple keys of the same shape in one pass (returns None if the keys do not all have the same known shape)
+def decode_tuple_keys(keys):
+	text = "\n".join(keys)
+	if text.count("\n") != len(keys) - 1:
+		return None
+	for (pattern, build_keys) in tuple_key_shapes:
+		if pattern.match(keys[0]):
+			matches = pattern.findall(text)
+			return build_keys(matches) if len(matches) == len(keys) else None
+	return None
+
+# Decode a JSON object while it is parsed (equivalent to decode_data). Objects are decoded from the inside out,
+# i.e., the values are already decoded. Decoded keys are memoized since the same keys occur in many objects.
+def decode_json_object(pairs, key_cache):
+	decoded_keys = None
+	if len(pairs) >= tuple_key_batch_size and pairs[0][0].startswith("__tuple__:"):
+		decoded_keys = decode_tuple_keys([key for (key, _) in pairs])
+	if decoded_keys is not None:
+		return dict(zip(decoded_keys, [value for (_, value) in pairs]))
+	data = {}
+	for (key, value) in pairs:
+		if key.startswith("__tuple__:"):
+			decoded_key = key_cache.get(key)
+			if decoded_key is None:
+				decoded_key = key_cache[key] = decode_tuple_key(key)
+			key = decoded_key
+		data[key] = value
+	if "__tuple__" in data:
+		return tuple(data["items"])
+	return data
+
+# Encode a scalar as JSON (same as json.dumps)
+def encode_json_scalar(value):
+	if isinstance(value, str):
+		return json.encoder.encode_basestring_ascii(value)
+	if value is None or isinstance(value, bool):
+		return json.dumps(value)
+	if isinstance(value, int):
+		return int.__repr__(value)
+	if isinstance(value, float) and math.isfinite(value):
+		return float.__repr__(value)
+	return json.dumps(value)
+
+# Whether a tuple only contains strings, integers, and such tuples
+def is_plain_tuple(key):
+	return all(type(k) is str or type(k) is int or (type(k) is tuple and is_plain_tuple(k)) for k in key)
+
+# Encode a tuple key (same as encode_key). Only plain tuples are memoized since e.g. (0, 1), (0, 1.0), and (0, True) 
+# are equal as keys but are encoded differently.
+def encode_tuple_key(key, key_cache):
+	is_plain = is_plain_tuple(key)
+	key_text = key_cache.get(key) if is_plain else None
+	if key_text is None:
+		items = [encode_json_scalar(encode_tuple_key(k, key_cache)) if isinstance(k, tuple) else encode_json_scalar(k) for k in key]
+		key_text = "__tuple__:[" + ", ".join(items) + "]"
+		if is_plain:
+			key_cache[key] = key_text
+	return key_text
+
+# Encode a key of a JSON object (same as json.dumps(encode_data(...)) for the key)
+def encode_json_key(key, key_cache):
+	if isinstance(key, tuple):
+		return encode_json_scalar(encode_tuple_key(key, key_cache))
+	if type(key) is int:
+		return "\"" + int.__repr__(key) + "\""
+	return encode_json_scalar(key if isinstance(key, str) else json.dumps(key))
+
+# Write a value as JSON with an indentation of four spaces (same as json.dumps(encode_data(value), indent=4)).
+# The value is written piece by piece, i.e., no encoded copy of the value is built in memory.
+def write_json_value(file, value, indent, key_cache):
+	if isinstance(value, tuple):
+		value = {"__tuple__" : True, "items" : list(value)}
+	if isinstance(value, dict) and len(value) > 0:
+		inner_indent = indent + "    "
+		separator = "{"
+		for (key, x) in value.items():
+			file.write(separator + inner_indent + encode_json_key(key, key_cache) + ": ")
+			write_json_value(file, x, inner_indent, key_cache)
+			separator = ","
+		file.write(indent + "}")
+	elif isinstance(value, list) and len(value) > 0:
+		inner_indent = indent + "    "
+		separator = "["
+		for x in value:
+			file.write(separator + inner_indent)
+			write_json_value(file, x, inner_indent, key_cache)
+			separator = ","
+		file.write(indent + "]")
+	elif isinstance(value, (dict, list)):
+		file.write("{}" if isinstance(value, dict) else "[]")
+	else:
+		file.write(encode_json_scalar(value))
+
 # Write a JSON file
 def write_json(filename, content):
     file = open(filename, "w")
-    file.write(json.dumps(encode_data(content), indent=4))
+    write_json_value(file, content, "\n", {})
+    file.close()
+
+# Write a JSON file that contains a list whose entries are produced one by one (same as write_json(filename, list(values)))
+def write_json_list(filename, values):
+    file = open(filename, "w")
+    key_cache = {}
+    separator = "["
+    for value in values:
+        file.write(separator + "\n    ")
+        write_json_value(file, value, "\n    ", key_cache)
+        separator = ","
+    file.write("[]" if separator == "[" else "\n]")
     file.close()
 
 # Read a JSON file
 def read_json(filename):
     file = open(filename, "r")
-    file_content = decode_data(json.loads(file.read()))
+    key_cache = {}
+    file_content = json.load(file, object_pairs_hook = lambda pairs: decode_json_object(pairs, key_cache))
     file.close()
     return file_content
 
+# Read a design file (JSON file or design bundle)
+def read_design(filename):
+	if filename.endswith(".npz"):
+		return bdl.read_design_bundle(filename)
+	return read_json(filename)
+
+# Read an input file (JSON file or section of a design bundle, referenced as "<bundle file>#<section>")
+def read_input(filename):
+	(bundle_file, _, section) = filename.rpartition("#")
+	if bundle_file.endswith(".npz"):
+		return bdl.read_bundle_section(bundle_file, section)
+	return read_json(filename)
+
+# Functions and constants that can be used in the "link_latency" and "link_power" functions of the packaging.
+# Functions can be called directly (e.g., sqrt(x)) or through the math module (e.g., math.sqrt(x)).
+packaging_functions = {
+	"abs" : "abs", "sqrt" : "sqrt", "exp" : "exp", "log" : "log", "log2" : "log2", "log10" : "log10",
+	"ceil" : "ceil", "floor" : "floor", "min" : "minimum", "max" : "maximum",
+}
+packaging_constants = {"pi" : math.pi, "e" : math.e}
+packaging_binary_operators = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow)
+packaging_comparison_operators = (ast.Lt, ast.LtE, ast.Gt, ast.GtE, ast.Eq, ast.NotEq)
+
+# Compiled packaging functions, indexed by their source text
+packaging_function_cache = {}
+
+# Translate the body of a packaging function into an equivalent expression that operates on NumPy arrays.
+# Only arithmetic, comparisons, conditional expressions, and the functions/constants listed above are allowed.
+def translate_packaging_expression(node, arg_name):
+	numpy_function = lambda name: ast.Attribute(value = ast.Name(id = "np", ctx = ast.Load()), attr = name, ctx = ast.Load())
+	translate = lambda x: translate_packaging_expression(x, arg_name)
+	# Numbers
+	if isinstance(node, ast.Constant) and type(node.value) in [int, float]:
+		return node
+	# The argument of the function and constants
+	if isinstance(node, ast.Name) and node.id == arg_name:
+		return node
+	if isinstance(node, ast.Name) and node.id in packaging_constants:
+		return ast.Constant(value = packaging_constants[node.id])
+	if isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name) and node.value.id == "math" and node.attr in packaging_constants:
+		return ast.Constant(value = packaging_constants[node.attr])
+	# Arithmetic
+	if isinstance(node, ast.BinOp) and isinstance(node.op, packaging_binary_operators):
+		return ast.BinOp(left = translate(node.left), op = node.op, right = translate(node.right))
+	if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.UAdd, ast.USub)):
+		return ast.UnaryOp(op = node.op, operand = translate(node.operand))
+	# Function calls
+	if isinstance(node, ast.Call) and len(node.keywords) == 0 and len(node.args) > 0:
+		if isinstance(node.func, ast.Name):
+			name = node.func.id
+		elif isinstance(node.func, ast.Attribute) and isinstance(node.func.value, ast.Name) and node.func.value.id == "math":
+			name = node.func.attr
+		else:
+			name = None
+		if name in packaging_functions:
+			args = [translate(arg) for arg in node.args]
+			# min and max with more than two arguments are reduced pairwise
+			result = ast.Call(func = numpy_function(packaging_functions[name]), args = args[:2], keywords = [])
+			for arg in args[2:]:
+				result = ast.Call(func = numpy_function(packaging_functions[name]), args = [result, arg], keywords = [])
+			return result
+	# Comparisons and conditional expressions
+	if isinstance(node, ast.Compare) and all(isinstance(op, packaging_comparison_operators) for op in node.ops):
+		operands = [translate(x) for x in [node.left] + node.comparators]
+		result = None
+		for (op, left, right) in zip(node.ops, operands[:-1], operands[1:]):
+			comparison = ast.Compare(left = left, ops = [op], comparators = [right])
+			result = comparison if result is None else ast.Call(func = numpy_function("logical_and"), args = [result, comparison], keywords = [])
+		return result
+	if isinstance(node, ast.IfExp):
+		return ast.Call(func = numpy_function("where"), args = [translate(node.test), translate(node.body), translate(node.orelse)], keywords = [])
+	raise ValueError("Unsupported expression \"%s\" in packaging function" % ast.unparse(node))
+
+# Compile a packaging function (e.g., "lambda x : 0.25 * x") into a function that is evaluated on a whole NumPy array
+# of link lengths at once. The source is parsed only once and, unlike eval(), it cannot execute arbitrary code.
+def compile_packaging_function(source):
+	if source in packaging_function_cache:
+		return packaging_function_cache[source]
+	function = ast.parse(source.strip(), mode = "eval").body
+	# The function must be a lambda with exactly one argument
+	arguments = function.args if isinstance(function, ast.Lambda) else None
+	if arguments is None or len(arguments.args) != 1 or arguments.posonlyargs or arguments.kwonlyargs or arguments.vararg or arguments.kwarg:
+		raise ValueError("Packaging functions must be lambda functions with exactly one argument")
+	arg_name = arguments.args[0].arg
+	body = translate_packaging_expression(function.body, arg_name)
+	# Compile the translated function without access to builtins
+	translated = ast.Expression(body = ast.Lambda(args = arguments, body = body))
+	code = compile(ast.fix_missing_locations(translated), "<packaging function>", "eval")
+	array_function = eval(code, {"np" : np, "__builtins__" : {}})
+	# The result has the same shape as the input, also for constant functions
+	def compiled_function(values):
+		values = np.asarray(values, dtype = np.float64)
+		return np.broadcast_to(np.asarray(array_function(values), dtype = np.float64), values.shape)
+	packaging_function_cache[source] = compiled_function
+	return compiled_function
+
 # Read inputs if they are not already present
 def read_required_inputs(inputs, required_inputs):
 	design = inputs["design"]
 	for input_name in required_inputs:
 		if input_name not in inputs:
-			inputs[input_name] = read_json(design[input_name])
+			# Traces and routing tables are read into compact representations (see trace_store.py and compact_routing_table.py)
+			if input_name == "trace":
+				inputs[input_name] = trs.read_trace(design[input_name])
+			elif input_name == "routing_table":
+				inputs[input_name] = crt.read_routing_table(design[input_name])
+			else:
+				inputs[input_name] = read_input(design[input_name])
 			val.validation_functions[input_name](inputs)
 
 # Compute intermediates if they are not already present
 def compute_required_intermediates(inputs, intermediates, required_intermediates):
 	for intermediate_name in required_intermediates:
 		if intermediate_name not in intermediates:
-			intermediates[intermediate_name] = rc.metric_computation_functions[intermediate_name](inputs, intermediates)
-
-# Rotate a chiplet
-def rotate_chiplet(chiplet, rotation):
-    # If no rotation is needed, return chiplet as-is
-    if rotation == 0:
-        return chiplet
-    # Rotate the chiplet if needed
-    chiplet = copy.deepcopy(chiplet)
-    rot = rotation // 90
-    alpha = math.pi / 2 * rot
-    (cx, cy) = (chiplet["dimensions"]["x"] / 2, chiplet["dimensions"]["y"] / 2)
-    if rot % 2 == 1:
-        chiplet["dimensions"] = {"x" : chiplet["dimensions"]["y"],"y" : chiplet["dimensions"]["x"]}
-    (cxn, cyn) = (chiplet["dimensions"]["x"] / 2, chiplet["dimensions"]["y"] / 2)
-    for (pid, phy) in enumerate(chiplet["phys"]):
-        (x, y) = (phy["x"] - cx, phy["y"] - cy)
-        (xr,yr) = (x * math.cos(alpha) - y * math.sin(alpha), x * math.sin(alpha) + y * math.cos(alpha))
-        chiplet["phys"][pid] = {"x" : cxn + xr, "y" : cyn + yr}
-    # Return a rotated copy of the chiplet
-    return chiplet
+			intermediates[intermediate_name] = compute_intermediate(inputs, intermediates, intermediate_name)
+
+# Persistent on-disk cache of intermediates (opt-in, see use_cache in rapidchiplet()). Entries are addressed by a hash
+# of the content of all inputs that an intermediate depends on and of the RapidChiplet source code. The cache is bounded
+# in size; the least recently used entries are evicted first. Entries are stored as NumPy .npz files that are loaded
+# without pickle, i.e., loading an entry never executes code.
+intermediate_cache_dir = "./cache"
+intermediate_cache_max_bytes = 2 ** 30
+intermediate_cache_lock = threading.Lock()
+intermediate_cache_source_files = ["rapidchiplet.py", "helpers.py", "ici_core.py", "validation.py"]
+intermediate_cache_code_hash = {}
+
+# Hash of the RapidChiplet source code (cache entries of an older version of the code are never used)
+def get_code_hash():
+	if "hash" not in intermediate_cache_code_hash:
+		hasher = hashlib.sha256()
+		for source_file in intermediate_cache_source_files:
+			file = open(os.path.join(os.path.dirname(os.path.abspath(__file__)), source_file), "rb")
+			hasher.update(file.read())
+			file.close()
+		intermediate_cache_code_hash["hash"] = hasher.hexdigest()
+	return intermediate_cache_code_hash["hash"]
+
+# Hash of the content of an input. The hashes are memoized in inputs["content_hashes"], which is cleared at the start
+# of every call of rapidchiplet() (inputs may be edited in place between calls) and whenever an input is edited.
+def get_input_hash(inputs, input_name):
+	content_hashes = inputs.setdefault("content_hashes", {})
+	if input_name not in content_hashes:
+		read_required_inputs(inputs, [input_name])
+		content = json.dumps(encode_data(inputs[input_name]), default = str)
+		content_hashes[input_name] = hashlib.sha256(content.encode()).hexdigest()
+	return content_hashes[input_name]
+
+# Key of an intermediate in the persistent cache
+def get_intermediate_cache_key(inputs, intermediate_name):
+	# Collect all inputs that the intermediate depends on directly or indirectly
+	input_names = set()
+	pending = [intermediate_name]
+	visited = set()
+	while len(pending) > 0:
+		current = pending.pop()
+		if current not in visited:
+			visited.add(current)
+			input_names.update(rc.metric_dependencies[current]["inputs"])
+			pending += rc.metric_dependencies[current]["intermediates"]
+	# Hash the code, the name of the intermediate, and the content of these inputs
+	hasher = hashlib.sha256()
+	hasher.update(get_code_hash().encode())
+	hasher.update(intermediate_name.encode())
+	for input_name in sorted(input_names):
+		hasher.update(("%s:%s" % (input_name, get_input_hash(inputs, input_name))).encode())
+	return hasher.hexdigest()
+
+# Encode an intermediate for the persistent cache: Arrays are stored as entries of the .npz file, everything else as
+# JSON (dictionaries are stored as lists of key-value pairs such that keys of any type are preserved).
+# Returns None if the intermediate can not be stored without pickle (e.g., arrays of Python objects).
+def encode_cache_value(value, arrays):
+	if isinstance(value, np.ndarray):
+		if value.dtype.hasobject:
+			return None
+		name = "array_%d" % len(arrays)
+		arrays[name] = value
+		return {"__array__" : name}
+	elif isinstance(value, dict):
+		items = [(encode_cache_value(key, arrays), encode_cache_value(x, arrays)) for (key, x) in value.items()]
+		return None if any(x is None for item in items for x in item) else {"__dict__" : [list(item) for item in items]}
+	elif isinstance(value, (list, tuple)):
+		items = [encode_cache_value(x, arrays) for x in value]
+		return None if any(x is None for x in items) else ({"__tuple__" : items} if isinstance(value, tuple) else items)
+	elif isinstance(value, np.generic):
+		return value.item()
+	elif value is None or isinstance(value, (bool, int, float, str)):
+		return {"__none__" : True} if value is None else value
+	return None
+
+# Inverse of encode_cache_value
+def decode_cache_value(value, arrays):
+	if isinstance(value, dict):
+		if "__array__" in value:
+			return arrays[value["__array__"]]
+		elif "__dict__" in value:
+			return {decode_cache_value(key, arrays) : decode_cache_value(x, arrays) for (key, x) in value["__dict__"]}
+		elif "__tuple__" in value:
+			return tuple(decode_cache_value(x, arrays) for x in value["__tuple__"])
+		return None
+	elif isinstance(value, list):
+		return [decode_cache_value(x, arrays) for x in value]
+	return value
+
+# Load an intermediate from the persistent cache (returns None if it is not cached)
+def load_cached_intermediate(key):
+	path = os.path.join(intermediate_cache_dir, key + ".npz")
+	try:
+		with np.load(path, allow_pickle = False) as entry:
+			arrays = {name : entry[name] for name in entry.files}
+		intermediate = decode_cache_value(json.loads(str(arrays.pop("structure"))), arrays)
+		# Mark the entry as recently used
+		os.utime(path)
+		return intermediate
+	except Exception:
+		return None
+
+# Store an intermediate in the persistent cache and evict the least recently used entries if the cache is too large
+def store_cached_intermediate(key, intermediate):
+	arrays = {}
+	structure = encode_cache_value(intermediate, arrays)
+	if structure is None:
+		return
+	arrays["structure"] = np.array(json.dumps(structure))
+	os.makedirs(intermediate_cache_dir, exist_ok = True)
+	path = os.path.join(intermediate_cache_dir, key + ".npz")
+	# Write to a temporary file first such that concurrent readers never see partial entries
+	temporary_path = "%s.%d.%d.tmp" % (path, os.getpid(), threading.get_ident())
+	file = open(temporary_path, "wb")
+	np.savez(file, **arrays)
+	file.close()
+	os.replace(temporary_path, path)
+	# Evict the least recently used entries
+	with intermediate_cache_lock:
+		entries = []
+		for entry in os.scandir(intermediate_cache_dir):
+			if entry.name.endswith(".npz"):
+				try:
+					stat = entry.stat()
+					entries.append((stat.st_mtime, stat.st_size, entry.path))
+				except FileNotFoundError:
+					pass
+		total_size = sum(size for (_, size, _) in entries)
+		for (_, size, entry_path) in sorted(entries):
+			if total_size <= intermediate_cache_max_bytes:
+				break
+			try:
+				os.remove(entry_path)
+			except FileNotFoundError:
+				pass
+			total_size -= size
+
+# Compute an intermediate or load it from the persistent cache (only if enabled and only for cacheable intermediates)
+def compute_intermediate(inputs, intermediates, intermediate_name):
+	use_cache = inputs.get("use_cache", False) and intermediate_name in rc.cached_intermediates
+	if use_cache:
+		key = get_intermediate_cache_key(inputs, intermediate_name)
+		intermediate = load_cached_intermediate(key)
+		if intermediate is not None:
+			return intermediate
+	intermediate = rc.metric_computation_functions[intermediate_name](inputs, intermediates)
+	if use_cache:
+		store_cached_intermediate(key, intermediate)
+	return intermediate
+
+# Inputs and intermediates that the given node of the computation graph depends on (whether present or not).
+# A node is a tuple (kind, name) where kind is "input", "intermediate", or "metric".
+def get_declared_node_dependencies(inputs, node):
+	(kind, name) = node
+	if kind == "input":
+		# The validation of an input reads further inputs
+		input_names = val.validation_dependencies[name] if inputs["validate"] else []
+		return [("input", x) for x in input_names if x != name]
+	dependencies = rc.metric_dependencies[name]
+	for (option, option_dependencies) in rc.option_metric_dependencies.items():
+		if inputs.get(option, False) and name in option_dependencies:
+			dependencies = option_dependencies[name]
+	return [("input", x) for x in dependencies["inputs"]] + [("intermediate", x) for x in dependencies["intermediates"]]
+
+# Inputs and intermediates that need to be present before the given node of the computation graph can be executed.
+def get_node_dependencies(inputs, intermediates, node):
+	return [(kind, name) for (kind, name) in get_declared_node_dependencies(inputs, node) if name not in (inputs if kind == "input" else intermediates)]
+
+# Read the input, compute the intermediate, or compute the metric represented by a node of the computation graph
+def execute_node(inputs, intermediates, results, node):
+	(kind, name) = node
+	start_time = time.time()
+	if kind == "input":
+		read_required_inputs(inputs, [name])
+	elif kind == "intermediate":
+		intermediates[name] = compute_intermediate(inputs, intermediates, name)
+	else:
+		results[name] = rc.metric_computation_functions[name](inputs, intermediates)
+	return time.time() - start_time
+
+# All nodes that the given node depends on directly or indirectly (including the node itself)
+def get_transitive_dependencies(dependencies, node):
+	closure = set()
+	pending = [node]
+	while len(pending) > 0:
+		current = pending.pop()
+		if current not in closure:
+			closure.add(current)
+			pending += dependencies[current]
+	return closure
+
+# Compute the given metrics by executing the graph of inputs, intermediates, and metrics that they depend on.
+# Only inputs and intermediates that are needed by one of the metrics are read/computed. Nodes whose dependencies
+# are available run concurrently in a pool of n_workers threads (the heavy lifting happens in numpy or in BookSim).
+# Returns the metrics, the time taken by each executed node, and the dependencies of each executed node.
+def compute_scheduled_metrics(inputs, intermediates, metric_names, n_workers = 1):
+	return compute_scheduled_nodes(inputs, intermediates, [("metric", metric_name) for metric_name in metric_names], n_workers)
+
+# Same as compute_scheduled_metrics, but for any nodes of the computation graph (e.g., intermediates)
+def compute_scheduled_nodes(inputs, intermediates, target_nodes, n_workers = 1):
+	# Collect all nodes that need to be executed and their dependencies
+	dependencies = {}
+	pending = list(target_nodes)
+	while len(pending) > 0:
+		node = pending.pop()
+		if node not in dependencies:
+			dependencies[node] = get_node_dependencies(inputs, intermediates, node)
+			pending += dependencies[node]
+	# Count the unfinished dependencies of each node and list the nodes that depend on each node
+	n_unfinished = {node : len(set(deps)) for (node, deps) in dependencies.items()}
+	dependents = {node : set() for node in dependencies}
+	for (node, deps) in dependencies.items():
+		for dependency in deps:
+			dependents[dependency].add(node)
+	# Execute all nodes as soon as their dependencies are available
+	results = {}
+	node_times = {}
+	ready = [node for node in dependencies if n_unfinished[node] == 0]
+	running = {}
+	pool = concurrent.futures.ThreadPoolExecutor(max_workers = max(n_workers, 1))
+	try:
+		while len(ready) > 0 or len(running) > 0:
+			for node in ready:
+				running[pool.submit(execute_node, inputs, intermediates, results, node)] = node
+			ready = []
+			(done, _) = concurrent.futures.wait(running, return_when = concurrent.futures.FIRST_COMPLETED)
+			for future in done:
+				node = running.pop(future)
+				# Errors (including sys.exit() in a node) are re-raised here
+				node_times[node] = future.result()
+				for dependent in dependents[node]:
+					n_unfinished[dependent] -= 1
+					if n_unfinished[dependent] == 0:
+						ready.append(dependent)
+	finally:
+		pool.shutdown(wait = True, cancel_futures = True)
+	return (results, node_times, dependencies)
+
+# Rotated dimensions (array [x, y]) and PHY coordinates (array with one row [x, y] per PHY) of a chiplet.
+# The PHYs are rotated around the center of the chiplet, the chiplet itself is not copied.
+def get_rotated_chiplet_geometry(chiplet, rotation):
+	dimensions = np.array([chiplet["dimensions"]["x"], chiplet["dimensions"]["y"]], dtype = np.float64)
+	phys = np.array([[phy["x"], phy["y"]] for phy in chiplet["phys"]], dtype = np.float64).reshape(-1, 2)
+	# If no rotation is needed, return the geometry as-is
+	if rotation == 0:
+		return {"dimensions" : dimensions, "phys" : phys}
+	rot = rotation // 90
+	alpha = math.pi / 2 * rot
+	(cx, cy) = (dimensions[0] / 2, dimensions[1] / 2)
+	if rot % 2 == 1:
+		dimensions = dimensions[::-1].copy()
+	(cxn, cyn) = (dimensions[0] / 2, dimensions[1] / 2)
+	(x, y) = (phys[:,0] - cx, phys[:,1] - cy)
+	(xr, yr) = (x * math.cos(alpha) - y * math.sin(alpha), x * math.sin(alpha) + y * math.cos(alpha))
+	return {"dimensions" : dimensions, "phys" : np.stack((cxn + xr, cyn + yr), axis = 1)}
+
+# Geometry of all placed chiplets. Rotated geometries are computed once per (chiplet name, rotation).
+# chiplet_positions: 	Position of each placed chiplet (one row per chiplet)
+# chiplet_dimensions:	Rotated dimensions of each placed chiplet (one row per chiplet)
+# phy_positions:		Absolute positions of all PHYs, the PHYs of chiplet c are in rows phy_offsets[c] to phy_offsets[c+1]-1
+# irouter_positions:	Position of each interposer-router (one row per interposer-router)
+def compute_placement_geometry(chiplets, placement):
+	rotated_geometries = {}
+	n_chiplets = len(placement["chiplets"])
+	chiplet_positions = np.zeros((n_chiplets, 2))
+	chiplet_dimensions = np.zeros((n_chiplets, 2))
+	chiplet_phys = []
+	for (cid, chiplet_desc) in enumerate(placement["chiplets"]):
+		key = (chiplet_desc["name"], chiplet_desc["rotation"])
+		if key not in rotated_geometries:
+			rotated_geometries[key] = get_rotated_chiplet_geometry(chiplets[chiplet_desc["name"]], chiplet_desc["rotation"])
+		chiplet_positions[cid] = (chiplet_desc["position"]["x"], chiplet_desc["position"]["y"])
+		chiplet_dimensions[cid] = rotated_geometries[key]["dimensions"]
+		chiplet_phys.append(rotated_geometries[key]["phys"])
+	phy_counts = np.array([len(phys) for phys in chiplet_phys], dtype = np.int64)
+	phy_offsets = np.concatenate(([0], np.cumsum(phy_counts))).astype(np.int64)
+	phy_positions = np.concatenate(chiplet_phys + [np.zeros((0, 2))]) + np.repeat(chiplet_positions, phy_counts, axis = 0)
+	irouter_positions = np.array([(irouter["position"]["x"], irouter["position"]["y"]) for irouter in placement["interposer_routers"]], dtype = np.float64).reshape(-1, 2)
+	return {
+		"rotated_geometries" : rotated_geometries,
+		"chiplet_positions" : chiplet_positions,
+		"chiplet_dimensions" : chiplet_dimensions,
+		"phy_offsets" : phy_offsets,
+		"phy_positions" : phy_positions,
+		"irouter_positions" : irouter_positions,
+	}
 
 # Construct a graph representation of the ICI network
 def construct_ici_graph(chiplets, placement, topology):
@@ -0,0 +1,702 @@
+# Import python libraries
+import sys
+import numpy as np
+
+# Import RapidChiplet files
+import compact_routing_table as crt
+
+# Dense, integer-indexed representation of the ICI network that is shared by all metrics.
+# Nodes: Chiplets have the node-ids 0 to c-1, interposer-routers have the node-ids c to c+r-1
+# Links: Every (undirected) link in the topology is split into two directed links. The directed link
+#		 with id 2*i goes from the i-th unique link's first to its second endpoint, id 2*i+1 goes back.
+# 		 If the topology contains the same pair of endpoints multiple times, the last occurrence is used.
+def construct_ici_core(chiplets, placement, topology):
+	n_chiplets = len(placement["chiplets"])
+	n_irouters = len(placement["interposer_routers"])
+	n_nodes = n_chiplets + n_irouters
+	# List of nodes and a map from node labels, e.g., (chiplet, 0) or (irouter, 7), to node-ids
+	nodes = [("chiplet", cid) for cid in range(n_chiplets)] + [("irouter", rid) for rid in range(n_irouters)]
+	node_index = {node : nid for (nid, node) in enumerate(nodes)}
+	# Whether a node can relay traffic
+	relay = np.ones(n_nodes, dtype = bool)
+	for (cid, chiplet_desc) in enumerate(placement["chiplets"]):
+		relay[cid] = chiplets[chiplet_desc["name"]]["relay"]
+	# Identify unique links and remember the topology-entry that describes them
+	link_ids = {}
+	link_topology_ids = []
+	link_endpoints = []
+	for (tid, link) in enumerate(topology):
+		nid_1 = node_index[(link["ep1"]["type"], link["ep1"]["outer_id"])]
+		nid_2 = node_index[(link["ep2"]["type"], link["ep2"]["outer_id"])]
+		key = (min(nid_1, nid_2), max(nid_1, nid_2))
+		if key in link_ids:
+			link_topology_ids[link_ids[key]] = tid
+			link_endpoints[link_ids[key]] = (nid_1, nid_2)
+		else:
+			link_ids[key] = len(link_topology_ids)
+			link_topology_ids.append(tid)
+			link_endpoints.append((nid_1, nid_2))
+	# Directed links
+	n_links = 2 * len(link_endpoints)
+	link_src = np.zeros(n_links, dtype = np.int64)
+	link_dst = np.zeros(n_links, dtype = np.int64)
+	for (uid, (nid_1, nid_2)) in enumerate(link_endpoints):
+		(link_src[2 * uid], link_dst[2 * uid]) = (nid_1, nid_2)
+		(link_src[2 * uid + 1], link_dst[2 * uid + 1]) = (nid_2, nid_1)
+	# Outgoing links of each node: out_links[nid] = {neighbor-id -> link-id}
+	out_links = [{} for nid in range(n_nodes)]
+	for lid in range(n_links):
+		out_links[link_src[lid]][int(link_dst[lid])] = lid
+	# Sorted link keys for vectorized lookups of link-ids (see find_links)
+	link_keys = link_src * n_nodes + link_dst
+	link_key_order = np.argsort(link_keys)
+	# Return the core
+	return {
+		"nodes" : nodes,
+		"node_index" : node_index,
+		"n_chiplets" : n_chiplets,
+		"n_nodes" : n_nodes,
+		"n_links" : n_links,
+		"relay" : relay,
+		"link_src" : link_src,
+		"link_dst" : link_dst,
+		"link_topology_ids" : np.repeat(np.array(link_topology_ids, dtype = np.int64), 2),
+		"out_links" : out_links,
+		"link_keys_sorted" : link_keys[link_key_order],
+		"link_key_order" : link_key_order,
+	}
+
+# Get the id of the directed link between two nodes given as labels, e.g., (chiplet, 0) -> (irouter, 7)
+def get_link_id(core, node_1, node_2):
+	node_index = core["node_index"]
+	return core["out_links"][node_index[node_1]][node_index[node_2]]
+
+# Vectorized lookup of the ids of the directed links from src[i] to dst[i] (node-ids). Returns -1 for missing links.
+def find_links(core, src, dst):
+	keys = np.asarray(src, dtype = np.int64) * core["n_nodes"] + np.asarray(dst, dtype = np.int64)
+	sorted_keys = core["link_keys_sorted"]
+	pos = np.minimum(np.searchsorted(sorted_keys, keys), len(sorted_keys) - 1)
+	found = (sorted_keys[pos] == keys) if len(sorted_keys) > 0 else np.zeros(keys.shape, dtype = bool)
+	return np.where(found, core["link_key_order"][pos], -1)
+
+# Convert a traffic_by_chiplet dictionary into arrays of source chiplet-ids, destination chiplet-ids, and weights
+def traffic_to_arrays(traffic_by_chiplet):
+	n_flows = len(traffic_by_chiplet)
+	src = np.fromiter((sid for (sid, did) in traffic_by_chiplet.keys()), dtype = np.int64, count = n_flows)
+	dst = np.fromiter((did for (sid, did) in traffic_by_chiplet.keys()), dtype = np.int64, count = n_flows)
+	weights = np.fromiter(traffic_by_chiplet.values(), dtype = np.float64, count = n_flows)
+	return (src, dst, weights)
+
+# Convert k traffic_by_chiplet dictionaries into the union of their flows (arrays of source and destination chiplet-ids),
+# a flows x k weight matrix, and a flows x k boolean matrix that specifies which flows are part of which traffic.
+def traffics_to_arrays(traffics_by_chiplet):
+	flow_ids = {}
+	entries = []
+	for (tid, traffic_by_chiplet) in enumerate(traffics_by_chiplet):
+		for (key, weight) in traffic_by_chiplet.items():
+			if key not in flow_ids:
+				flow_ids[key] = len(flow_ids)
+			entries.append((flow_ids[key], tid, weight))
+	n_flows = len(flow_ids)
+	src = np.fromiter((sid for (sid, did) in flow_ids.keys()), dtype = np.int64, count = n_flows)
+	dst = np.fromiter((did for (sid, did) in flow_ids.keys()), dtype = np.int64, count = n_flows)
+	entries = np.array(entries, dtype = np.float64).reshape(-1, 3)
+	(rows, cols) = (entries[:,0].astype(np.int64), entries[:,1].astype(np.int64))
+	weights = np.zeros((n_flows, len(traffics_by_chiplet)))
+	weights[rows, cols] = entries[:,2]
+	present = np.zeros((n_flows, len(traffics_by_chiplet)), dtype = bool)
+	present[rows, cols] = True
+	return (src, dst, weights, present)
+
+# Compile a "default" routing table into a dense next-hop array over states. The state of a packet at node n with
+# destination chiplet d has the id d * n_nodes + n. state_links[state] is the id of the directed link that the
+# packet uses next (-1 if there is none). link_ports[link] is the state (within one destination) reached via a link.
+# If destinations is given, only the routes towards these chiplets are compiled (the k-th destination takes the
+# place of destination k, see compile_routing_table_for_destinations).
+def compile_default_routing_table(core, routing_table, destinations = None):
+	(n_nodes, n_chiplets) = (core["n_nodes"], core["n_chiplets"])
+	node_ids = routing_table.map_node_ids(core["node_index"])
+	next_hops = routing_table.next_hops if destinations is None else routing_table.next_hops[:,destinations]
+	state_links = np.full((n_chiplets if destinations is None else len(destinations), n_nodes), -1, dtype = np.int64)
+	# All entries with a next hop
+	(nids, rows) = np.nonzero(next_hops >= 0)
+	nxts = node_ids[next_hops[nids, rows]]
+	(nids, dsts) = (node_ids[nids], rows if destinations is None else np.asarray(destinations, dtype = np.int64)[rows])
+	valid = (nids >= 0) & (nxts >= 0) & (dsts < n_chiplets) & (nids != dsts)
+	state_links[rows[valid], nids[valid]] = find_links(core, nids[valid], nxts[valid])
+	return {"state_links" : state_links.reshape(-1), "states_per_destination" : n_nodes, "link_ports" : core["link_dst"]}
+
+# Compile an "extended" routing table, where the next hop depends on the previous hop, into a flat transition array.
+# The state of a packet consists of its destination chiplet d, its current node, and the port at which it entered 
+# the current node. Ports 0 to n-1 are the injection ports of the n nodes, port n+l is the port at which link l ends.
+# The state has the id d * (n_nodes + n_links) + port, and state_links[state] is the link that the packet uses next.
+def compile_extended_routing_table(core, routing_table):
+	(n_nodes, n_links, n_chiplets) = (core["n_nodes"], core["n_links"], core["n_chiplets"])
+	n_ports = n_nodes + n_links
+	node_ids = np.append(routing_table.map_node_ids(core["node_index"]), -1)
+	state_links = np.full((n_chiplets, n_ports), -1, dtype = np.int64)
+	# Node and destination of all entries
+	pairs = np.repeat(np.arange(routing_table.n_nodes * routing_table.n_chiplets, dtype = np.int64), np.diff(routing_table.entry_ptr))
+	(nids, dsts) = (node_ids[pairs // routing_table.n_chiplets], pairs % routing_table.n_chiplets)
+	(prvs, nxts) = (node_ids[routing_table.entry_prev], node_ids[routing_table.entry_next])
+	valid = (nids >= 0) & (nxts >= 0) & (dsts < n_chiplets) & ((prvs >= 0) | (routing_table.entry_prev == -1))
+	(nids, dsts, prvs, nxts, injected) = (nids[valid], dsts[valid], prvs[valid], nxts[valid], routing_table.entry_prev[valid] == -1)
+	# Packets injected at this node use the previous node -1
+	ports = np.where(injected, nids, n_nodes + find_links(core, prvs, nids))
+	valid = injected | (ports >= n_nodes)
+	state_links[dsts[valid], ports[valid]] = find_links(core, nids[valid], nxts[valid])
+	link_ports = n_nodes + np.arange(n_links, dtype = np.int64)
+	return {"state_links" : state_links.reshape(-1), "states_per_destination" : n_ports, "link_ports" : link_ports}
+
+# Compile a routing table of any supported type (see above). Routing tables in the JSON format are converted to
+# compact routing tables first (see compact_routing_table.py).
+def compile_routing_table(core, routing_table_):
+	routing_table = crt.as_compact_routing_table(routing_table_)
+	if routing_table.routing_table_type == "default":
+		return compile_default_routing_table(core, routing_table)
+	elif routing_table.routing_table_type == "extended":
+		return compile_extended_routing_table(core, routing_table)
+	else:
+		print("ERROR: Unknown routing table type %s" % routing_table.routing_table_type)
+		sys.exit(1)
+
+# Compile only the routes towards the given destination chiplets: The states of the k-th destination have the ids 
+# k * states_per_destination + port. For default routing tables, only the entries of the given destinations are visited.
+def compile_routing_table_for_destinations(core, routing_table_, destinations):
+	routing_table = crt.as_compact_routing_table(routing_table_)
+	if routing_table.routing_table_type == "default":
+		return compile_default_routing_table(core, routing_table, destinations)
+	compiled_routing_table = compile_routing_table(core, routing_table)
+	state_links = compiled_routing_table["state_links"].reshape(core["n_chiplets"], -1)[destinations]
+	return dict(compiled_routing_table, state_links = state_links.reshape(-1))
+
+# The next hops towards every destination form a tree (a forest over all destinations), both for destination-based 
+# routing (states are nodes) and for routing that depends on the previous hop (states are node-port pairs). 
+# States are ordered in levels: Level 0 contains the roots (the destinations), level k+1 contains the children of
+# level k in the order of their parents, i.e., the children of one parent are contiguous.
+# successors:	Successor-state of each state (-1 for roots and states without a route)
+# roots:		States where packets arrive at their destination
+def compile_forest(successors, roots):
+	n_states = len(successors)
+	# Children of each state in CSR format
+	has_parent = successors >= 0
+	child_counts = np.bincount(successors[has_parent], minlength = n_states)
+	child_ptr = np.concatenate(([0], np.cumsum(child_counts)))
+	child_list = np.flatnonzero(has_parent)[np.argsort(successors[has_parent], kind = "stable")]
+	# Breadth-first traversal from the roots, one level at a time
+	levels = [np.asarray(roots, dtype = np.int64)]
+	level_child_counts = []
+	while len(levels[-1]) > 0:
+		frontier = levels[-1]
+		counts = child_counts[frontier]
+		total = counts.sum()
+		offsets = np.repeat(child_ptr[frontier] - np.cumsum(counts) + counts, counts) + np.arange(total)
+		level_child_counts.append(counts)
+		levels.append(child_list[offsets])
+	# Number of hops from each state to its root (-1 for states that do not reach a root)
+	depths = np.full(n_states, -1, dtype = np.int64)
+	for (depth, level) in enumerate(levels):
+		depths[level] = depth
+	return {
+		"successors" : successors,
+		"levels" : levels[:-1],
+		"level_child_counts" : level_child_counts[:-1],
+		"depths" : depths,
+	}
+
+# Sum up per-state hop values on the way to the root (e.g., the latency from every state to its destination).
+# The hop values can be a vector (one value per state) or a matrix (one row per state, e.g., one column per component).
+def forest_sum_to_root(forest, hop_values):
+	successors = forest["successors"]
+	sums = np.zeros(np.shape(hop_values))
+	for level in forest["levels"][1:]:
+		sums[level] = hop_values[level] + sums[successors[level]]
+	return sums
+
+# Sum up per-state values over all states in the subtree of each state (e.g., the traffic routed through a state).
+# Levels are processed in reverse topological order, children of one parent are contiguous within a level.
+# The values can be a vector (one value per state) or a matrix (one row per state, e.g., one column per traffic).
+def forest_sum_from_leaves(forest, values):
+	sums = np.array(values, dtype = np.float64)
+	levels = forest["levels"]
+	for depth in range(len(levels) - 1, 0, -1):
+		counts = forest["level_child_counts"][depth - 1]
+		parents = levels[depth - 1][counts > 0]
+		starts = (np.cumsum(counts) - counts)[counts > 0]
+		sums[parents] += np.add.reduceat(sums[levels[depth]], starts)
+	return sums
+
+# Build the per-destination trees of a compiled routing table (see compile_routing_table).
+# Since the path of a packet only depends on its state, shared path-suffixes are part of the same subtree
+# and all per-state quantities can be memoized in one pass over the trees.
+# If destinations is given, the routing table only contains the routes towards these chiplets (see
+# compile_routing_table_for_destinations) and the k-th tree belongs to the k-th destination.
+def compile_destination_trees(core, compiled_routing_table, destinations = None):
+	state_links = compiled_routing_table["state_links"]
+	states_per_dst = compiled_routing_table["states_per_destination"]
+	link_ports = compiled_routing_table["link_ports"]
+	n_chiplets = core["n_chiplets"]
+	destinations = np.arange(n_chiplets, dtype = np.int64) if destinations is None else np.asarray(destinations, dtype = np.int64)
+	# Tree of each chiplet (-1 for chiplets without a tree)
+	tree_index = np.full(n_chiplets, -1, dtype = np.int64)
+	tree_index[destinations] = np.arange(len(destinations))
+	# Successor of each state: Same destination, port at which the used link ends
+	successors = np.full(len(state_links), -1, dtype = np.int64)
+	has_next = state_links >= 0
+	tree_of_state = np.flatnonzero(has_next) // states_per_dst
+	successors[has_next] = tree_of_state * states_per_dst + link_ports[state_links[has_next]]
+	# Roots: All states in which a packet is located at its destination chiplet
+	root_dsts = np.concatenate((np.arange(n_chiplets), core["link_dst"]))
+	root_ports = np.concatenate((np.arange(n_chiplets), link_ports))
+	root_trees = tree_index[np.minimum(root_dsts, n_chiplets - 1)]
+	is_root = (root_dsts < n_chiplets) & (root_trees >= 0)
+	roots = np.unique(root_trees[is_root] * states_per_dst + root_ports[is_root])
+	destination_trees = compile_forest(successors, roots)
+	destination_trees["state_links"] = state_links
+	destination_trees["states_per_destination"] = states_per_dst
+	destination_trees["destinations"] = destinations
+	destination_trees["tree_index"] = tree_index
+	return destination_trees
+
+# Get the states at which the given flows are injected. Exits with an error if a flow has no route.
+def destination_tree_flow_states(core, destination_trees, flow_src, flow_dst):
+	flow_states = destination_trees["tree_index"][flow_dst] * destination_trees["states_per_destination"] + flow_src
+	if (destination_trees["tree_index"][flow_dst] < 0).any():
+		print("ERROR: The destination trees do not contain the routes towards chiplet %d" % flow_dst[destination_trees["tree_index"][flow_dst] < 0][0])
+		sys.exit(1)
+	missing = np.flatnonzero(destination_trees["depths"][flow_states] < 0)
+	if len(missing) > 0:
+		print("ERROR: Unable to find a path from chiplet %d to chiplet %d" % (flow_src[missing[0]], flow_dst[missing[0]]))
+		sys.exit(1)
+	return flow_states
+
+# Latency of links and relay-latency of intermediate nodes from every state to its destination
+def destination_tree_latencies(core, destination_trees, link_latencies, node_relay_latencies):
+	hop_latencies = destination_tree_hop_latencies(core, destination_trees, link_latencies, node_relay_latencies)
+	return forest_sum_to_root(destination_trees, hop_latencies.sum(axis = 1))
+
+# Same as destination_tree_latencies, but the latency of the links and the relay-latency of the intermediate nodes
+# are accumulated separately in the same pass (returns a states x 2 matrix)
+def destination_tree_latency_components(core, destination_trees, link_latencies, node_relay_latencies):
+	hop_latencies = destination_tree_hop_latencies(core, destination_trees, link_latencies, node_relay_latencies)
+	return forest_sum_to_root(destination_trees, hop_latencies)
+
+# Latency of the link used in every state and relay-latency of the node at its end (states x 2 matrix)
+def destination_tree_hop_latencies(core, destination_trees, link_latencies, node_relay_latencies):
+	state_links = destination_trees["state_links"]
+	has_next = state_links >= 0
+	hop_latencies = np.zeros((len(state_links), 2))
+	links = state_links[has_next]
+	next_nodes = core["link_dst"][links]
+	# Add the relay latency of the next node unless the next node is the destination
+	is_relay = next_nodes != destination_trees["destinations"][np.flatnonzero(has_next) // destination_trees["states_per_destination"]]
+	hop_latencies[has_next, 0] = link_latencies[links]
+	hop_latencies[has_next, 1] = np.where(is_relay, node_relay_latencies[next_nodes], 0)
+	return hop_latencies
+
+# Latencies along the images of the destination trees under automorphisms (given by their node maps and link maps):
+# Column j of the k-th tree holds the latency from the image of every state under the automorphism of tree_members[k,j]
+# to the image of the tree's destination (the latencies of the links and nodes are taken at the images).
+# node_maps[m] and link_maps[m] are the node map and the link map of the automorphism of member m.
+def destination_tree_image_latencies(core, destination_trees, link_latencies, node_relay_latencies, node_maps, link_maps, tree_members):
+	state_links = destination_trees["state_links"]
+	has_next = state_links >= 0
+	states = np.flatnonzero(has_next)
+	links = state_links[has_next]
+	next_nodes = core["link_dst"][links]
+	trees = states // destination_trees["states_per_destination"]
+	members = tree_members[trees]
+	# Add the relay latency of the next node unless the next node is the destination
+	is_relay = next_nodes != destination_trees["destinations"][trees]
+	hop_latencies = np.zeros((len(state_links), tree_members.shape[1]))
+	hop_latencies[states] = link_latencies[link_maps[members, links[:,None]]]
+	hop_latencies[states] += np.where(is_relay[:,None], node_relay_latencies[node_maps[members, next_nodes[:,None]]], 0)
+	return forest_sum_to_root(destination_trees, hop_latencies)
+
+# Per-link loads: Inject the flows at their source states and push the traffic up the trees.
+# The flow weights can be a vector (one traffic) or a flows x k matrix (k traffics, returns a links x k matrix).
+def destination_tree_link_loads(core, destination_trees, flow_states, flow_weights):
+	state_links = destination_trees["state_links"]
+	has_next = state_links >= 0
+	if np.ndim(flow_weights) == 1:
+		injected = np.bincount(flow_states, weights = flow_weights, minlength = len(state_links))
+		through = forest_sum_from_leaves(destination_trees, injected)
+		return np.bincount(state_links[has_next], weights = through[has_next], minlength = core["n_links"])
+	injected = np.zeros((len(state_links), flow_weights.shape[1]))
+	np.add.at(injected, flow_states, flow_weights)
+	through = forest_sum_from_leaves(destination_trees, injected)
+	link_loads = np.zeros((core["n_links"], flow_weights.shape[1]))
+	np.add.at(link_loads, state_links[has_next], through[has_next])
+	return link_loads
+
+# Check whether a node map (permutation of the node-ids) is an automorphism of the ICI network, i.e., chiplets are mapped 
+# to chiplets, relays to relays, and links to links. Returns the induced link map (permutation of the link-ids) or None.
+def get_automorphism_link_map(core, node_map):
+	n_chiplets = core["n_chiplets"]
+	if (node_map[:n_chiplets] >= n_chiplets).any() or not np.array_equal(core["relay"][node_map], core["relay"]):
+		return None
+	link_map = find_links(core, node_map[core["link_src"]], node_map[core["link_dst"]])
+	if (link_map < 0).any():
+		return None
+	return link_map
+
+# Check whether a compiled routing table is invariant under an automorphism (given by its node map and link map), i.e.,
+# the route from the image of a node towards the image of a destination is the image of the original route
+def is_routing_invariant(core, compiled_routing_table, node_map, link_map):
+	(n_nodes, n_chiplets) = (core["n_nodes"], core["n_chiplets"])
+	# States are mapped to states: Injection ports with the node map, ports at the end of links with the link map
+	state_links = compiled_routing_table["state_links"].reshape(n_chiplets, -1)
+	if compiled_routing_table["states_per_destination"] == n_nodes:
+		port_map = node_map
+	else:
+		port_map = np.concatenate((node_map, n_nodes + link_map))
+	mapped_state_links = np.where(state_links >= 0, link_map[state_links], -1)
+	return np.array_equal(state_links[node_map[:n_chiplets]][:,port_map], mapped_state_links)
+
+# Check whether a compact "default" routing table is invariant under an automorphism given by its node map (in the
+# node-ids of the routing table), i.e., the next hop from the image of a node towards the image of a destination is
+# the image of the next hop. Compares the next-hop arrays directly (the routing table does not need to be compiled).
+def is_next_hop_table_invariant(routing_table, node_map):
+	next_hops = routing_table.next_hops.astype(np.int64)
+	mapped_next_hops = np.where(next_hops >= 0, node_map[np.maximum(next_hops, 0)], next_hops)
+	return np.array_equal(next_hops[node_map][:,node_map[:routing_table.n_chiplets]], mapped_next_hops)
+
+# Orbits of the elements 0 to n-1 under the group generated by the given permutations.
+# Each element is labeled with the smallest element of its orbit.
+def get_permutation_orbits(permutations, n):
+	inverses = [np.argsort(permutation) for permutation in permutations]
+	labels = np.arange(n, dtype = np.int64)
+	while True:
+		previous_labels = labels
+		for (permutation, inverse) in zip(permutations, inverses):
+			labels = np.minimum(np.minimum(labels, labels[permutation]), labels[inverse])
+		labels = labels[labels]
+		if np.array_equal(labels, previous_labels):
+			return labels
+
+# Representative (smallest element) of each orbit (see get_permutation_orbits) and, for every element d, the inverse of
+# a group element g that maps the representative of d to d: source_maps[d,s] = g^-1(s). The group elements are composed
+# from the given permutations in a breadth-first search from the representatives. If the permutations induce
+# permutations of another set (e.g., the link maps of node maps), induced_maps[d] is the permutation induced by g.
+def get_transversal(permutations, orbits, induced_permutations = None):
+	n = len(orbits)
+	inverses = [np.argsort(permutation) for permutation in permutations]
+	representatives = np.unique(orbits)
+	source_maps = np.full((n, n), -1, dtype = np.int64)
+	source_maps[representatives] = np.arange(n)
+	induced_maps = None
+	if induced_permutations is not None:
+		induced_maps = np.full((n, len(induced_permutations[0])), -1, dtype = np.int64)
+		induced_maps[representatives] = np.arange(len(induced_permutations[0]))
+	reached = np.zeros(n, dtype = bool)
+	reached[representatives] = True
+	frontier = representatives
+	while len(frontier) > 0:
+		next_frontier = []
+		for (pid, (permutation, inverse)) in enumerate(zip(permutations, inverses)):
+			# If d' = g'(d) is reached from d, then source_maps[d'] = g^-1 o g'^-1 and induced_maps[d'] = g' o g
+			targets = permutation[frontier]
+			new = ~reached[targets]
+			(targets, first) = np.unique(targets[new], return_index = True)
+			source_maps[targets] = source_maps[frontier[new][first]][:,inverse]
+			if induced_maps is not None:
+				induced_maps[targets] = induced_permutations[pid][induced_maps[frontier[new][first]]]
+			reached[targets] = True
+			next_frontier.append(targets)
+		frontier = np.concatenate(next_frontier)
+	if induced_permutations is not None:
+		return (representatives, source_maps, induced_maps)
+	return (representatives, source_maps)
+
+# Compile the paths of a set of flows (given by their injection states) into a sparse flow x link incidence matrix
+# in CSR format. All paths are walked simultaneously, one hop per step, by following the destination trees.
+# indptr:		Entries indptr[f] to indptr[f+1]-1 belong to flow f, ordered from source to destination
+# links:		Directed link-id of each entry
+# flows:		Flow-id of each entry (row index, i.e., the CSR matrix in COO format)
+# relay_mask:	Whether the destination of the entry's link relays the packet (all hops except the last one)
+def compile_path_incidence(core, destination_trees, flow_states):
+	state_links = destination_trees["state_links"]
+	successors = destination_trees["successors"]
+	n_flows = len(flow_states)
+	hops = destination_trees["depths"][flow_states]
+	indptr = np.concatenate(([0], np.cumsum(hops))).astype(np.int64)
+	links = np.zeros(indptr[-1], dtype = np.int64)
+	# Walk all paths in parallel
+	active = np.flatnonzero(hops > 0)
+	cur_states = flow_states[active]
+	for hop in range(int(hops.max()) if n_flows > 0 else 0):
+		keep = hops[active] > hop
+		(active, cur_states) = (active[keep], cur_states[keep])
+		links[indptr[active] + hop] = state_links[cur_states]
+		cur_states = successors[cur_states]
+	# Convert to the CSR format
+	return path_incidence_from_links(indptr, links)
+
+# Compile the paths of a set of flows into a path incidence (see compile_path_incidence) by following the entries of
+# the routing table hop by hop (all flows at once). Only the entries on the paths of these flows are read, i.e., the
+# cost only depends on the number and length of the paths and not on the size of the routing table. Exits with an
+# error if a flow has no route.
+def walk_routing_table_paths(core, routing_table_, flow_src, flow_dst):
+	routing_table = crt.as_compact_routing_table(routing_table_)
+	extended = routing_table.routing_table_type == "extended"
+	# Map between the node-ids of the core and of the routing table
+	node_ids = np.append(routing_table.map_node_ids(core["node_index"]), -1)
+	table_node_ids = np.full(core["n_nodes"] + 1, -1, dtype = np.int64)
+	table_node_ids[node_ids[:-1][node_ids[:-1] >= 0]] = np.flatnonzero(node_ids[:-1] >= 0)
+	# A path that is longer than the number of states contains a loop
+	max_hops = core["n_nodes"] + (core["n_links"] if extended else 0)
+	(flow_src, flow_dst) = (np.asarray(flow_src, dtype = np.int64), np.asarray(flow_dst, dtype = np.int64))
+	(prv, cur) = (np.full(len(flow_src), -1, dtype = np.int64), flow_src.copy())
+	(hop_flows, hop_links) = ([], [])
+	active = np.flatnonzero(cur != flow_dst)
+	for hop in range(max_hops + 1):
+		if len(active) == 0:
+			break
+		# Look up the next hop of all flows that have not arrived yet
+		(rt_cur, rt_dst) = (table_node_ids[cur[active]], flow_dst[active])
+		found = (rt_cur >= 0) & (rt_dst < routing_table.n_chiplets) & (hop < max_hops)
+		nxt = np.full(len(active), -1, dtype = np.int64)
+		if not extended:
+			nxt[found] = routing_table.next_hops[rt_cur[found], rt_dst[found]]
+		else:
+			# In extended routing tables, the next hop also depends on the previous hop (packets are injected from -1)
+			rt_prv = np.where(prv[active] >= 0, table_node_ids[prv[active]], -1)
+			pairs = np.where(found, rt_cur * routing_table.n_chiplets + rt_dst, 0)
+			(starts, ends) = (routing_table.entry_ptr[pairs], routing_table.entry_ptr[pairs + 1])
+			for offset in range(int((ends - starts).max(initial = 0))):
+				entries = np.minimum(starts + offset, max(len(routing_table.entry_prev) - 1, 0))
+				match = found & (nxt < 0) & (starts + offset < ends) & (routing_table.entry_prev[entries] == rt_prv)
+				nxt[match] = routing_table.entry_next[entries[match]]
+		nxt = node_ids[np.maximum(nxt, -1)]
+		links = np.where(nxt >= 0, find_links(core, cur[active], nxt), -1)
+		if np.any(links < 0):
+			fid = active[np.flatnonzero(links < 0)[0]]
+			print("ERROR: Unable to find a path from chiplet %d to chiplet %d" % (flow_src[fid], flow_dst[fid]))
+			sys.exit(1)
+		hop_flows.append(active)
+		hop_links.append(links)
+		(prv[active], cur[active]) = (cur[active], nxt)
+		active = active[nxt != flow_dst[active]]
+	# Order the links by flow (the links of one flow are in the order of the hops)
+	hop_flows = np.concatenate(hop_flows) if len(hop_flows) > 0 else np.zeros(0, dtype = np.int64)
+	hop_links = np.concatenate(hop_links) if len(hop_links) > 0 else np.zeros(0, dtype = np.int64)
+	order = np.argsort(hop_flows, kind = "stable")
+	indptr = np.concatenate(([0], np.cumsum(np.bincount(hop_flows, minlength = len(flow_src))))).astype(np.int64)
+	return path_incidence_from_links(indptr, hop_links[order])
+
+# Path incidence in CSR format from the links on all paths (the links of flow f are links[indptr[f]:indptr[f+1]])
+def path_incidence_from_links(indptr, links):
+	n_flows = len(indptr) - 1
+	hops = np.diff(indptr)
+	flows = np.repeat(np.arange(n_flows, dtype = np.int64), hops)
+	relay_mask = np.ones(len(links), dtype = bool)
+	relay_mask[indptr[1:][hops > 0] - 1] = False
+	return {
+		"n_flows" : n_flows,
+		"indptr" : indptr,
+		"links" : links,
+		"flows" : flows,
+		"relay_mask" : relay_mask,
+	}
+
+# Reverse index of the path incidence for a subset of the links: The flows that use links[i] are
+# flows[indptr[i]:indptr[i+1]] (in increasing order)
+def get_link_flows(core, incidence, links):
+	link_positions = np.full(core["n_links"], -1, dtype = np.int64)
+	link_positions[links] = np.arange(len(links))
+	entry_positions = link_positions[incidence["links"]]
+	entries = np.flatnonzero(entry_positions >= 0)
+	entries = entries[np.argsort(entry_positions[entries], kind = "stable")]
+	indptr = np.concatenate(([0], np.cumsum(np.bincount(entry_positions[entries], minlength = len(links))))).astype(np.int64)
+	return (indptr, incidence["flows"][entries])
+
+# Sparse matrix-vector product: Sum up a per-link value (e.g., latency) over the path of every flow
+def sum_over_paths(incidence, link_values):
+	return np.bincount(incidence["flows"], weights = link_values[incidence["links"]], minlength = incidence["n_flows"])
+
+# Sum up a per-node value over the relay-nodes on the path of every flow (all nodes except source and destination)
+def sum_over_relays(core, incidence, node_values):
+	relays = incidence["relay_mask"]
+	relay_nodes = core["link_dst"][incidence["links"][relays]]
+	return np.bincount(incidence["flows"][relays], weights = node_values[relay_nodes], minlength = incidence["n_flows"])
+
+# Transposed sparse matrix-vector product: Accumulate a per-flow value (e.g., traffic) on every link of its path
+def accumulate_on_links(core, incidence, flow_values):
+	return np.bincount(incidence["links"], weights = flow_values[incidence["flows"]], minlength = core["n_links"])
+
+# Indices start[i], ..., end[i]-1 of all ranges i, concatenated
+def concatenate_ranges(starts, ends):
+	lengths = ends - starts
+	offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+	return offsets + np.arange(lengths.sum(), dtype = np.int64)
+
+# Weighted max-min fair rates of all flows (progressive filling / water-filling). All unfrozen flows increase their
+# rate proportionally to their weight (rate = weight * level) until a link is saturated; the flows using this link
+# are frozen at the current level and the remaining flows keep increasing their rates. Every iteration saturates at
+# least one link. The per-link weights of the unfrozen flows are updated incrementally, i.e., every entry of the
+# flow x link incidence is touched a constant number of times. Flows that do not use any link get an infinite rate.
+def max_min_fair_rates(core, incidence, flow_weights, link_bandwidths):
+	n_links = core["n_links"]
+	(entry_flows, entry_links) = (incidence["flows"], incidence["links"])
+	flow_weights = np.asarray(flow_weights, dtype = np.float64)
+	levels = np.where(flow_weights > 0, float("inf"), 0.0)
+	active = flow_weights > 0
+	# Reverse index: Entries of the incidence grouped by link
+	link_entries = np.argsort(entry_links, kind = "stable")
+	link_indptr = np.concatenate(([0], np.cumsum(np.bincount(entry_links, minlength = n_links)))).astype(np.int64)
+	# Number and weight of the active flows on each link, bandwidth used by frozen flows
+	active_entries = active[entry_flows]
+	active_counts = np.bincount(entry_links[active_entries], minlength = n_links)
+	active_weights = np.bincount(entry_links, weights = np.where(active_entries, flow_weights[entry_flows], 0.0), minlength = n_links)
+	frozen_usage = np.zeros(n_links)
+	while True:
+		used = active_counts > 0
+		if not used.any():
+			break
+		# Level at which each link saturates
+		saturation_levels = np.full(n_links, float("inf"))
+		saturation_levels[used] = np.maximum(link_bandwidths[used] - frozen_usage[used], 0.0) / np.maximum(active_weights[used], 1e-300)
+		level = saturation_levels.min()
+		# Freeze all active flows that use a saturated link
+		saturated_links = np.flatnonzero(used & (saturation_levels <= level * (1 + 1e-9)))
+		candidates = entry_flows[link_entries[concatenate_ranges(link_indptr[saturated_links], link_indptr[saturated_links + 1])]]
+		newly_frozen = np.unique(candidates[active[candidates]])
+		levels[newly_frozen] = level
+		active[newly_frozen] = False
+		# Remove the newly frozen flows from the active flows of their links
+		entries = concatenate_ranges(incidence["indptr"][newly_frozen], incidence["indptr"][newly_frozen + 1])
+		(links, weights) = (entry_links[entries], flow_weights[entry_flows[entries]])
+		active_counts -= np.bincount(links, minlength = n_links)
+		active_weights -= np.bincount(links, weights = weights, minlength = n_links)
+		frozen_usage += np.bincount(links, weights = weights * level, minlength = n_links)
+	return flow_weights * levels * (flow_weights > 0)
+
+# Shortest paths from a set of source nodes to all nodes under the given link lengths (positive, inf for unusable
+# links), computed for all sources simultaneously (vectorized Bellman-Ford). Only the source itself and relay-nodes
+# forward packets. Optionally, the relaxation starts from the lengths of known paths (e.g., the shortest paths under
+# previous link lengths), which only needs to update the distances of nodes whose shortest paths changed.
+# Returns two n_sources x n_nodes matrices: The distance from each source to each node and the last link on a
+# shortest path from each source to each node (-1 if there is none). If there are multiple shortest paths, the last
+# link with the lowest priority (default: lowest link-id) is used.
+def shortest_path_trees(core, sources, link_lengths, initial_distances = None, link_priorities = None):
+	(n_nodes, link_src, link_dst) = (core["n_nodes"], core["link_src"], core["link_dst"])
+	n_sources = len(sources)
+	rows = np.arange(n_sources)
+	# Whether node v forwards packets of source s (node-major layout: one row per node, one column per source)
+	forwards = np.tile(core["relay"][:, None], (1, n_sources))
+	forwards[sources, rows] = True
+	link_forwards = forwards[link_src]
+	link_lengths = np.asarray(link_lengths, dtype = np.float64)[:, None]
+	# Incoming links of all nodes in slots: Slot k contains the k-th incoming link of every node with more than k
+	in_order = np.argsort(link_dst, kind = "stable")
+	in_counts = np.bincount(link_dst, minlength = n_nodes)
+	in_ranks = np.arange(len(in_order)) - np.repeat(np.cumsum(in_counts) - in_counts, in_counts)
+	in_slots = [in_order[in_ranks == rank] for rank in range(in_counts.max() if n_nodes > 0 else 0)]
+	# Relax all links of all sources until the distances do not change anymore
+	if initial_distances is None:
+		distances = np.full((n_nodes, n_sources), float("inf"))
+	else:
+		distances = np.array(np.transpose(initial_distances), dtype = np.float64)
+	distances[sources, rows] = 0.0
+	while True:
+		candidates = np.where(link_forwards, distances[link_src], float("inf")) + link_lengths
+		best = distances.copy()
+		for slot_links in in_slots:
+			slot_nodes = link_dst[slot_links]
+			best[slot_nodes] = np.minimum(best[slot_nodes], candidates[slot_links])
+		if np.array_equal(best, distances):
+			break
+		distances = best
+	# The last link of a shortest path is a link whose candidate distance equals the distance of its endpoint
+	tight = np.isfinite(candidates) & (candidates == distances[link_dst])
+	(tight_links, tight_columns) = np.nonzero(tight)
+	link_priorities = np.arange(len(link_src)) if link_priorities is None else link_priorities
+	targets = link_dst[tight_links] * n_sources + tight_columns
+	order = np.lexsort((link_priorities[tight_links], targets))
+	first = np.ones(len(order), dtype = bool)
+	first[1:] = targets[order][1:] != targets[order][:-1]
+	last_links = np.full((n_nodes, n_sources), -1, dtype = np.int64)
+	last_links.flat[targets[order[first]]] = tight_links[order[first]]
+	last_links[sources, rows] = -1
+	(distances, last_links) = (distances.T, last_links.T)
+	return (distances, last_links)
+
+# Forest over (source, node) states given by the last links of shortest paths (see shortest_path_trees).
+# The state of node v in the tree of the s-th source has the id s * n_nodes + v, the sources are the roots.
+def compile_shortest_path_forest(core, sources, last_links):
+	n_nodes = core["n_nodes"]
+	offsets = (np.arange(len(sources)) * n_nodes)[:, None]
+	successors = np.where(last_links >= 0, offsets + core["link_src"][np.maximum(last_links, 0)], -1).ravel()
+	forest = compile_forest(successors, offsets.ravel() + sources)
+	forest["last_links"] = last_links.ravel()
+	return forest
+
+# Per-link loads when the demand demands[s, v] from the s-th source to node v is routed along a shortest path forest
+def shortest_path_forest_link_loads(core, forest, demands):
+	through_traffic = forest_sum_from_leaves(forest, demands.ravel())
+	used = forest["last_links"] >= 0
+	return np.bincount(forest["last_links"][used], weights = through_traffic[used], minlength = core["n_links"])
+
+# Lengths of the paths in a shortest path forest under new link lengths (inf for nodes that are not reached)
+def shortest_path_forest_distances(forest, link_lengths, shape):
+	hop_lengths = np.where(forest["last_links"] >= 0, link_lengths[np.maximum(forest["last_links"], 0)], 0.0)
+	distances = forest_sum_to_root(forest, hop_lengths)
+	distances[forest["depths"] < 0] = float("inf")
+	return distances.reshape(shape)
+
+# Maximum concurrent flow: The largest factor by which all flows can be scaled simultaneously such that no link
+# exceeds its bandwidth if every flow may be split over arbitrary paths (routing-independent throughput bound).
+# Multiplicative-weights scheme in the spirit of Garg and Koenemann, where all flows are routed in every iteration:
+# Links get lengths, every iteration routes all flows along shortest paths and increases the length of every link
+# in proportion to its congestion. The average flow over all iterations is feasible after scaling (lower bound), and
+# by LP duality, every set of link lengths y yields the upper bound sum(bandwidth * y) / sum(demand * distance).
+# Stops once the upper bound is within a factor of (1 + epsilon) of the lower bound or after max_iterations.
+def max_concurrent_flow(core, link_bandwidths, flow_src, flow_dst, flow_weights, epsilon, max_iterations):
+	# Demands per source and destination node
+	(sources, source_ids) = np.unique(flow_src, return_inverse = True)
+	demands = np.zeros((len(sources), core["n_nodes"]))
+	np.add.at(demands, (source_ids, flow_dst), flow_weights)
+	has_demand = demands > 0
+	# Links without bandwidth can not be used
+	capacities = np.asarray(link_bandwidths, dtype = np.float64)
+	usable = capacities > 0
+	lengths = np.where(usable, 1.0 / np.where(usable, capacities, 1.0), float("inf"))
+	total_loads = np.zeros(core["n_links"])
+	(lower_bound, upper_bound, iteration, forest) = (0.0, float("inf"), 0, None)
+	while iteration < max_iterations:
+		iteration += 1
+		# Shortest paths under the current lengths, starting from the paths of the previous iteration
+		initial_distances = shortest_path_forest_distances(forest, lengths, demands.shape) if forest is not None else None
+		(distances, last_links) = shortest_path_trees(core, sources, lengths, initial_distances)
+		if not np.isfinite(distances[has_demand]).all():
+			return {"lower_bound" : 0.0, "upper_bound" : 0.0, "iterations" : iteration, "converged" : True}
+		forest = compile_shortest_path_forest(core, sources, last_links)
+		# Dual (upper) bound for the current link lengths
+		upper_bound = min(upper_bound, (capacities[usable] * lengths[usable]).sum() / (demands[has_demand] * distances[has_demand]).sum())
+		# Route all flows along their shortest paths and scale the average flow to the link bandwidths (lower bound)
+		loads = shortest_path_forest_link_loads(core, forest, demands)
+		total_loads += loads
+		congestions = np.where(usable, loads / np.where(usable, capacities, 1.0), 0.0)
+		max_total_congestion = (total_loads[usable] / capacities[usable]).max() if usable.any() else 0.0
+		lower_bound = max(lower_bound, (iteration / max_total_congestion) if max_total_congestion > 0 else float("inf"))
+		if upper_bound <= (1 + epsilon) * lower_bound:
+			break
+		# Increase the lengths of congested links
+		lengths *= 1 + epsilon * congestions / congestions.max()
+	# The bounds are only within a factor of 1 + epsilon if the loop was not stopped by the iteration limit
+	converged = upper_bound <= (1 + epsilon) * lower_bound
+	return {"lower_bound" : lower_bound, "upper_bound" : upper_bound, "iterations" : iteration, "converged" : converged}
+
+# Next hops of shortest-path-lowest-id-first routing (see generate_routing.py) towards the given destination chiplets,
+# optionally without some links (link_mask[l] = False). The paths towards a destination are the reversed shortest
+# paths from the destination in the reversed network, where only the destination and relay-nodes forward packets.
+# If a node has multiple next hops on shortest paths, interposer-routers are preferred over chiplets and lower ids
+# over higher ids. Returns a n_destinations x n_nodes matrix of next-hop links (-1 if there is none).
+def shortest_path_lowest_id_first_next_links(core, destinations, link_mask = None):
+	(n_nodes, n_chiplets) = (core["n_nodes"], core["n_chiplets"])
+	reversed_core = {"n_nodes" : n_nodes, "relay" : core["relay"], "link_src" : core["link_dst"], "link_dst" : core["link_src"]}
+	link_lengths = np.ones(core["n_links"]) if link_mask is None else np.where(link_mask, 1.0, float("inf"))
+	# Rank of the next node: Interposer-routers first (by id), then chiplets (by id)
+	link_priorities = (core["link_dst"] - n_chiplets) % n_nodes
+	(_, next_links) = shortest_path_trees(reversed_core, destinations, link_lengths, link_priorities = link_priorities)
+	return next_links
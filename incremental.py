@@ -0,0 +1,352 @@
+# Import python libraries
+import sys
+import numpy as np
+
+# Import RapidChiplet files
+import helpers as hlp
+import ici_core as icc
+import compact_routing_table as crt
+import validation as val
+import rapidchiplet as rc
+
+# Stateful evaluator for designs that are edited one step at a time, e.g., during a design space exploration.
+# The evaluator owns the given inputs and intermediates (same format as for rapidchiplet()) and updates them in place:
+# - add_link / remove_link:	Only the destinations whose routes can change are rerouted and the per-link data is moved
+#							to the new link-ids. Rerouting uses shortest-path-lowest-id-first routing (as generate_routing
+#							with "splif"), i.e., for "splif" routing tables the result is identical to regenerating the
+#							routing table. Topology edits require a routing table of type "default".
+# - move_chiplet:			Only the lengths and latencies of the links attached to the moved chiplet are recomputed.
+# - set_traffic:			Only the destinations whose flows were added, removed, or reweighted are updated.
+# Link loads, flow counts, and latency sums are stored per destination. After an edit, only the flows towards the
+# affected destinations are walked again and their contribution to the per-link totals is replaced.
+# Limitation: Topology edits still rebuild the ICI core (linear in the number of links) and recompile the destination
+# trees of all destinations (linear in chiplets x nodes). Only the rerouting and the flow updates are incremental.
+class IncrementalEvaluator:
+
+	def __init__(self, inputs, intermediates = None, verbose = False, validate = True, use_cache = False):
+		self.inputs = inputs
+		self.intermediates = intermediates if intermediates is not None else {}
+		# Store options in inputs
+		inputs["verbose"] = verbose
+		inputs["validate"] = validate
+		inputs["use_cache"] = use_cache
+		# Load inputs and compute intermediates if not already present
+		required_inputs = ["chiplets","packaging","placement","topology","routing_table","traffic_by_chiplet"]
+		hlp.read_required_inputs(inputs, required_inputs)
+		# The routing table is updated in place as compact routing table (see compact_routing_table.py)
+		inputs["routing_table"] = crt.as_compact_routing_table(inputs["routing_table"])
+		required_intermediates = ["ici_core","placement_geometry","link_lengths","link_latencies","link_bandwidths","node_latencies","traffic_flows","destination_trees","flow_states","path_incidence","flow_latencies"]
+		hlp.compute_required_intermediates(inputs, self.intermediates, required_intermediates)
+		# Per-destination link loads, flow counts, and latency sums (computed from the paths of all flows)
+		(n_chiplets, n_links) = (self.intermediates["ici_core"]["n_chiplets"], self.intermediates["ici_core"]["n_links"])
+		self.destination_link_loads = np.zeros((n_chiplets, n_links))
+		self.destination_link_flows = np.zeros((n_chiplets, n_links), dtype = np.int64)
+		self.destination_latency_sums = np.zeros(n_chiplets)
+		self.destination_min_latencies = np.full(n_chiplets, float("inf"))
+		self.destination_max_latencies = np.full(n_chiplets, -float("inf"))
+		self.link_flows = np.zeros(n_links, dtype = np.int64)
+		self.intermediates["link_loads"] = np.zeros(n_links)
+		self.group_flows()
+		all_flows = np.arange(len(self.intermediates["flow_latencies"]), dtype = np.int64)
+		self.set_destination_statistics(np.arange(n_chiplets), all_flows, self.intermediates["path_incidence"])
+
+	################################################################################################################
+	# Edits
+	################################################################################################################
+
+	# Add a link, given as an entry of the topology (with the endpoints "ep1" and "ep2")
+	def add_link(self, link):
+		self.check_routing_table_type()
+		self.check_new_link(link)
+		core = self.intermediates["ici_core"]
+		node_1 = core["node_index"][(link["ep1"]["type"], link["ep1"]["outer_id"])]
+		node_2 = core["node_index"][(link["ep2"]["type"], link["ep2"]["outer_id"])]
+		if node_2 in core["out_links"][node_1]:
+			print("ERROR: The nodes %s and %s are already connected" % (str(core["nodes"][node_1]), str(core["nodes"][node_2])))
+			sys.exit(1)
+		# The new link changes the routes towards a destination if it is at least as short as the current route
+		# from one of its endpoints, via the other endpoint (which needs to relay traffic unless it is the destination)
+		(n_chiplets, n_nodes) = (core["n_chiplets"], core["n_nodes"])
+		depths = self.intermediates["destination_trees"]["depths"].reshape(n_chiplets, n_nodes)
+		affected = np.zeros(n_chiplets, dtype = bool)
+		for (src, dst) in [(node_1, node_2), (node_2, node_1)]:
+			can_forward = (depths[:,dst] >= 0) & (core["relay"][dst] | (np.arange(n_chiplets) == dst))
+			affected |= can_forward & ((depths[:,src] < 0) | (depths[:,dst] + 1 <= depths[:,src]))
+		# Update the topology and reroute the affected destinations
+		self.inputs["topology"] = self.inputs["topology"] + [link]
+		self.invalidate_inputs(["topology","routing_table"])
+		self.rebuild_ici_core()
+		self.reroute_destinations(np.flatnonzero(affected))
+
+	# Remove the link between two nodes, given as labels, e.g., (chiplet, 0) and (irouter, 7)
+	def remove_link(self, node_1, node_2):
+		self.check_routing_table_type()
+		core = self.intermediates["ici_core"]
+		(node_1, node_2) = (tuple(node_1), tuple(node_2))
+		(nid_1, nid_2) = (core["node_index"].get(node_1), core["node_index"].get(node_2))
+		if nid_1 is None or nid_2 is None or nid_2 not in core["out_links"][nid_1]:
+			print("ERROR: There is no link between the nodes %s and %s" % (str(node_1), str(node_2)))
+			sys.exit(1)
+		link_id = core["out_links"][nid_1][nid_2]
+		# All destinations whose routes use the link (in either direction) need to be rerouted
+		(n_chiplets, n_nodes) = (core["n_chiplets"], core["n_nodes"])
+		state_links = self.intermediates["destination_trees"]["state_links"].reshape(n_chiplets, n_nodes)
+		affected = ((state_links == link_id) | (state_links == (link_id ^ 1))).any(axis = 1)
+		# Update the topology (remove all entries that connect the two nodes) and reroute the affected destinations
+		endpoints = {node_1, node_2}
+		self.inputs["topology"] = [x for x in self.inputs["topology"] if {(x["ep1"]["type"], x["ep1"]["outer_id"]), (x["ep2"]["type"], x["ep2"]["outer_id"])} != endpoints]
+		self.invalidate_inputs(["topology","routing_table"])
+		self.rebuild_ici_core()
+		self.reroute_destinations(np.flatnonzero(affected))
+
+	# Move a chiplet to a new position (dictionary with "x" and "y") and optionally change its rotation
+	def move_chiplet(self, chiplet_id, position, rotation = None):
+		chiplets = self.inputs["chiplets"]
+		packaging = self.inputs["packaging"]
+		chiplet_desc = self.inputs["placement"]["chiplets"][chiplet_id]
+		chiplet_desc["position"] = {"x" : position["x"], "y" : position["y"]}
+		if rotation is not None:
+			chiplet_desc["rotation"] = rotation
+		self.invalidate_inputs(["placement"])
+		# Update the geometry of the moved chiplet
+		placement_geometry = self.intermediates["placement_geometry"]
+		key = (chiplet_desc["name"], chiplet_desc["rotation"])
+		if key not in placement_geometry["rotated_geometries"]:
+			placement_geometry["rotated_geometries"][key] = hlp.get_rotated_chiplet_geometry(chiplets[chiplet_desc["name"]], chiplet_desc["rotation"])
+		rotated_geometry = placement_geometry["rotated_geometries"][key]
+		(start, end) = (placement_geometry["phy_offsets"][chiplet_id], placement_geometry["phy_offsets"][chiplet_id + 1])
+		placement_geometry["chiplet_positions"][chiplet_id] = (position["x"], position["y"])
+		placement_geometry["chiplet_dimensions"][chiplet_id] = rotated_geometry["dimensions"]
+		placement_geometry["phy_positions"][start:end] = np.asarray(rotated_geometry["phys"]).reshape(-1, 2) + (position["x"], position["y"])
+		# The area is recomputed when needed
+		self.intermediates.pop("area", None)
+		# Update the lengths and latencies of the links attached to the moved chiplet
+		core = self.intermediates["ici_core"]
+		link_ids = np.flatnonzero((core["link_src"][0::2] == chiplet_id) | (core["link_dst"][0::2] == chiplet_id))
+		lengths = rc.get_link_lengths(packaging, self.inputs["topology"], core, placement_geometry, link_ids)
+		latencies = rc.get_link_latencies(packaging, lengths)
+		directed_link_ids = np.stack((2 * link_ids, 2 * link_ids + 1), axis = 1).reshape(-1)
+		self.intermediates["link_lengths"][directed_link_ids] = np.repeat(lengths, 2)
+		changed_link_ids = directed_link_ids[self.intermediates["link_latencies"][directed_link_ids] != np.repeat(latencies, 2)]
+		self.intermediates["link_latencies"][directed_link_ids] = np.repeat(latencies, 2)
+		# Routes do not change, only the latencies of flows that use one of the changed links
+		affected = (self.destination_link_flows[:,changed_link_ids] > 0).any(axis = 1)
+		self.intermediates.pop("state_latencies", None)
+		self.intermediates.pop("state_latency_components", None)
+		self.update_destinations(np.flatnonzero(affected))
+
+	# Replace the traffic (traffic_by_chiplet dictionary)
+	def set_traffic(self, traffic_by_chiplet):
+		old_traffic_by_chiplet = self.inputs["traffic_by_chiplet"]
+		if self.inputs["validate"]:
+			val.validate_traffic_by_chiplet(dict(self.inputs, traffic_by_chiplet = traffic_by_chiplet))
+		# Destinations with added, removed, or reweighted flows
+		changed = set(did for ((sid, did), weight) in traffic_by_chiplet.items() if old_traffic_by_chiplet.get((sid, did)) != weight)
+		changed.update(did for (sid, did) in old_traffic_by_chiplet.keys() if (sid, did) not in traffic_by_chiplet)
+		# Keep the states and latencies of all other flows
+		n_chiplets = self.intermediates["ici_core"]["n_chiplets"]
+		old_traffic_flows = self.intermediates["traffic_flows"]
+		(flow_src, flow_dst, flow_weights) = icc.traffic_to_arrays(traffic_by_chiplet)
+		old_keys = old_traffic_flows["flow_dst"] * n_chiplets + old_traffic_flows["flow_src"]
+		keys = flow_dst * n_chiplets + flow_src
+		if len(old_keys) > 0:
+			old_order = np.argsort(old_keys)
+			pos = old_order[np.minimum(np.searchsorted(old_keys[old_order], keys), len(old_keys) - 1)]
+			found = old_keys[pos] == keys
+		else:
+			# The current traffic is empty, i.e., all flows are new
+			pos = np.zeros(len(keys), dtype = np.int64)
+			found = np.zeros(len(keys), dtype = bool)
+		states_per_destination = self.intermediates["destination_trees"]["states_per_destination"]
+		flow_states = flow_dst * states_per_destination + flow_src
+		flow_states[found] = self.intermediates["flow_states"][pos[found]]
+		flow_latencies = np.zeros(len(keys))
+		flow_latencies[found] = self.intermediates["flow_latencies"][pos[found]]
+		# Update the traffic and the flows towards the changed destinations
+		self.inputs["traffic_by_chiplet"] = traffic_by_chiplet
+		self.invalidate_inputs(["traffic_by_chiplet"])
+		self.intermediates["traffic_flows"] = {"flow_src" : flow_src, "flow_dst" : flow_dst, "flow_weights" : flow_weights}
+		self.intermediates["flow_states"] = flow_states
+		self.intermediates["flow_latencies"] = flow_latencies
+		self.group_flows()
+		self.update_destinations(np.array(sorted(changed), dtype = np.int64))
+
+	################################################################################################################
+	# Results
+	################################################################################################################
+
+	# Zero-load latency (same format as the latency metric), aggregated from the per-destination latency sums
+	def latency(self):
+		flow_weights = self.intermediates["traffic_flows"]["flow_weights"]
+		if len(flow_weights) == 0:
+			print("ERROR: The latency is undefined for a traffic without flows")
+			sys.exit(1)
+		return {
+			"min" : int(self.destination_min_latencies.min()),
+			"avg" : float(self.destination_latency_sums.sum() / flow_weights.sum()),
+			"max" : int(self.destination_max_latencies.max()),
+		}
+
+	# Aggregate throughput (same format as the throughput metric), computed from the maintained link loads
+	def throughput(self):
+		flow_weights = self.intermediates["traffic_flows"]["flow_weights"]
+		aggregate_throughput = rc.get_aggregate_throughput(self.intermediates["link_bandwidths"], self.intermediates["link_loads"], flow_weights.sum())
+		return {"aggregate_throughput" : float(aggregate_throughput)}
+
+	# Compute any selected metrics (see rapidchiplet()) on the current design. Intermediates that are maintained by
+	# the evaluator are reused, all other intermediates are recomputed when needed.
+	def evaluate(self, do_compute, n_workers = None):
+		return rc.rapidchiplet(self.inputs, self.intermediates, do_compute, None, self.inputs["verbose"], self.inputs["validate"], n_workers, self.inputs["use_cache"])
+
+	################################################################################################################
+	# Internal state
+	################################################################################################################
+
+	# The endpoints of a new link must exist and their PHYs (chiplets) or ports (interposer routers) must be unused
+	def check_new_link(self, link):
+		chiplets = self.inputs["chiplets"]
+		placement = self.inputs["placement"]
+		core = self.intermediates["ici_core"]
+		used = set((ep["type"], ep["outer_id"], ep["inner_id"]) for x in self.inputs["topology"] for ep in [x["ep1"], x["ep2"]])
+		for ep in [link["ep1"], link["ep2"]]:
+			if (ep["type"], ep["outer_id"]) not in core["node_index"]:
+				print("ERROR: The link endpoint %s does not exist" % str((ep["type"], ep["outer_id"])))
+				sys.exit(1)
+			if ep["type"] == "chiplet":
+				n_inner = len(chiplets[placement["chiplets"][ep["outer_id"]]["name"]]["phys"])
+			else:
+				n_inner = placement["interposer_routers"][ep["outer_id"]]["ports"]
+			if not (0 <= ep["inner_id"] < n_inner):
+				print("ERROR: Invalid inner-id %s of the link endpoint %s" % (str(ep["inner_id"]), str((ep["type"], ep["outer_id"]))))
+				sys.exit(1)
+			if (ep["type"], ep["outer_id"], ep["inner_id"]) in used:
+				print("ERROR: The %s %d of %s %d is already used" % ("PHY" if ep["type"] == "chiplet" else "port", ep["inner_id"], ep["type"], ep["outer_id"]))
+				sys.exit(1)
+			used.add((ep["type"], ep["outer_id"], ep["inner_id"]))
+
+	# Topology edits reroute destinations, which is only possible if the next hop only depends on the destination
+	def check_routing_table_type(self):
+		routing_table = self.inputs["routing_table"]
+		if routing_table.routing_table_type != "default":
+			print("ERROR: Adding or removing links requires a routing table of type \"default\"")
+			sys.exit(1)
+		# Rerouted entries are stored with the node-ids of the ICI core
+		core = self.intermediates["ici_core"]
+		if (routing_table.n_chiplets, routing_table.n_nodes) != (core["n_chiplets"], core["n_nodes"]):
+			print("ERROR: Adding or removing links requires a routing table with entries for all nodes")
+			sys.exit(1)
+
+	# Forget the content hashes (used by the persistent cache) of edited inputs and the intermediates that
+	# are not maintained by the evaluator (they are recomputed when needed)
+	def invalidate_inputs(self, input_names):
+		for input_name in input_names:
+			self.inputs.get("content_hashes", {}).pop(input_name, None)
+		for intermediate_name in ["compiled_routing_table","symmetry","path_incidence","state_latencies","state_latency_components"]:
+			self.intermediates.pop(intermediate_name, None)
+
+	# Group the flows by destination: The flows towards destination d are flow_order[flow_ptr[d]:flow_ptr[d+1]]
+	def group_flows(self):
+		flow_dst = self.intermediates["traffic_flows"]["flow_dst"]
+		self.flow_order = np.argsort(flow_dst, kind = "stable")
+		self.flow_ptr = np.concatenate(([0], np.cumsum(np.bincount(flow_dst, minlength = self.intermediates["ici_core"]["n_chiplets"])))).astype(np.int64)
+
+	# Rebuild the ICI core after a topology edit and move all per-link data to the new link-ids
+	def rebuild_ici_core(self):
+		chiplets = self.inputs["chiplets"]
+		packaging = self.inputs["packaging"]
+		placement = self.inputs["placement"]
+		topology = self.inputs["topology"]
+		old_core = self.intermediates["ici_core"]
+		core = icc.construct_ici_core(chiplets, placement, topology)
+		self.intermediates["ici_core"] = core
+		# New id of each old link (-1 for removed links)
+		new_ids = icc.find_links(core, old_core["link_src"], old_core["link_dst"])
+		kept = new_ids >= 0
+		def move_links(values):
+			moved = np.zeros(values.shape[:-1] + (core["n_links"],), dtype = values.dtype)
+			moved[...,new_ids[kept]] = values[...,kept]
+			return moved
+		for intermediate_name in ["link_lengths","link_latencies","link_bandwidths","link_loads"]:
+			self.intermediates[intermediate_name] = move_links(self.intermediates[intermediate_name])
+		self.destination_link_loads = move_links(self.destination_link_loads)
+		self.destination_link_flows = move_links(self.destination_link_flows)
+		self.link_flows = move_links(self.link_flows)
+		# Compute the length, latency, and bandwidth of added links
+		added = np.ones(core["n_links"], dtype = bool)
+		added[new_ids[kept]] = False
+		added_link_ids = np.flatnonzero(added[0::2])
+		lengths = rc.get_link_lengths(packaging, topology, core, self.intermediates["placement_geometry"], added_link_ids)
+		latencies = rc.get_link_latencies(packaging, lengths)
+		for (link_id, length, latency) in zip(added_link_ids, lengths, latencies):
+			link_bw = rc.get_link_bandwidth(chiplets, packaging, placement, topology[core["link_topology_ids"][2 * link_id]])
+			for lid in [2 * link_id, 2 * link_id + 1]:
+				self.intermediates["link_lengths"][lid] = length
+				self.intermediates["link_latencies"][lid] = latency
+				self.intermediates["link_bandwidths"][lid] = link_bw / 2.0
+		# Routes that used a removed link end there (the affected destinations are rerouted afterwards)
+		state_links = self.intermediates["destination_trees"]["state_links"]
+		self.state_links = np.where(state_links >= 0, new_ids[state_links], -1).reshape(core["n_chiplets"], core["n_nodes"])
+
+	# Reroute the given destinations with shortest-path-lowest-id-first routing, update their entries in the routing
+	# table, and update the flows towards these destinations
+	def reroute_destinations(self, destinations):
+		core = self.intermediates["ici_core"]
+		link_dst = core["link_dst"]
+		old_state_links = self.state_links[destinations]
+		self.state_links[destinations] = icc.shortest_path_lowest_id_first_next_links(core, destinations)
+		# Update the routing table entries whose next hop changed
+		routing_table = self.inputs["routing_table"]
+		(rows, nids) = np.nonzero(old_state_links != self.state_links[destinations])
+		lids = self.state_links[destinations[rows], nids]
+		routing_table.next_hops[nids, destinations[rows]] = np.where(lids >= 0, link_dst[lids], crt.no_route)
+		routing_table.has_node[nids] = True
+		# Rebuild the destination trees
+		compiled_routing_table = {"state_links" : self.state_links.reshape(-1), "states_per_destination" : core["n_nodes"], "link_ports" : link_dst}
+		self.intermediates["destination_trees"] = icc.compile_destination_trees(core, compiled_routing_table)
+		self.update_destinations(destinations)
+
+	# Walk the paths of all flows towards the given destinations and update their states, latencies, and statistics
+	def update_destinations(self, destinations):
+		core = self.intermediates["ici_core"]
+		destination_trees = self.intermediates["destination_trees"]
+		traffic_flows = self.intermediates["traffic_flows"]
+		flows = self.flow_order[icc.concatenate_ranges(self.flow_ptr[destinations], self.flow_ptr[destinations + 1])]
+		(flow_src, flow_dst) = (traffic_flows["flow_src"][flows], traffic_flows["flow_dst"][flows])
+		flow_states = icc.destination_tree_flow_states(core, destination_trees, flow_src, flow_dst)
+		incidence = icc.compile_path_incidence(core, destination_trees, flow_states)
+		path_latencies = icc.sum_over_paths(incidence, self.intermediates["link_latencies"]) + icc.sum_over_relays(core, incidence, self.intermediates["node_latencies"]["relay_latency"])
+		self.intermediates["flow_states"][flows] = flow_states
+		self.intermediates["flow_latencies"][flows] = rc.get_end_to_end_latencies(self.intermediates, flow_src, flow_dst, path_latencies)
+		self.set_destination_statistics(destinations, flows, incidence)
+
+	# Replace the per-destination statistics of the given destinations by the ones of the given flows (all flows towards
+	# these destinations, their paths are given by the incidence) and update the per-link totals
+	def set_destination_statistics(self, destinations, flows, incidence):
+		n_links = self.intermediates["ici_core"]["n_links"]
+		flow_dst = self.intermediates["traffic_flows"]["flow_dst"][flows]
+		flow_weights = self.intermediates["traffic_flows"]["flow_weights"][flows]
+		flow_latencies = self.intermediates["flow_latencies"][flows]
+		# Index of each flow's destination in the given list of destinations
+		positions = np.zeros(self.intermediates["ici_core"]["n_chiplets"], dtype = np.int64)
+		positions[destinations] = np.arange(len(destinations))
+		flow_positions = positions[flow_dst]
+		# Per-destination flow counts and loads of all links
+		entry_keys = flow_positions[incidence["flows"]] * n_links + incidence["links"]
+		size = len(destinations) * n_links
+		link_flows = np.bincount(entry_keys, minlength = size).reshape(-1, n_links)
+		link_loads = np.bincount(entry_keys, weights = flow_weights[incidence["flows"]], minlength = size).reshape(-1, n_links)
+		# Replace the contribution of the given destinations to the per-link totals
+		self.link_flows = self.link_flows + link_flows.sum(axis = 0) - self.destination_link_flows[destinations].sum(axis = 0)
+		total_link_loads = self.intermediates["link_loads"] + link_loads.sum(axis = 0) - self.destination_link_loads[destinations].sum(axis = 0)
+		total_link_loads[self.link_flows == 0] = 0.0		# Avoid rounding errors on links that are no longer used
+		self.intermediates["link_loads"] = total_link_loads
+		self.destination_link_flows[destinations] = link_flows
+		self.destination_link_loads[destinations] = link_loads
+		# Per-destination latency sums, minima, and maxima
+		self.destination_latency_sums[destinations] = np.bincount(flow_positions, weights = flow_weights * flow_latencies, minlength = len(destinations))
+		min_latencies = np.full(len(destinations), float("inf"))
+		max_latencies = np.full(len(destinations), -float("inf"))
+		np.minimum.at(min_latencies, flow_positions, flow_latencies)
+		np.maximum.at(max_latencies, flow_positions, flow_latencies)
+		self.destination_min_latencies[destinations] = min_latencies
+		self.destination_max_latencies[destinations] = max_latencies
@@ -2,35 +2,42 @@
 import argparse
 import sys
 import os
+import numpy as np
 
 
 # RapidChiplet modules
 parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 sys.path.insert(0, parent_dir)
 import helpers as hlp 
+import trace_store as trs
 
 
 def convert_trace_to_traffic(trace):
-	# Convert trace to traffic
+	# Convert trace to traffic (chunk by chunk, entries are ordered by their first occurrence in the trace)
 	traffic = {}
-	for packet in trace:
-		src_node = (packet["source_chiplet"], packet["source_unit"])
-		dst_node = (packet["destination_chiplet"], packet["destination_unit"])
-		n_flits = packet["size_in_flits"]
-		if (src_node, dst_node) not in traffic:
-			traffic[(src_node, dst_node)] = 0
-		traffic[(src_node, dst_node)] += n_flits
+	(min_cycles, max_cycles) = ([], [])
+	for (_, packets, _, _) in trs.iterate_trace_chunks(trace):
+		nodes = np.stack([packets["source_chiplet"], packets["source_unit"], packets["destination_chiplet"], packets["destination_unit"]], axis = 1)
+		(unique_nodes, first_index, inverse) = np.unique(nodes, axis = 0, return_index = True, return_inverse = True)
+		n_flits = np.bincount(inverse.reshape(-1), weights = packets["size_in_flits"], minlength = len(unique_nodes))
+		order = np.argsort(first_index)
+		for ((scid, suid, dcid, duid), flits) in zip(unique_nodes[order].tolist(), n_flits[order].tolist()):
+			src_node = (scid, suid)
+			dst_node = (dcid, duid)
+			if (src_node, dst_node) not in traffic:
+				traffic[(src_node, dst_node)] = 0
+			traffic[(src_node, dst_node)] += int(flits)
+		min_cycles.append(int(packets["injection_cycle"].min()))
+		max_cycles.append(int(packets["injection_cycle"].max()))
 	# Divide the traffic entries by the total number of cycle that the trace covers
-	min_cycle = min([packet["injection_cycle"] for packet in trace])
-	max_cycle = max([packet["injection_cycle"] for packet in trace])
-	total_cycles = max_cycle - min_cycle
+	total_cycles = max(max_cycles) - min(min_cycles)
 	for key in traffic:
 		traffic[key] /= total_cycles
 	# Return the traffic
 	return traffic
 
 def trace_to_traffic(trace_file, output_file):
-	trace = hlp.read_json(trace_file)
+	trace = trs.read_trace(trace_file)
 	traffic = convert_trace_to_traffic(trace)
 	# Store results
 	hlp.write_json("./traffic_by_unit/%s.json" % output_file, traffic)
@@ -85,7 +85,7 @@ if __name__ == "__main__":
 	parser.add_argument("-of", "--output_file", required = True, help = "Name of the output trace file (is stored in ./inputs/traces/)")
 	args = parser.parse_args()
 	# Read the design file
-	inputs = {"design" : hlp.read_json(filename = args.design_file), "validate" : True, "verbose" : True}
+	inputs = {"design" : hlp.read_design(filename = args.design_file), "validate" : True, "verbose" : True}
 	# Call the main function
 	parse_netrace_trace(inputs, args.input_file, args.output_file)
 
@@ -1,81 +1,103 @@
 # Import python libraries
+import os
 import sys
 import math
 import time
+import statistics
 import argparse
+import numpy as np
 
 # Import RapidChiplet files
 import helpers as hlp
+import ici_core as icc
+import validation as val
 import booksim_wrapper as bsw
+import compact_routing_table as crt
 
 ################################################################################################################
 # Intermediates
 ################################################################################################################
 
-def compute_link_lengths(inputs, intermediates):
+def compute_ici_core(inputs, intermediates):
 	# Load inputs if not already loaded
-	required_inputs = ["chiplets","packaging","placement","topology"]
+	required_inputs = ["chiplets","placement","topology"]
+	hlp.read_required_inputs(inputs, required_inputs)
+	chiplets = inputs["chiplets"]
+	placement = inputs["placement"]
+	topology = inputs["topology"]
+	# Map nodes and links to dense integer ids
+	return icc.construct_ici_core(chiplets, placement, topology)
+
+def compute_placement_geometry(inputs, intermediates):
+	# Load inputs if not already loaded
+	required_inputs = ["chiplets","placement"]
 	hlp.read_required_inputs(inputs, required_inputs)
 	chiplets = inputs["chiplets"]
-	packaging = inputs["packaging"]
 	placement = inputs["placement"]
+	# Rotated chiplet geometries and absolute PHY positions
+	return hlp.compute_placement_geometry(chiplets, placement)
+
+def compute_link_lengths(inputs, intermediates):
+	# Load inputs if not already loaded
+	required_inputs = ["packaging","topology"]
+	hlp.read_required_inputs(inputs, required_inputs)
+	packaging = inputs["packaging"]
 	topology = inputs["topology"]
-	# Iterate through the links in the topology
-	link_lengths = {}
-	for link in topology:
-		endpoints = [link["ep1"],link["ep2"]]
-		# Compute positions of both link-endpoints
-		positions = []
-		node_ids = []
-		for endpoint in endpoints:
+	# Load intermediates if not already loaded
+	required_intermediates = ["ici_core","placement_geometry"]
+	hlp.compute_required_intermediates(inputs, intermediates, required_intermediates)
+	ici_core = intermediates["ici_core"]
+	placement_geometry = intermediates["placement_geometry"]
+	# Compute link lengths (one length per directed link)
+	lengths = get_link_lengths(packaging, topology, ici_core, placement_geometry, np.arange(ici_core["n_links"] // 2))
+	link_lengths = np.repeat(lengths, 2)
+	# Return results
+	return link_lengths
+
+# Lengths of the (undirected) links with the given ids
+def get_link_lengths(packaging, topology, ici_core, placement_geometry, link_ids):
+	# Index of each link-endpoint in the array of endpoint positions (PHYs followed by interposer-routers)
+	n_phys = len(placement_geometry["phy_positions"])
+	positions = np.concatenate((placement_geometry["phy_positions"], placement_geometry["irouter_positions"]))
+	endpoints = np.zeros((len(link_ids), 2), dtype = np.int64)
+	for (idx, tid) in enumerate(ici_core["link_topology_ids"][2 * np.asarray(link_ids, dtype = np.int64)]):
+		link = topology[tid]
+		for (eid, endpoint) in enumerate([link["ep1"],link["ep2"]]):
 			# Endpoint is a chiplet
 			if endpoint["type"] == "chiplet":
-				chiplet_desc = placement["chiplets"][endpoint["outer_id"]]
-				chiplet = chiplets[chiplet_desc["name"]]
-				# Rotate the chiplet if needed  
-				chiplet = hlp.rotate_chiplet(chiplet, chiplet_desc["rotation"])
-				phy = chiplet["phys"][endpoint["inner_id"]]
-				positions.append((chiplet_desc["position"]["x"] + phy["x"],chiplet_desc["position"]["y"] + phy["y"]))
-				node_ids.append(("chiplet", endpoint["outer_id"]))
+				endpoints[idx, eid] = placement_geometry["phy_offsets"][endpoint["outer_id"]] + endpoint["inner_id"]
 			# Endpoint is an interposer router
 			else:
-				irouter = placement["interposer_routers"][endpoint["outer_id"]]
-				positions.append((irouter["position"]["x"],irouter["position"]["y"]))
-				node_ids.append(("irouter", endpoint["outer_id"]))
-		# Compute link length
-		if packaging["link_routing"] == "manhattan":
-			length = sum([abs(positions[0][dim] - positions[1][dim]) for dim in range(2)])
-		elif packaging["link_routing"] == "euclidean":
-			length =  math.sqrt(sum([abs(positions[0][dim] - positions[1][dim])**2 for dim in range(2)]))
-		link_lengths[tuple(node_ids)] = length
-		link_lengths[tuple(reversed(node_ids))] = length
-	# Return results
-	return link_lengths
+				endpoints[idx, eid] = n_phys + endpoint["outer_id"]
+	# Compute the distance between the endpoints
+	distances = np.abs(positions[endpoints[:,0]] - positions[endpoints[:,1]])
+	if packaging["link_routing"] == "manhattan":
+		lengths = distances.sum(axis = 1)
+	elif packaging["link_routing"] == "euclidean":
+		lengths = np.sqrt((distances**2).sum(axis = 1))
+	return lengths
 
 def compute_link_latencies(inputs, intermediates):
 	# Load inputs if not already loaded
-	required_inputs = ["packaging","topology"]
+	required_inputs = ["packaging"]
 	hlp.read_required_inputs(inputs, required_inputs)
 	packaging = inputs["packaging"]
-	topology = inputs["topology"]
 	# Load intermediates if not already loaded
 	required_intermediates = ["link_lengths"]
 	hlp.compute_required_intermediates(inputs, intermediates, required_intermediates)
 	link_lengths = intermediates["link_lengths"]
 	# Compute per-link latencies
-	link_latencies = {}
-	for link in topology:
-		node_id_1 = (link["ep1"]["type"],link["ep1"]["outer_id"])
-		node_id_2 = (link["ep2"]["type"],link["ep2"]["outer_id"])
-		if packaging["link_latency_type"] == "constant":
-			lat = int(math.ceil(packaging["link_latency"]))
-		else:
-			lat = int(math.ceil(eval(packaging["link_latency"])(link_lengths[(node_id_1,node_id_2)])))
-		link_latencies[(node_id_1,node_id_2)] = lat
-		link_latencies[(node_id_2,node_id_1)] = lat
+	link_latencies = get_link_latencies(packaging, link_lengths)
 	# Return results
 	return link_latencies
 
+# Latencies of links with the given lengths
+def get_link_latencies(packaging, link_lengths):
+	if packaging["link_latency_type"] == "constant":
+		return np.full(len(link_lengths), int(math.ceil(packaging["link_latency"])), dtype = np.int64)
+	link_latency_function = hlp.compile_packaging_function(packaging["link_latency"])
+	return np.ceil(link_latency_function(link_lengths)).astype(np.int64)
+
 def compute_link_bandwidths(inputs, intermediates):
 	# Load inputs if not already loaded
 	required_inputs = ["chiplets","packaging","placement","topology"]
@@ -84,29 +106,319 @@ def compute_link_bandwidths(inputs, intermediates):
 	packaging = inputs["packaging"]
 	placement = inputs["placement"]
 	topology = inputs["topology"]
+	# Load intermediates if not already loaded
+	required_intermediates = ["ici_core"]
+	hlp.compute_required_intermediates(inputs, intermediates, required_intermediates)
+	ici_core = intermediates["ici_core"]
 	# Compute per-link bandwidths
-	link_bandwidths = {}
-	for link in topology:
-		link_bw = float("inf")
-		for ep_lab in [x for x in link.keys() if "ep" in x]:
-			ep = link[ep_lab]
-			if ep["type"] == "chiplet":
-				chiplet = chiplets[placement["chiplets"][ep["outer_id"]]["name"]]
-				phy = chiplet["phys"][ep["inner_id"]]
-				ac = chiplet["dimensions"]["x"] * chiplet["dimensions"]["y"]			# Chiplet area in mm^2
-				fp = chiplet["fraction_power_bumps"]									# Fraction of bumps used for power 
-				fca = phy["fraction_bump_area"]											# Fraction of bump area	use by PHY
-				pb = packaging["bump_pitch"]											# Bump pitch in mm
-				ndw = packaging["non_data_wires"]										# Number of non-data wires per link
-				lbw = int(math.floor((ac * (1-fp) * fca * (1/pb)**2) - ndw))			# Link bandwidth in bit/cycle
-				link_bw = min(link_bw, lbw)
-		node_id_1 = (link["ep1"]["type"],link["ep1"]["outer_id"])
-		node_id_2 = (link["ep2"]["type"],link["ep2"]["outer_id"])
-		link_bandwidths[(node_id_1,node_id_2)] = link_bw / 2.0			# Divide by 2 because each link is counted twice, once in each direction
-		link_bandwidths[(node_id_2,node_id_1)] = link_bw / 2.0			# Divide by 2 because each link is counted twice, once in each direction
+	link_bandwidths = np.zeros(ici_core["n_links"])
+	for lid in range(0, ici_core["n_links"], 2):
+		link_bw = get_link_bandwidth(chiplets, packaging, placement, topology[ici_core["link_topology_ids"][lid]])
+		link_bandwidths[lid] = link_bw / 2.0			# Divide by 2 because each link is counted twice, once in each direction
+		link_bandwidths[lid + 1] = link_bw / 2.0		# Divide by 2 because each link is counted twice, once in each direction
 	# Return results
 	return link_bandwidths
 
+# Bandwidth of a link (given as an entry of the topology) in bit/cycle, limited by the PHYs at its endpoints
+def get_link_bandwidth(chiplets, packaging, placement, link):
+	link_bw = float("inf")
+	for ep_lab in [x for x in link.keys() if "ep" in x]:
+		ep = link[ep_lab]
+		if ep["type"] == "chiplet":
+			chiplet = chiplets[placement["chiplets"][ep["outer_id"]]["name"]]
+			phy = chiplet["phys"][ep["inner_id"]]
+			ac = chiplet["dimensions"]["x"] * chiplet["dimensions"]["y"]			# Chiplet area in mm^2
+			fp = chiplet["fraction_power_bumps"]									# Fraction of bumps used for power 
+			fca = phy["fraction_bump_area"]											# Fraction of bump area	use by PHY
+			pb = packaging["bump_pitch"]											# Bump pitch in mm
+			ndw = packaging["non_data_wires"]										# Number of non-data wires per link
+			lbw = int(math.floor((ac * (1-fp) * fca * (1/pb)**2) - ndw))			# Link bandwidth in bit/cycle
+			link_bw = min(link_bw, lbw)
+	return link_bw
+
+def compute_traffic_flows(inputs, intermediates):
+	# Load inputs if not already loaded
+	required_inputs = ["traffic_by_chiplet"]
+	hlp.read_required_inputs(inputs, required_inputs)
+	traffic_by_chiplet = inputs["traffic_by_chiplet"]
+	# One flow per pair of communicating chiplets (in the order of traffic_by_chiplet)
+	(flow_src, flow_dst, flow_weights) = icc.traffic_to_arrays(traffic_by_chiplet)
+	# Return results
+	return {"flow_src" : flow_src, "flow_dst" : flow_dst, "flow_weights" : flow_weights}
+
+def compute_compiled_routing_table(inputs, intermediates):
+	# Load inputs if not already loaded
+	required_inputs = ["routing_table"]
+	hlp.read_required_inputs(inputs, required_inputs)
+	routing_table_ = inputs["routing_table"]
+	# Load intermediates if not already loaded
+	required_intermediates = ["ici_core"]
+	hlp.compute_required_intermediates(inputs, intermediates, required_intermediates)
+	ici_core = intermediates["ici_core"]
+	# Compile the routing table into a flat transition array
+	compiled_routing_table = icc.compile_routing_table(ici_core, routing_table_)
+	# Return results
+	return compiled_routing_table
+
+def compute_destination_trees(inputs, intermediates):
+	# Load intermediates if not already loaded
+	required_intermediates = ["ici_core","compiled_routing_table"]
+	hlp.compute_required_intermediates(inputs, intermediates, required_intermediates)
+	ici_core = intermediates["ici_core"]
+	compiled_routing_table = intermediates["compiled_routing_table"]
+	# Build the per-destination trees
+	destination_trees = icc.compile_destination_trees(ici_core, compiled_routing_table)
+	# Return results
+	return destination_trees
+
+# Symmetry of the design: The group generated by the declared symmetries of the design (see generate_topology.py),
+# e.g., the translations of a torus. If the declared symmetries are automorphisms of the topology and the routing and
+# the traffic are invariant under them (e.g., splif routing generated with the declared symmetries, see 
+# generate_routing.py), destinations in the same orbit see the same routes (up to the automorphism) and only one 
+# representative destination per orbit needs to be evaluated. The invariance of the routing is checked on the next-hop
+# array of the routing table, i.e., without compiling the routes towards all destinations. Returns None if the
+# invariance can not be established, i.e., if the design needs to be evaluated in full.
+# representatives:			Representative destination of each orbit
+# orbits:					Index of the orbit (in the list of representatives) of each chiplet
+# orbit_sizes:				Number of chiplets in each orbit
+# source_maps:				source_maps[d,s] is the source that plays the role of chiplet s for the representative of d
+# link_maps:				link_maps[d,l] is the image of link l under the automorphism that maps the representative of d to d
+#							(None if the latencies are invariant)
+# link_orbits:				Orbit of each link (links in the same orbit carry the same load)
+# representative_trees:		Destination trees that only contain the routes towards the representatives
+# latency_invariant:		Whether the link latencies and the relay latencies are invariant under the symmetries
+def compute_symmetry(inputs, intermediates):
+	# Load inputs if not already loaded
+	required_inputs = ["symmetry","routing_table"]
+	hlp.read_required_inputs(inputs, required_inputs)
+	declared_symmetry = inputs["symmetry"]
+	routing_table = crt.as_compact_routing_table(inputs["routing_table"])
+	# Load intermediates if not already loaded
+	required_intermediates = ["ici_core","node_latencies","link_latencies","traffic_flows"]
+	hlp.compute_required_intermediates(inputs, intermediates, required_intermediates)
+	ici_core = intermediates["ici_core"]
+	node_latencies = intermediates["node_latencies"]
+	link_latencies = intermediates["link_latencies"]
+	traffic_flows = intermediates["traffic_flows"]
+	n_chiplets = ici_core["n_chiplets"]
+	# Only default routing tables of designs without interposer-routers (the node-ids of the routing table are the
+	# chiplet-ids) are supported
+	if (ici_core["n_nodes"] > n_chiplets or routing_table.routing_table_type != "default" or 
+		not np.array_equal(routing_table.map_node_ids(ici_core["node_index"]), np.arange(routing_table.n_nodes)) or routing_table.n_nodes != n_chiplets):
+		print("WARNING: Declared symmetries are only supported for default routing tables of designs without interposer-routers, the design is evaluated in full.")
+		return None
+	# The declared symmetries must be automorphisms of the topology and the routing must be invariant under them
+	node_maps = [np.array(generator, dtype = np.int64) for generator in declared_symmetry["generators"]]
+	link_maps = []
+	for (gid, node_map) in enumerate(node_maps):
+		link_map = icc.get_automorphism_link_map(ici_core, node_map) if sorted(node_map.tolist()) == list(range(n_chiplets)) else None
+		if link_map is None or not icc.is_next_hop_table_invariant(routing_table, node_map):
+			print("WARNING: The topology or the routing is not invariant under generator %d of the declared symmetry, the design is evaluated in full." % gid)
+			return None
+		link_maps.append(link_map)
+	# Traffic: The image of every flow is a flow with the same weight
+	(flow_src, flow_dst, flow_weights) = (traffic_flows["flow_src"], traffic_flows["flow_dst"], traffic_flows["flow_weights"])
+	traffic_matrix = np.bincount(flow_dst * n_chiplets + flow_src, weights = flow_weights, minlength = n_chiplets * n_chiplets).reshape(n_chiplets, n_chiplets)
+	if not all(np.array_equal(traffic_matrix[node_map][:,node_map], traffic_matrix) for node_map in node_maps):
+		print("The traffic is not invariant under the declared symmetries, the design is evaluated in full...") if inputs["verbose"] else None
+		return None
+	# Whether the latencies along a route are the same as along its images
+	latency_invariant = all(np.array_equal(node_latencies["relay_latency"][node_map], node_latencies["relay_latency"]) and
+							np.array_equal(link_latencies[link_map], link_latencies) for (node_map, link_map) in zip(node_maps, link_maps))
+	# Orbits of the chiplets and the links, the source maps, and the link maps (only needed if the latencies are not invariant)
+	orbits = icc.get_permutation_orbits(node_maps, n_chiplets)
+	if latency_invariant:
+		((representatives, source_maps), transversal_link_maps) = (icc.get_transversal(node_maps, orbits), None)
+	else:
+		(representatives, source_maps, transversal_link_maps) = icc.get_transversal(node_maps, orbits, link_maps)
+	link_orbits = icc.get_permutation_orbits(link_maps, ici_core["n_links"])
+	print("Evaluating %d representative destinations..." % len(representatives)) if inputs["verbose"] else None
+	# Trees that only contain the routes towards the representatives
+	representative_routing_table = icc.compile_routing_table_for_destinations(ici_core, routing_table, representatives)
+	# Aggregate results
+	symmetry = {
+		"representatives" : representatives,
+		"orbits" : np.searchsorted(representatives, orbits),
+		"orbit_sizes" : np.bincount(orbits, minlength = n_chiplets)[representatives],
+		"source_maps" : source_maps,
+		"link_maps" : transversal_link_maps,
+		"link_orbits" : link_orbits,
+		"representative_trees" : icc.compile_destination_trees(ici_core, representative_routing_table, representatives),
+		"latency_invariant" : latency_invariant,
+	}
+	# Return results
+	return symmetry
+
+def compute_flow_states(inputs, intermediates):
+	# Load intermediates if not already loaded
+	required_intermediates = ["ici_core","destination_trees","traffic_flows"]
+	hlp.compute_required_intermediates(inputs, intermediates, required_intermediates)
+	ici_core = intermediates["ici_core"]
+	destination_trees = intermediates["destination_trees"]
+	traffic_flows = intermediates["traffic_flows"]
+	# State in the destination trees at which each flow is injected
+	flow_states = icc.destination_tree_flow_states(ici_core, destination_trees, traffic_flows["flow_src"], traffic_flows["flow_dst"])
+	# Return results
+	return flow_states
+
+def compute_path_incidence(inputs, intermediates):
+	# Load intermediates if not already loaded
+	required_intermediates = ["ici_core","destination_trees","flow_states"]
+	hlp.compute_required_intermediates(inputs, intermediates, required_intermediates)
+	ici_core = intermediates["ici_core"]
+	destination_trees = intermediates["destination_trees"]
+	flow_states = intermediates["flow_states"]
+	# Walk all paths once and store them as a sparse flow x link matrix
+	path_incidence = icc.compile_path_incidence(ici_core, destination_trees, flow_states)
+	# Return results
+	return path_incidence
+
+def compute_link_loads(inputs, intermediates):
+	# Only evaluate one destination per orbit if the design is symmetric (see rapidchiplet())
+	if inputs.get("use_symmetry", False):
+		hlp.compute_required_intermediates(inputs, intermediates, ["symmetry"])
+		return get_symmetric_link_loads(intermediates)
+	# Load intermediates if not already loaded
+	required_intermediates = ["ici_core","destination_trees","flow_states","traffic_flows"]
+	hlp.compute_required_intermediates(inputs, intermediates, required_intermediates)
+	ici_core = intermediates["ici_core"]
+	destination_trees = intermediates["destination_trees"]
+	flow_states = intermediates["flow_states"]
+	traffic_flows = intermediates["traffic_flows"]
+	# Compute per-link load under an injection rate of 1.0 by pushing the traffic up the destination trees
+	link_loads = icc.destination_tree_link_loads(ici_core, destination_trees, flow_states, traffic_flows["flow_weights"])
+	# Return results
+	return link_loads
+
+# Per-link loads of a symmetric design: Push the traffic towards each representative (scaled by the size of its orbit)
+# up its tree. Each link carries the average load of its link orbit, since the total load on the links of an orbit
+# does not change when the traffic towards a destination is replaced by the traffic towards the representative.
+def get_symmetric_link_loads(intermediates):
+	ici_core = intermediates["ici_core"]
+	symmetry = intermediates["symmetry"]
+	traffic_flows = intermediates["traffic_flows"]
+	representative_trees = symmetry["representative_trees"]
+	(flow_src, flow_dst, flow_weights) = (traffic_flows["flow_src"], traffic_flows["flow_dst"], traffic_flows["flow_weights"])
+	# Traffic towards the representatives
+	is_representative = np.zeros(ici_core["n_chiplets"], dtype = bool)
+	is_representative[symmetry["representatives"]] = True
+	flows = np.flatnonzero(is_representative[flow_dst])
+	flow_states = icc.destination_tree_flow_states(ici_core, representative_trees, flow_src[flows], flow_dst[flows])
+	weights = flow_weights[flows] * symmetry["orbit_sizes"][symmetry["orbits"][flow_dst[flows]]]
+	orbit_loads = icc.destination_tree_link_loads(ici_core, representative_trees, flow_states, weights)
+	# Distribute the load evenly over the links of each orbit
+	link_orbits = symmetry["link_orbits"]
+	orbit_totals = np.bincount(link_orbits, weights = orbit_loads, minlength = ici_core["n_links"])
+	orbit_counts = np.bincount(link_orbits, minlength = ici_core["n_links"])
+	return orbit_totals[link_orbits] / orbit_counts[link_orbits]
+
+
+def compute_node_latencies(inputs, intermediates):
+	# Load inputs if not already loaded
+	required_inputs = ["chiplets","packaging","placement","technologies"]
+	hlp.read_required_inputs(inputs, required_inputs)
+	chiplets = inputs["chiplets"]
+	packaging = inputs["packaging"]
+	placement = inputs["placement"]
+	technologies = inputs["technologies"]
+	# Load intermediates if not already loaded
+	required_intermediates = ["ici_core"]
+	hlp.compute_required_intermediates(inputs, intermediates, required_intermediates)
+	ici_core = intermediates["ici_core"]
+	# Compute relay-latency (for intermediate nodes) and latency (for endpoints) of each node
+	n_chiplets = ici_core["n_chiplets"]
+	node_latencies = np.zeros(n_chiplets, dtype = np.int64)
+	node_relay_latencies = np.zeros(ici_core["n_nodes"], dtype = np.int64)
+	# Add relay-latency of interposer-routers (they do not have a regular latency, as they can't be endpoints)
+	lat_ir = packaging["latency_irouter"]
+	node_relay_latencies[n_chiplets:] = lat_ir
+	# Add latency and relay-latency of chiplets
+	for (cid, chiplet_desc) in enumerate(placement["chiplets"]):
+		chiplet = chiplets[chiplet_desc["name"]]
+		lat_int = chiplet["internal_latency"]
+		lat_phy = technologies[chiplet["technology"]]["phy_latency"]
+		node_latencies[cid] = lat_int + lat_phy
+		node_relay_latencies[cid] = lat_phy + lat_int + lat_phy
+	# Return results
+	return {"latency" : node_latencies, "relay_latency" : node_relay_latencies}
+
+def compute_state_latencies(inputs, intermediates):
+	# If the latency breakdown is requested, the components are accumulated in the same pass
+	if inputs.get("latency_breakdown", False):
+		hlp.compute_required_intermediates(inputs, intermediates, ["state_latency_components"])
+		return intermediates["state_latency_components"].sum(axis = 1)
+	# Load intermediates if not already loaded
+	required_intermediates = ["ici_core","destination_trees","link_latencies","node_latencies"]
+	hlp.compute_required_intermediates(inputs, intermediates, required_intermediates)
+	ici_core = intermediates["ici_core"]
+	destination_trees = intermediates["destination_trees"]
+	link_latencies = intermediates["link_latencies"]
+	node_latencies = intermediates["node_latencies"]
+	# Latency of links and relay-latency of intermediate nodes from every state to its destination, 
+	# accumulated once per state along the destination trees
+	state_latencies = icc.destination_tree_latencies(ici_core, destination_trees, link_latencies, node_latencies["relay_latency"])
+	# Return results
+	return state_latencies
+
+def compute_state_latency_components(inputs, intermediates):
+	# Load intermediates if not already loaded
+	required_intermediates = ["ici_core","destination_trees","link_latencies","node_latencies"]
+	hlp.compute_required_intermediates(inputs, intermediates, required_intermediates)
+	ici_core = intermediates["ici_core"]
+	destination_trees = intermediates["destination_trees"]
+	link_latencies = intermediates["link_latencies"]
+	node_latencies = intermediates["node_latencies"]
+	# Latency of links (first column) and relay-latency of intermediate nodes (second column) from every state to 
+	# its destination, accumulated once per state along the destination trees
+	state_latency_components = icc.destination_tree_latency_components(ici_core, destination_trees, link_latencies, node_latencies["relay_latency"])
+	# Return results
+	return state_latency_components
+
+def compute_flow_latencies(inputs, intermediates):
+	# Only evaluate one destination per orbit if the design is symmetric (see rapidchiplet())
+	if inputs.get("use_symmetry", False):
+		hlp.compute_required_intermediates(inputs, intermediates, ["symmetry"])
+		return get_symmetric_flow_latencies(intermediates)
+	# Load intermediates if not already loaded
+	required_intermediates = ["node_latencies","state_latencies","traffic_flows","flow_states"]
+	hlp.compute_required_intermediates(inputs, intermediates, required_intermediates)
+	traffic_flows = intermediates["traffic_flows"]
+	flow_states = intermediates["flow_states"]
+	# Compute the zero-load latency of each pair of communicating chiplets
+	flow_latencies = get_flow_latencies(intermediates, traffic_flows["flow_src"], traffic_flows["flow_dst"], flow_states)
+	# Return results
+	return flow_latencies
+
+# Zero-load latency of each flow in a symmetric design: Each flow is the image of a flow towards the representative 
+# of its destination. If the latencies are invariant under the symmetries, the flow has the latency of this flow,
+# otherwise, the latencies along the image of the representative's tree are accumulated for each destination.
+def get_symmetric_flow_latencies(intermediates):
+	ici_core = intermediates["ici_core"]
+	symmetry = intermediates["symmetry"]
+	traffic_flows = intermediates["traffic_flows"]
+	link_latencies = intermediates["link_latencies"]
+	node_relay_latencies = intermediates["node_latencies"]["relay_latency"]
+	representative_trees = symmetry["representative_trees"]
+	(flow_src, flow_dst) = (traffic_flows["flow_src"], traffic_flows["flow_dst"])
+	# States of the flows towards the representatives of which the flows are the images
+	image_src = symmetry["source_maps"][flow_dst, flow_src]
+	image_dst = symmetry["representatives"][symmetry["orbits"][flow_dst]]
+	flow_states = icc.destination_tree_flow_states(ici_core, representative_trees, image_src, image_dst)
+	if symmetry["latency_invariant"]:
+		state_latencies = icc.destination_tree_latencies(ici_core, representative_trees, link_latencies, node_relay_latencies)
+		return get_flow_latencies({"node_latencies" : intermediates["node_latencies"], "state_latencies" : state_latencies}, flow_src, flow_dst, flow_states)
+	# Members of each orbit (padded with the representative) and the position of each chiplet in its orbit
+	n_chiplets = ici_core["n_chiplets"]
+	order = np.argsort(symmetry["orbits"], kind = "stable")
+	member_ptr = np.concatenate(([0], np.cumsum(symmetry["orbit_sizes"])))
+	positions = np.empty(n_chiplets, dtype = np.int64)
+	positions[order] = np.arange(n_chiplets) - np.repeat(member_ptr[:-1], symmetry["orbit_sizes"])
+	tree_members = np.repeat(symmetry["representatives"][:,None], symmetry["orbit_sizes"].max(), axis = 1)
+	tree_members[symmetry["orbits"][order], positions[order]] = order
+	# Node map of the automorphism that maps the representative of each chiplet to the chiplet
+	node_maps = np.argsort(symmetry["source_maps"], axis = 1)
+	state_latencies = icc.destination_tree_image_latencies(ici_core, representative_trees, link_latencies, node_relay_latencies, node_maps, symmetry["link_maps"], tree_members)
+	return get_end_to_end_latencies(intermediates, flow_src, flow_dst, state_latencies[flow_states, positions[flow_dst]])
 
 def compute_area(inputs, intermediates):
 	# Load inputs if not already loaded
@@ -183,7 +495,8 @@ def compute_power_summary(inputs, intermediates):
 	if packaging["link_power_type"] == "constant":
 		total_link_power = len(link_lengths) * packaging["link_power"] / 2
 	else:
-		total_link_power = sum([eval(packaging["link_power"])(link_length) for link_length in link_lengths.values()]) / 2
+		link_power_function = hlp.compile_packaging_function(packaging["link_power"])
+		total_link_power = float(np.sum(link_power_function(link_lengths))) / 2
 	# Compute total interposer area
 	total_power = total_chiplet_power + total_interposer_power
 	# Aggregate the results
@@ -206,16 +519,17 @@ def compute_link_summary(inputs, intermediates):
 	for metric in ["lengths", "bandwidths"]:
 		data = {"lengths" : link_lengths, "bandwidths" : link_bandwidths}[metric]
 		# Compute a histogram of link lengths/bandwidths, round lengths to 1um (lengths are in mm) and bandwidths to 0.001 bit/cycle
+		# Only consider one direction of each link (even link-ids)
 		histogram = {}
-		for link in [link for link in data.keys() if link[0] < link[1]]:
-			value = round(data[link],3)
+		for value in data[0::2]:
+			value = round(float(value),3)
 			if value not in histogram:
 				histogram[value] = 0
 			histogram[value] += 1
 		# Aggregate results
 		summary = {
 			"min" : min(histogram.keys()),
-			"avg" : sum(data.values()) / len(data),
+			"avg" : float(np.mean(data)),
 			"max" : max(histogram.keys()),
 			"histogram" : histogram
 		}
@@ -289,174 +603,481 @@ def compute_cost(inputs, intermediates):
 	# Return results
 	return cost_summary
 
+# Zero-load latency of each flow:
+# - 1 cycle from the source node to the central router of the source chiplet
+# - Latency of the source chiplet's central router
+# - Latency of links and relay-latency of intermediate nodes
+# - Latency of the destination chiplet's central router
+# - 1 cycle from the destination chiplet's central router to the destination node
+# - 1 cycle to eject the packet at the destination node
+def get_flow_latencies(intermediates, flow_src, flow_dst, flow_states):
+	state_latencies = intermediates["state_latencies"]
+	return get_end_to_end_latencies(intermediates, flow_src, flow_dst, state_latencies[flow_states])
+
+# Zero-load latency of each flow given the latency of the links and relay-nodes on its path (see above)
+def get_end_to_end_latencies(intermediates, flow_src, flow_dst, path_latencies):
+	node_latencies = intermediates["node_latencies"]["latency"]
+	return 1 + node_latencies[flow_src] + path_latencies + node_latencies[flow_dst] + 1 + 1
+
+# Aggregate per-flow latencies into the minimum, the traffic-weighted average, and the maximum latency
+def aggregate_flow_latencies(flow_latencies, flow_weights):
+	return {
+		"min" : int(flow_latencies.min()),
+		"avg" : float(np.dot(flow_latencies, flow_weights) / flow_weights.sum()),
+		"max" : int(flow_latencies.max())
+	}
+
+# Aggregate throughput in bits/cycle: The most loaded link (relative to its bandwidth) limits the throughput.
+# Link loads can be a vector (one traffic) or a links x k matrix (k traffics, returns one throughput per traffic).
+def get_aggregate_throughput(link_bandwidths, link_loads, aggregate_load):
+	if np.ndim(link_loads) == 2:
+		link_bandwidths = link_bandwidths[:,None]
+	# Find the link-throughputs (links without load do not limit the throughput)
+	with np.errstate(divide = "ignore"):
+		link_throughputs = np.where(link_loads > 0, link_bandwidths / link_loads, float("inf"))
+	min_throughput_per_traffic_unit = link_throughputs.min(axis = 0) if len(link_throughputs) > 0 else float("inf")
+	return min_throughput_per_traffic_unit * aggregate_load
+
 def compute_latency(inputs, intermediates):
+	# Compute intermediates if not already computed
+	required_intermediates = ["traffic_flows","flow_latencies"]
+	hlp.compute_required_intermediates(inputs, intermediates, required_intermediates)
+	traffic_flows = intermediates["traffic_flows"]
+	flow_latencies = intermediates["flow_latencies"]
+	print("Computing latency...") if inputs["verbose"] else None
+	# Aggregate results (the traffic-weighted average latency under the specified routing and traffic)
+	latency = aggregate_flow_latencies(flow_latencies, traffic_flows["flow_weights"])
+	# Split the latency into its components
+	if inputs.get("latency_breakdown", False):
+		latency["breakdown"] = get_latency_breakdown(inputs, intermediates)
+	# Return results
+	return latency
+
+# Split the zero-load latency of each flow (see get_flow_latencies) into the latency of the source and destination 
+# chiplets (node_latencies), the relay-latency of intermediate nodes (node_relay_latencies), the latency of links 
+# (link_latencies), and the three fixed cycles. Reports the traffic-weighted average of each component and the 
+# components of each flow.
+def get_latency_breakdown(inputs, intermediates):
+	required_intermediates = ["node_latencies","state_latency_components","traffic_flows","flow_states"]
+	hlp.compute_required_intermediates(inputs, intermediates, required_intermediates)
+	node_latencies = intermediates["node_latencies"]["latency"]
+	state_latency_components = intermediates["state_latency_components"]
+	traffic_flows = intermediates["traffic_flows"]
+	flow_states = intermediates["flow_states"]
+	(flow_src, flow_dst, flow_weights) = (traffic_flows["flow_src"], traffic_flows["flow_dst"], traffic_flows["flow_weights"])
+	# Components of each flow
+	flow_components = {
+		"node_latencies" : node_latencies[flow_src] + node_latencies[flow_dst],
+		"node_relay_latencies" : state_latency_components[flow_states, 1].astype(np.int64),
+		"link_latencies" : state_latency_components[flow_states, 0].astype(np.int64),
+		"fixed" : np.full(len(flow_src), 3, dtype = np.int64),
+	}
+	# Aggregate results
+	breakdown = {
+		"avg" : {name : float(np.dot(values, flow_weights) / flow_weights.sum()) for (name, values) in flow_components.items()},
+		"flows" : {"source" : flow_src.tolist(), "destination" : flow_dst.tolist()},
+	}
+	breakdown["flows"].update({name : values.tolist() for (name, values) in flow_components.items()})
+	return breakdown
+
+# Estimate of the average latency that only walks the paths of a random sample of flows (for very large traffics).
+# Flows are drawn with probability proportional to their traffic, such that the mean latency of the samples is an
+# unbiased estimate of the traffic-weighted average latency. Samples are drawn in batches until the half-width of the
+# confidence interval is at most the target relative error times the estimate (or the sample limit is reached).
+# The paths are read from the routing table directly, i.e., neither the routing table nor the trees are compiled.
+def compute_sampled_latency(inputs, intermediates):
 	# Load inputs if not already loaded
-	required_inputs = ["chiplets","packaging","placement","routing_table","technologies","traffic_by_chiplet"]
+	required_inputs = ["routing_table"]
 	hlp.read_required_inputs(inputs, required_inputs)
-	chiplets = inputs["chiplets"]
-	packaging = inputs["packaging"]
-	placement = inputs["placement"]
-	routing_table_ = inputs["routing_table"]
-	routing_table_type = routing_table_["type"]
-	routing_table = routing_table_["table"]
-	technologies = inputs["technologies"]
-	traffic_by_chiplet = inputs["traffic_by_chiplet"]
+	routing_table = crt.as_compact_routing_table(inputs["routing_table"])
 	# Compute intermediates if not already computed
-	required_intermediates = ["link_latencies"]
+	required_intermediates = ["ici_core","link_latencies","node_latencies","traffic_flows"]
 	hlp.compute_required_intermediates(inputs, intermediates, required_intermediates)
+	ici_core = intermediates["ici_core"]
 	link_latencies = intermediates["link_latencies"]
-	print("Computing latency...") if inputs["verbose"] else None
-	# Compute relay-latency (for intermediate nodes) and latency (for endpoints) of each node
-	node_latencies = {}
-	node_relay_latencies = {}
-	# Add relay-latency of interposer-routers (they do not have a regular latency, as they can't be endpoints)
-	lat_ir = packaging["latency_irouter"]
-	for rid in range(len(placement["interposer_routers"])):
-		node_relay_latencies[("irouter",rid)] = lat_ir
-	# Add latency and relay-latency of chiplets
-	for (cid, chiplet_desc) in enumerate(placement["chiplets"]):
-		chiplet = chiplets[chiplet_desc["name"]]
-		lat_int = chiplet["internal_latency"]
-		lat_phy = technologies[chiplet["technology"]]["phy_latency"]
-		node_latencies[("chiplet",cid)] = lat_int + lat_phy
-		node_relay_latencies[("chiplet",cid)] = lat_phy + lat_int + lat_phy
-	# The average latency under the specified routing and traffic
-	min_latency = float("inf")	
-	max_latency = -float("inf")
-	sum_of_weghted_latencies = 0
-	sum_of_weights = 0
-	# Iterate through pairs of communicating chiplets
-	for (sid, did) in traffic_by_chiplet.keys():
-		src_node = ("chiplet",sid)
-		dst_node = ("chiplet",did)
-		# Latency of sending a packet from the source node to the centra router of the source chiplet
-		lat = 1
-		# Latency of source chiplet's central router
-		lat += node_latencies[("chiplet",sid)]
-		# Latency of links and intermediate nodes
-		prv_node = "-1"
-		cur_node = src_node
-		while cur_node != dst_node:
-			if routing_table_type == "default":
-				nxt_node = tuple(routing_table[cur_node][dst_node])
-			elif routing_table_type == "extended":
-				nxt_node = tuple(routing_table[cur_node][dst_node][prv_node])
-			else:
-				print("ERROR: Unknown routing table type %s" % routing_table_type)
-				sys.exit(1)	
-			# Add link latency
-			lat += link_latencies[(cur_node,nxt_node)]
-			# Add relay latency
-			if nxt_node != dst_node:
-				lat += node_relay_latencies[nxt_node]
-			# Move to the next node
-			prv_node = cur_node
-			cur_node = nxt_node
-		# Latency of destination chiplet's central router
-		lat += node_latencies[("chiplet",did)]
-		# Latency of sending a packet from the destination chiplet's central router to the destination node
-		lat += 1
-		# Finally, one cycle to eject the packet at the destination node
-		lat += 1
-		# Update the average latency
-		min_latency = min(min_latency, lat)
-		max_latency = max(max_latency, lat)
-		sum_of_weghted_latencies += lat * traffic_by_chiplet[(sid,did)]
-		sum_of_weights += traffic_by_chiplet[(sid,did)]
-	# Compute the average latency	
-	avg_latency = sum_of_weghted_latencies / sum_of_weights
+	relay_latencies = intermediates["node_latencies"]["relay_latency"]
+	traffic_flows = intermediates["traffic_flows"]
+	relative_error = inputs.get("sampled_latency_relative_error", sampled_latency_relative_error)
+	print("Computing sampled latency...") if inputs["verbose"] else None
+	(flow_src, flow_dst, flow_weights) = (traffic_flows["flow_src"], traffic_flows["flow_dst"], traffic_flows["flow_weights"])
+	cumulative_weights = np.cumsum(flow_weights)
+	rng = np.random.default_rng(sampled_latency_seed)
+	z = statistics.NormalDist().inv_cdf((1 + sampled_latency_confidence) / 2)
+	# Latency of all flows that have been sampled before (-1 for all other flows)
+	known_latencies = np.full(len(flow_weights), -1.0)
+	(n_samples, latency_sum, latency_square_sum) = (0, 0.0, 0.0)
+	while True:
+		# Draw a batch of flows and walk the paths of flows that have not been sampled before
+		flows = np.searchsorted(cumulative_weights, rng.random(sampled_latency_batch_size) * cumulative_weights[-1], side = "right")
+		flows = np.minimum(flows, len(flow_weights) - 1)
+		new_flows = np.unique(flows[known_latencies[flows] < 0])
+		incidence = icc.walk_routing_table_paths(ici_core, routing_table, flow_src[new_flows], flow_dst[new_flows])
+		path_latencies = icc.sum_over_paths(incidence, link_latencies) + icc.sum_over_relays(ici_core, incidence, relay_latencies)
+		known_latencies[new_flows] = get_end_to_end_latencies(intermediates, flow_src[new_flows], flow_dst[new_flows], path_latencies)
+		# Update the estimate and its confidence interval
+		latencies = known_latencies[flows]
+		n_samples += len(latencies)
+		latency_sum += latencies.sum()
+		latency_square_sum += (latencies ** 2).sum()
+		avg = latency_sum / n_samples
+		variance = max(latency_square_sum / n_samples - avg ** 2, 0.0) * n_samples / (n_samples - 1)
+		half_width = z * math.sqrt(variance / n_samples)
+		converged = half_width <= relative_error * avg
+		if converged or n_samples >= sampled_latency_max_samples:
+			break
 	# Aggregate results
-	latency = {
-		"min" : min_latency,
-		"avg" : avg_latency,
-		"max" : max_latency
+	sampled_latency = {
+		"avg" : float(avg),
+		"confidence_interval" : [float(avg - half_width), float(avg + half_width)],
+		"confidence_level" : sampled_latency_confidence,
+		"relative_error" : float(half_width / avg),
+		"target_relative_error" : relative_error,
+		"samples" : n_samples,
+		"sampled_flows" : int((known_latencies >= 0).sum()),
+		"converged" : bool(converged),
 	}
 	# Return results
-	return latency
+	return sampled_latency
+
+def compute_latency_distribution(inputs, intermediates):
+	# Compute intermediates if not already computed
+	required_intermediates = ["traffic_flows","flow_latencies"]
+	hlp.compute_required_intermediates(inputs, intermediates, required_intermediates)
+	traffic_flows = intermediates["traffic_flows"]
+	flow_latencies = intermediates["flow_latencies"]
+	flow_weights = traffic_flows["flow_weights"]
+	print("Computing latency distribution...") if inputs["verbose"] else None
+	# Traffic-weighted histogram of the per-flow latencies (latencies are integers)
+	(latency_values, flow_bins) = np.unique(flow_latencies, return_inverse = True)
+	bin_weights = np.bincount(flow_bins, weights = flow_weights, minlength = len(latency_values)) / flow_weights.sum()
+	histogram = {int(value) : float(weight) for (value, weight) in zip(latency_values, bin_weights)}
+	# Traffic-weighted percentiles: Smallest latency such that the given fraction of the traffic is not slower
+	cumulative_weights = np.cumsum(bin_weights)
+	percentiles = {}
+	for percentile in latency_percentiles:
+		idx = min(np.searchsorted(cumulative_weights, percentile / 100 * cumulative_weights[-1]), len(latency_values) - 1)
+		percentiles["p%s" % ("%f" % percentile).rstrip("0").rstrip(".")] = int(latency_values[idx])
+	# The flows with the highest latencies
+	n_worst = min(n_worst_flows, len(flow_latencies))
+	worst = np.argpartition(-flow_latencies, n_worst - 1)[:n_worst]
+	worst = worst[np.lexsort((worst, -flow_latencies[worst]))]
+	worst_flows = [{
+			"source" : int(traffic_flows["flow_src"][fid]), 
+			"destination" : int(traffic_flows["flow_dst"][fid]), 
+			"latency" : int(flow_latencies[fid]), 
+			"traffic" : float(flow_weights[fid])
+		} for fid in worst]
+	# Aggregate results
+	latency_distribution = {
+		"percentiles" : percentiles,
+		"histogram" : histogram,
+		"worst_flows" : worst_flows,
+	}
+	# Return results
+	return latency_distribution
 
 def compute_throughput(inputs, intermediates):
 	# Load inputs if not already loaded
-	required_inputs = ["routing_table","topology","traffic_by_chiplet"]
+	required_inputs = ["traffic_by_chiplet"]
 	hlp.read_required_inputs(inputs, required_inputs)
-	routing_table_ = inputs["routing_table"]
-	routing_table_type = routing_table_["type"]
-	routing_table = routing_table_["table"]
-	topology = inputs["topology"]
 	traffic_by_chiplet = inputs["traffic_by_chiplet"]
 	# Compute intermediates if not already computed
-	required_intermediates = ["link_bandwidths"]
+	required_intermediates = ["link_bandwidths","link_loads"]
 	hlp.compute_required_intermediates(inputs, intermediates, required_intermediates)
 	link_bandwidths = intermediates["link_bandwidths"]
+	link_loads = intermediates["link_loads"]
 	print("Computing throughput...") if inputs["verbose"] else None
-	# Compute per-link load under an injection rate of 1.0
-	link_loads = {}
-	# Initialize link loads with zero
-	for link in topology:
-		node_id_1 = (link["ep1"]["type"],link["ep1"]["outer_id"])
-		node_id_2 = (link["ep2"]["type"],link["ep2"]["outer_id"])
-		link_loads[(node_id_1,node_id_2)] = 0
-		link_loads[(node_id_2,node_id_1)] = 0
-	# Iterate through communicating chiplets and add link-loads on the path
-	for (sid, did) in traffic_by_chiplet.keys():
-		src_node = ("chiplet",sid)
-		dst_node = ("chiplet",did)
-		prv_node = "-1"
-		cur_node = src_node
-		while cur_node != dst_node:
-			if routing_table_type == "default":
-				nxt_node = tuple(routing_table[cur_node][dst_node])
-			elif routing_table_type == "extended":
-				nxt_node = tuple(routing_table[cur_node][dst_node][prv_node])
-			else:
-				print("ERROR: Unknown routing table type %s" % routing_table_type)
-				sys.exit(1)	
-			# Add the traffic load to the link
-			link_loads[(cur_node,nxt_node)] += traffic_by_chiplet[(sid,did)]
-			# Move to the next node
-			prv_node = cur_node
-			cur_node = nxt_node
-	# Find the link-throughputs 	
-	link_throughputs = {link : (link_bandwidths[link] / link_loads[link]) if link_loads[link] > 0 else float("inf") for link in link_loads.keys()}
-	# Find the per-flow throughputs
-	max_link_bandwidth = max(link_bandwidths.values()) 
-	# Iterate through communicating chiplets and sum up global throughput
-	# TODO: Old
-	"""
-	min_throughput_per_traffic_unit = float("inf")
-	for (sid, did) in traffic_by_chiplet.keys():
-		src_node = ("chiplet",sid)
-		dst_node = ("chiplet",did)
-		prv_node = "-1"
-		cur_node = src_node
-		flow_throughput_per_traffic_unit = max_link_bandwidth
-		#flow_throughput = min(flow_throughput, router_throughputs[cur_node])
-		while cur_node != dst_node:
-			if routing_table_type == "default":
-				nxt_node = tuple(routing_table[cur_node][dst_node])
-			elif routing_table_type == "extended":
-				nxt_node = tuple(routing_table[cur_node][dst_node][prv_node])
-			else:
-				print("ERROR: Unknown routing table type %s" % routing_table_type)
-				sys.exit(1)	
-			# Add the traffic load to the link
-			flow_throughput_per_traffic_unit = min(flow_throughput_per_traffic_unit, link_throughputs[(cur_node,nxt_node)])
-			# Move to the next node
-			prv_node = cur_node
-			cur_node = nxt_node
-		min_throughput_per_traffic_unit = min(min_throughput_per_traffic_unit, flow_throughput_per_traffic_unit)
-	"""
-	# TODO: New
-	min_throughput_per_traffic_unit = min(link_throughputs.values())	
+	# The most loaded link (relative to its bandwidth) limits the injection rate of all flows
 	aggregate_load = sum(traffic_by_chiplet.values())
 	# Compute the aggregate throughput in bits/cycle
-	aggregate_throughput = min_throughput_per_traffic_unit * aggregate_load
+	aggregate_throughput = float(get_aggregate_throughput(link_bandwidths, link_loads, aggregate_load))
 	# Aggregate results
 	throughput = {
 		"aggregate_throughput" : aggregate_throughput,
 	}
+	# Utilization of all links and the most utilized links
+	if inputs.get("throughput_bottlenecks", False):
+		throughput.update(get_throughput_bottlenecks(inputs, intermediates))
 	# Return results
 	return throughput
 
+# Utilization of every directed link (indexed by link-id) when all flows are injected at the aggregate throughput, 
+# i.e., the load relative to the bandwidth, normalized such that the bottleneck links have a utilization of 1.
+# The n_bottleneck_links most utilized links are listed together with the flows that use them.
+def get_throughput_bottlenecks(inputs, intermediates):
+	required_intermediates = ["ici_core","link_bandwidths","link_loads","path_incidence","traffic_flows"]
+	hlp.compute_required_intermediates(inputs, intermediates, required_intermediates)
+	ici_core = intermediates["ici_core"]
+	link_bandwidths = intermediates["link_bandwidths"]
+	link_loads = intermediates["link_loads"]
+	traffic_flows = intermediates["traffic_flows"]
+	# Utilization of all links (links without bandwidth have a utilization of zero)
+	with np.errstate(divide = "ignore", invalid = "ignore"):
+		relative_loads = np.where(link_bandwidths > 0, link_loads / link_bandwidths, 0.0)
+	max_relative_load = relative_loads.max() if len(relative_loads) > 0 else 0.0
+	link_utilization = relative_loads / max_relative_load if max_relative_load > 0 else relative_loads
+	# Most utilized links (links without load are never bottlenecks)
+	n_bottlenecks = min(n_bottleneck_links, int(np.count_nonzero(link_loads > 0)))
+	bottleneck_links = np.lexsort((np.arange(len(link_utilization)), -link_utilization))[:n_bottlenecks]
+	# Flows that use the bottleneck links
+	(indptr, flows) = icc.get_link_flows(ici_core, intermediates["path_incidence"], bottleneck_links)
+	bottlenecks = []
+	for (i, lid) in enumerate(bottleneck_links):
+		link_flows = flows[indptr[i]:indptr[i+1]]
+		bottlenecks.append({
+			"link_id" : int(lid),
+			"topology_id" : int(ici_core["link_topology_ids"][lid]),
+			"endpoints" : [list(ici_core["nodes"][ici_core["link_src"][lid]]), list(ici_core["nodes"][ici_core["link_dst"][lid]])],
+			"utilization" : float(link_utilization[lid]),
+			"load" : float(link_loads[lid]),
+			"bandwidth" : float(link_bandwidths[lid]),
+			"flows" : {"source" : traffic_flows["flow_src"][link_flows].tolist(), "destination" : traffic_flows["flow_dst"][link_flows].tolist()},
+		})
+	return {"link_utilization" : link_utilization.tolist(), "bottlenecks" : bottlenecks}
+
+
+# Sensitivity of the latency and throughput to the latency and bandwidth of every link (both directions together).
+# The average latency is linear in the link latencies: Its derivative is the share of the traffic that uses the link.
+# The aggregate throughput is limited by the bottleneck links (largest load relative to bandwidth): Raising the
+# bandwidth (per direction, as reported in the link summary) of a link only raises the throughput if all bottlenecks
+# are on this link. Both follow from the per-link loads, i.e., no metric needs to be re-evaluated per link.
+def compute_link_sensitivity(inputs, intermediates):
+	# Compute intermediates if not already computed
+	required_intermediates = ["ici_core","link_bandwidths","link_loads","traffic_flows"]
+	hlp.compute_required_intermediates(inputs, intermediates, required_intermediates)
+	ici_core = intermediates["ici_core"]
+	link_bandwidths = intermediates["link_bandwidths"]
+	link_loads = intermediates["link_loads"]
+	aggregate_load = float(intermediates["traffic_flows"]["flow_weights"].sum())
+	print("Computing link sensitivity...") if inputs["verbose"] else None
+	# Derivative of the average latency with respect to the latency of each link (in cycles per cycle)
+	latency_sensitivities = (link_loads[0::2] + link_loads[1::2]) / aggregate_load
+	# Bottlenecks: Directed links with the smallest ratio of bandwidth to load
+	with np.errstate(divide = "ignore"):
+		link_throughputs = np.where(link_loads > 0, link_bandwidths / link_loads, float("inf"))
+	min_link_throughput = link_throughputs.min() if len(link_throughputs) > 0 else float("inf")
+	is_bottleneck = np.isfinite(link_throughputs) & (link_throughputs <= min_link_throughput * (1 + 1e-9))
+	bottleneck_links = np.unique(np.flatnonzero(is_bottleneck) // 2)
+	# Derivative of the aggregate throughput with respect to the bandwidth of each link (in bits/cycle per bit/cycle)
+	throughput_sensitivities = np.zeros(ici_core["n_links"] // 2)
+	if len(bottleneck_links) == 1:
+		throughput_sensitivities[bottleneck_links[0]] = aggregate_load / link_loads[is_bottleneck].max()
+	# Ranked table of all links: Highest latency sensitivity first, then highest throughput sensitivity, then lowest
+	# topology-id. Sensitivities are rounded such that rounding errors do not change the order of equal sensitivities.
+	topology_ids = ici_core["link_topology_ids"][0::2]
+	links = []
+	for uid in np.lexsort((topology_ids, -np.round(throughput_sensitivities, 9), -np.round(latency_sensitivities, 9))):
+		links.append({
+			"topology_id" : int(ici_core["link_topology_ids"][2 * uid]),
+			"endpoints" : [list(ici_core["nodes"][ici_core["link_src"][2 * uid]]), list(ici_core["nodes"][ici_core["link_dst"][2 * uid]])],
+			"latency_sensitivity" : float(latency_sensitivities[uid]),
+			"throughput_sensitivity" : float(throughput_sensitivities[uid]),
+			"is_bottleneck" : bool(uid in bottleneck_links),
+		})
+	# Aggregate results
+	link_sensitivity = {
+		"links" : links,
+		"bottleneck_topology_ids" : [int(ici_core["link_topology_ids"][2 * uid]) for uid in bottleneck_links],
+	}
+	# Return results
+	return link_sensitivity
+
+# Latency and throughput if a single link fails, for every link in the topology. Only the destinations for which at
+# least one flow uses the failed link are rerouted, using shortest-path-lowest-id-first routing (as generate_routing
+# with "splif"); the paths of all other flows do not change. For routing tables that were generated with "splif", the
+# results are identical to regenerating the routing table without the failed link and evaluating the design again.
+def compute_link_failure_sweep(inputs, intermediates):
+	# Compute intermediates if not already computed
+	required_intermediates = ["ici_core","link_latencies","link_bandwidths","link_loads","node_latencies","traffic_flows","flow_latencies","path_incidence"]
+	hlp.compute_required_intermediates(inputs, intermediates, required_intermediates)
+	ici_core = intermediates["ici_core"]
+	link_latencies = intermediates["link_latencies"]
+	link_bandwidths = intermediates["link_bandwidths"]
+	link_loads = intermediates["link_loads"]
+	relay_latencies = intermediates["node_latencies"]["relay_latency"]
+	traffic_flows = intermediates["traffic_flows"]
+	flow_latencies = intermediates["flow_latencies"]
+	path_incidence = intermediates["path_incidence"]
+	print("Computing link failure sweep...") if inputs["verbose"] else None
+	(n_chiplets, n_nodes, n_links) = (ici_core["n_chiplets"], ici_core["n_nodes"], ici_core["n_links"])
+	(flow_src, flow_dst, flow_weights) = (traffic_flows["flow_src"], traffic_flows["flow_dst"], traffic_flows["flow_weights"])
+	aggregate_load = flow_weights.sum()
+	# Contribution of the flows towards each destination to the number of flows and the load on each link
+	entry_keys = flow_dst[path_incidence["flows"]] * n_links + path_incidence["links"]
+	flows_per_destination_link = np.bincount(entry_keys, minlength = n_chiplets * n_links).reshape(n_chiplets, n_links)
+	loads_per_destination_link = np.bincount(entry_keys, weights = flow_weights[path_incidence["flows"]], minlength = n_chiplets * n_links).reshape(n_chiplets, n_links)
+	# Contribution of the flows towards each destination to the latency
+	latency_sums = np.bincount(flow_dst, weights = flow_weights * flow_latencies, minlength = n_chiplets)
+	(min_latencies, max_latencies) = (np.full(n_chiplets, float("inf")), np.full(n_chiplets, -float("inf")))
+	np.minimum.at(min_latencies, flow_dst, flow_latencies)
+	np.maximum.at(max_latencies, flow_dst, flow_latencies)
+	# Flows grouped by destination
+	flow_order = np.argsort(flow_dst, kind = "stable")
+	flow_ptr = np.concatenate(([0], np.cumsum(np.bincount(flow_dst, minlength = n_chiplets))))
+	# Fail one link at a time
+	failures = []
+	for uid in range(n_links // 2):
+		failed_links = [2 * uid, 2 * uid + 1]
+		affected = np.flatnonzero(flows_per_destination_link[:, failed_links].sum(axis = 1) > 0)
+		affected_flows = flow_order[icc.concatenate_ranges(flow_ptr[affected], flow_ptr[affected + 1])]
+		# Reroute the affected destinations and evaluate their flows
+		link_mask = np.ones(n_links, dtype = bool)
+		link_mask[failed_links] = False
+		state_links = np.full((n_chiplets, n_nodes), -1, dtype = np.int64)
+		state_links[affected] = icc.shortest_path_lowest_id_first_next_links(ici_core, affected, link_mask)
+		compiled_routing_table = {"state_links" : state_links.reshape(-1), "states_per_destination" : n_nodes, "link_ports" : ici_core["link_dst"]}
+		destination_trees = icc.compile_destination_trees(ici_core, compiled_routing_table)
+		flow_states = flow_dst[affected_flows] * n_nodes + flow_src[affected_flows]
+		disconnected_flows = int((destination_trees["depths"][flow_states] < 0).sum())
+		failure = {
+			"topology_id" : int(ici_core["link_topology_ids"][2 * uid]),
+			"endpoints" : [list(ici_core["nodes"][ici_core["link_src"][2 * uid]]), list(ici_core["nodes"][ici_core["link_dst"][2 * uid]])],
+			"affected_destinations" : len(affected),
+			"disconnected_flows" : disconnected_flows,
+		}
+		if disconnected_flows > 0:
+			failure["latency"] = None
+			failure["aggregate_throughput"] = 0.0
+		else:
+			state_latencies = icc.destination_tree_latencies(ici_core, destination_trees, link_latencies, relay_latencies)
+			rerouted_intermediates = {"node_latencies" : intermediates["node_latencies"], "state_latencies" : state_latencies}
+			rerouted_latencies = get_flow_latencies(rerouted_intermediates, flow_src[affected_flows], flow_dst[affected_flows], flow_states)
+			rerouted_loads = icc.destination_tree_link_loads(ici_core, destination_trees, flow_states, flow_weights[affected_flows])
+			# Replace the contribution of the affected destinations
+			unaffected = np.ones(n_chiplets, dtype = bool)
+			unaffected[affected] = False
+			latency_sum = latency_sums[unaffected].sum() + np.dot(rerouted_latencies, flow_weights[affected_flows])
+			loads = link_loads - loads_per_destination_link[affected].sum(axis = 0) + rerouted_loads
+			loads[failed_links] = 0.0
+			failure["latency"] = {
+				"min" : int(min(min_latencies[unaffected].min(initial = float("inf")), rerouted_latencies.min(initial = float("inf")))),
+				"avg" : float(latency_sum / aggregate_load),
+				"max" : int(max(max_latencies[unaffected].max(initial = -float("inf")), rerouted_latencies.max(initial = -float("inf")))),
+			}
+			failure["aggregate_throughput"] = float(get_aggregate_throughput(link_bandwidths, loads, aggregate_load))
+		failures.append(failure)
+	# Aggregate results
+	link_failure_sweep = {
+		"baseline" : {
+			"latency" : aggregate_flow_latencies(flow_latencies, flow_weights),
+			"aggregate_throughput" : float(get_aggregate_throughput(link_bandwidths, link_loads, aggregate_load)),
+		},
+		"failures" : failures,
+	}
+	# Return results
+	return link_failure_sweep
+
+# Max-min fair throughput: Flows are not limited by the most loaded link of the whole network but only by the most
+# loaded link on their own path. Rates grow proportionally to the traffic of each flow (progressive filling) and a flow
+# stops growing once one of its links is saturated, which frees up bandwidth for all other flows.
+def compute_fair_throughput(inputs, intermediates):
+	# Compute intermediates if not already computed
+	required_intermediates = ["ici_core","link_bandwidths","path_incidence","traffic_flows"]
+	hlp.compute_required_intermediates(inputs, intermediates, required_intermediates)
+	ici_core = intermediates["ici_core"]
+	link_bandwidths = intermediates["link_bandwidths"]
+	path_incidence = intermediates["path_incidence"]
+	traffic_flows = intermediates["traffic_flows"]
+	print("Computing max-min fair throughput...") if inputs["verbose"] else None
+	# Compute the max-min fair rate of each flow in bits/cycle
+	flow_rates = icc.max_min_fair_rates(ici_core, path_incidence, traffic_flows["flow_weights"], link_bandwidths)
+	# Aggregate results
+	fair_throughput = {
+		"aggregate_throughput" : float(flow_rates.sum()),
+		"flow_throughput" : {
+			"min" : float(flow_rates.min()),
+			"avg" : float(flow_rates.mean()),
+			"max" : float(flow_rates.max()),
+		},
+	}
+	# The rate of each flow (only if requested since this is one entry per flow)
+	if inputs.get("fair_throughput_flows", False):
+		fair_throughput["flows"] = {"source" : traffic_flows["flow_src"].tolist(), "destination" : traffic_flows["flow_dst"].tolist(), "throughput" : flow_rates.tolist()}
+	# Return results
+	return fair_throughput
+
+# Routing-independent throughput bound: The maximum factor by which the traffic can be scaled if every flow may be split
+# over arbitrary paths (maximum concurrent flow). The approximation returns a lower and an upper bound that are within
+# a factor of (1 + epsilon) of each other (unless the maximum number of iterations is reached).
+def compute_throughput_bound(inputs, intermediates):
+	# Compute intermediates if not already computed
+	required_intermediates = ["ici_core","link_bandwidths","traffic_flows"]
+	hlp.compute_required_intermediates(inputs, intermediates, required_intermediates)
+	ici_core = intermediates["ici_core"]
+	link_bandwidths = intermediates["link_bandwidths"]
+	traffic_flows = intermediates["traffic_flows"]
+	epsilon = inputs.get("throughput_bound_epsilon", throughput_bound_epsilon)
+	print("Computing throughput bound...") if inputs["verbose"] else None
+	# Approximate the maximum concurrent flow
+	flow_weights = traffic_flows["flow_weights"]
+	bounds = icc.max_concurrent_flow(ici_core, link_bandwidths, traffic_flows["flow_src"], traffic_flows["flow_dst"], flow_weights, epsilon, throughput_bound_max_iterations)
+	# Aggregate results (in bits/cycle)
+	aggregate_load = float(flow_weights.sum())
+	throughput_bound = {
+		"aggregate_throughput_upper_bound" : float(bounds["upper_bound"]) * aggregate_load,
+		"aggregate_throughput_lower_bound" : float(bounds["lower_bound"]) * aggregate_load,
+		"epsilon" : epsilon,
+		"iterations" : bounds["iterations"],
+		"converged" : bool(bounds["converged"]),
+	}
+	if inputs["verbose"] and not bounds["converged"]:
+		ratio = bounds["upper_bound"] / bounds["lower_bound"] if bounds["lower_bound"] > 0 else float("inf")
+		print("WARNING: The throughput bound did not converge within %d iterations, the upper bound is %.3f times the lower bound (requested: %.3f)." % (bounds["iterations"], ratio, 1 + epsilon))
+	# Return results
+	return throughput_bound
+
+# Estimate the latency-vs-load curve using an M/D/1 queueing model per link. The load is the injection rate in flits per
+# cycle per unit (same definition as in BookSim), where a flit has the size of the average link bandwidth and traffic is
+# distributed according to traffic_by_chiplet. Each link serves one flit per cycle at full bandwidth, i.e., a link with
+# utilization rho adds a waiting time of rho / (2 * (1 - rho)) cycles to every flow that uses it. The network saturates
+# when the utilization of the most loaded link reaches 1. The results have the same format as BookSim results.
+def compute_latency_under_load(inputs, intermediates):
+	# Read inputs if not already loaded
+	required_inputs = ["chiplets","placement"]
+	hlp.read_required_inputs(inputs, required_inputs)
+	chiplets = inputs["chiplets"]
+	placement = inputs["placement"]
+	# Compute intermediates if not already computed
+	required_intermediates = ["link_bandwidths","link_loads","path_incidence","traffic_flows","flow_latencies"]
+	hlp.compute_required_intermediates(inputs, intermediates, required_intermediates)
+	link_bandwidths = intermediates["link_bandwidths"]
+	link_loads = intermediates["link_loads"]
+	path_incidence = intermediates["path_incidence"]
+	flow_weights = intermediates["traffic_flows"]["flow_weights"]
+	flow_latencies = intermediates["flow_latencies"]
+	print("Computing latency under load...") if inputs["verbose"] else None
+	# Link utilization per unit of load: n_units * flit_size bits per cycle are distributed according to the traffic
+	n_units = sum(chiplets[chiplet["name"]]["unit_count"] for chiplet in placement["chiplets"])
+	flit_size = float(np.mean(link_bandwidths[link_bandwidths > 0]))
+	utilization_per_load = (n_units * flit_size / flow_weights.sum()) * link_loads / np.maximum(link_bandwidths, 1e-12)
+	max_utilization_per_load = float(utilization_per_load.max())
+	saturation_load = (1.0 / max_utilization_per_load) if max_utilization_per_load > 0 else None
+	# Loads to evaluate: Fractions of the saturation load (at most 0.999 as in BookSim)
+	max_load = min(saturation_load, 0.999) if saturation_load is not None else 0.999
+	fractions = list(np.linspace(0, 1, latency_under_load_points + 1)[1:-1]) + [0.99]
+	loads = sorted(set([0.001] + [round(float(fraction * max_load), 6) for fraction in fractions if fraction * max_load > 0.001]))
+	# Waiting time per link and load (M/D/1 with a service time of one cycle)
+	utilizations = np.outer(utilization_per_load, loads)
+	waiting_times = utilizations / (2 * (1 - utilizations))
+	# Latency of each flow and load: Zero-load latency plus the waiting times of all links on its path
+	latency_under_load = {}
+	for (lid, load) in enumerate(loads):
+		loaded_latencies = flow_latencies + icc.sum_over_paths(path_incidence, waiting_times[:,lid])
+		latency_under_load[load] = {
+			"packet_latency" : {
+				"avg" : float(np.dot(loaded_latencies, flow_weights) / flow_weights.sum()),
+				"min" : float(loaded_latencies.min()),
+				"max" : float(loaded_latencies.max()),
+			},
+			"injected_packet_rate" : {"avg" : load},
+			"accepted_packet_rate" : {"avg" : load},
+		}
+	# Saturation point: Injection rate per unit and aggregate throughput in bits per cycle
+	latency_under_load["saturation_load"] = saturation_load
+	latency_under_load["saturation_throughput"] = (saturation_load * n_units * flit_size) if saturation_load is not None else None
+	latency_under_load["n_nodes"] = n_units
+	# Return results
+	return latency_under_load
 
 def perform_booksim_simulation(inputs, intermediates):
 	run_identifier = inputs["design"]["design_name"]
@@ -478,33 +1099,151 @@ def perform_booksim_simulation(inputs, intermediates):
 	return bs_results
 
 
-def rapidchiplet(inputs, intermediates, do_compute, results_file, verbose = False, validate = True):
+# Compute the selected metrics. Independent metrics and intermediates are computed concurrently using n_workers
+# threads (default: number of CPUs). The time_taken of a metric is the time it takes to compute the metric and all
+# inputs and intermediates that it depends on (and that were not already present), i.e., its cost when computed alone.
+# If use_cache is set, intermediates that only depend on the geometry of the design are stored in / loaded from a persistent cache.
+# If use_symmetry is set, link loads and flow latencies are computed from one destination per orbit of the declared symmetries.
+def rapidchiplet(inputs, intermediates, do_compute, results_file, verbose = False, validate = True, n_workers = None, use_cache = False, use_symmetry = False):
 	total_start_time = time.time()
 	# Store verbose option in inputs
 	inputs["verbose"] = verbose
 	inputs["validate"] = validate
+	inputs["use_cache"] = use_cache
+	# Inputs may have been edited in place since the last call, their content is hashed again (see hlp.get_input_hash)
+	inputs.pop("content_hashes", None)
+	# Symmetries are only used if the design declares them (see generate_inputs.py)
+	inputs["use_symmetry"] = use_symmetry and ("symmetry" in inputs or "symmetry" in inputs.get("design", {}))
+	print("WARNING: The design does not declare any symmetries, it is evaluated in full.") if (verbose and use_symmetry and not inputs["use_symmetry"]) else None
+	n_workers = n_workers if n_workers is not None else (os.cpu_count() or 1)
+	# Compute the selected metrics
+	metric_names = [metric for metric in metrics if do_compute[metric]]
+	(node_times, node_dependencies) = ({}, {})
+	# Decide whether the symmetries can be used before the metrics are scheduled (otherwise, link loads and flow 
+	# latencies are computed in full and depend on the corresponding intermediates)
+	if inputs["use_symmetry"] and ("intermediate", "symmetry") in get_required_nodes(inputs, metric_names):
+		(_, node_times, node_dependencies) = hlp.compute_scheduled_nodes(inputs, intermediates, [("intermediate", "symmetry")], n_workers)
+		inputs["use_symmetry"] = intermediates["symmetry"] is not None
+	(results, metric_node_times, metric_node_dependencies) = hlp.compute_scheduled_metrics(inputs, intermediates, metric_names, n_workers)
+	# Nodes that were executed before the metrics were scheduled count towards the nodes that use them
+	for (node, dependencies) in metric_node_dependencies.items():
+		node_dependencies[node] = dependencies + [x for x in hlp.get_declared_node_dependencies(inputs, node) if x in node_times]
+	node_times.update(metric_node_times)
 	# Initialize outputs
 	outputs = {}
-	# Compute the selected metrics
-	for metric in metrics:
-		if do_compute[metric] and metric not in outputs:
-			start_time = time.time()
-			outputs[metric] = metric_computation_functions[metric](inputs, intermediates)
-			end_time = time.time()
-			outputs[metric]["time_taken"] = end_time - start_time
+	for metric in metric_names:
+		outputs[metric] = results[metric]
+		required_nodes = hlp.get_transitive_dependencies(node_dependencies, ("metric", metric))
+		outputs[metric]["time_taken"] = sum(node_times[node] for node in required_nodes)
+	# Store the time taken per input, intermediate, and metric
+	outputs["timings"] = {kind : {} for kind in ["inputs", "intermediates", "metrics"]}
+	for ((kind, name), time_taken) in sorted(node_times.items()):
+		outputs["timings"][kind + "s"][name] = time_taken
 	# Store time taken
 	outputs["total_time_taken"] = time.time() - total_start_time
 	return outputs
 
+# All nodes of the computation graph that the given metrics depend on directly or indirectly (see hlp.compute_scheduled_metrics)
+def get_required_nodes(inputs, metric_names):
+	required_nodes = set()
+	pending = [("metric", metric_name) for metric_name in metric_names]
+	while len(pending) > 0:
+		node = pending.pop()
+		if node not in required_nodes:
+			required_nodes.add(node)
+			pending += hlp.get_declared_node_dependencies(inputs, node)
+	return required_nodes
+
+# Evaluate the latency and throughput of one design under k different traffics (list of traffic_by_chiplet dictionaries).
+# Routes are compiled once, the traffics are stacked into a flows x k matrix, and all traffics are evaluated in one pass.
+# Returns one outputs-dictionary (same format as the one of rapidchiplet()) per traffic.
+def rapidchiplet_batch(inputs, intermediates, traffics_by_chiplet, verbose = False, validate = True, use_cache = False):
+	total_start_time = time.time()
+	# Store verbose option in inputs
+	inputs["verbose"] = verbose
+	inputs["validate"] = validate
+	inputs["use_cache"] = use_cache
+	# Inputs may have been edited in place since the last call, their content is hashed again (see hlp.get_input_hash)
+	inputs.pop("content_hashes", None)
+	# Validate all traffics
+	if validate:
+		required_inputs = ["placement"]
+		hlp.read_required_inputs(inputs, required_inputs)
+		for traffic_by_chiplet in traffics_by_chiplet:
+			val.validate_traffic_by_chiplet(dict(inputs, traffic_by_chiplet = traffic_by_chiplet))
+	# Compute intermediates if not already computed (these do not depend on the traffic)
+	required_intermediates = ["ici_core","destination_trees","link_bandwidths","node_latencies","state_latencies"]
+	hlp.compute_required_intermediates(inputs, intermediates, required_intermediates)
+	ici_core = intermediates["ici_core"]
+	destination_trees = intermediates["destination_trees"]
+	link_bandwidths = intermediates["link_bandwidths"]
+	print("Computing latency and throughput for %d traffics..." % len(traffics_by_chiplet)) if verbose else None
+	# Union of all flows and a flows x k weight matrix
+	(flow_src, flow_dst, flow_weights, flow_present) = icc.traffics_to_arrays(traffics_by_chiplet)
+	flow_states = icc.destination_tree_flow_states(ici_core, destination_trees, flow_src, flow_dst)
+	# Latency: Per-flow latencies are independent of the traffic
+	flow_latencies = get_flow_latencies(intermediates, flow_src, flow_dst, flow_states)
+	# Throughput: Compute the links x k matrix of link loads in one pass over the destination trees
+	link_loads = icc.destination_tree_link_loads(ici_core, destination_trees, flow_states, flow_weights)
+	aggregate_throughputs = get_aggregate_throughput(link_bandwidths, link_loads, flow_weights.sum(axis = 0))
+	# Aggregate results per traffic
+	time_taken = (time.time() - total_start_time) / max(len(traffics_by_chiplet), 1)
+	all_outputs = []
+	for tid in range(len(traffics_by_chiplet)):
+		present = flow_present[:,tid]
+		outputs = {
+			"latency" : aggregate_flow_latencies(flow_latencies[present], flow_weights[present,tid]),
+			"throughput" : {"aggregate_throughput" : float(aggregate_throughputs[tid])},
+			# The time taken is the share of each traffic in the time taken for the whole batch
+			"total_time_taken" : time_taken,
+		}
+		all_outputs.append(outputs)
+	return all_outputs
+
 # Define all metrics supported by RapidChiplet
-metrics = ["area_summary", "power_summary", "link_summary", "cost", "latency", "throughput", "booksim_simulation"]
+metrics = ["area_summary", "power_summary", "link_summary", "cost", "latency", "latency_distribution", "sampled_latency", "throughput", "fair_throughput", "throughput_bound", "link_sensitivity", "link_failure_sweep", "latency_under_load", "booksim_simulation"]
+
+# Traffic-weighted latency percentiles and number of slowest flows reported by the latency distribution
+latency_percentiles = [50, 90, 99, 99.9]
+n_worst_flows = 10
+
+# Target relative error (half-width of the confidence interval relative to the estimate), confidence level, batch size,
+# sample limit, and random seed of the sampled latency
+sampled_latency_relative_error = 0.01
+sampled_latency_confidence = 0.95
+sampled_latency_batch_size = 1000
+sampled_latency_max_samples = 1000000
+sampled_latency_seed = 0
+
+# Number of most utilized links that are reported with the throughput (with throughput_bottlenecks)
+n_bottleneck_links = 10
+
+# Accuracy (relative gap between the lower and upper bound) and iteration limit of the throughput bound
+throughput_bound_epsilon = 0.1
+throughput_bound_max_iterations = 1000
+
+# Number of points on the latency-vs-load curve estimated by the queueing model
+latency_under_load_points = 20
 
 # Define all functions that compute the metrics and the metrics themselves
 metric_computation_functions = {
 	# Intermediates
+	"ici_core" : compute_ici_core,
+	"placement_geometry" : compute_placement_geometry,
 	"link_lengths" : compute_link_lengths,
 	"link_latencies" : compute_link_latencies,
 	"link_bandwidths" : compute_link_bandwidths,
+	"traffic_flows" : compute_traffic_flows,
+	"compiled_routing_table" : compute_compiled_routing_table,
+	"destination_trees" : compute_destination_trees,
+	"symmetry" : compute_symmetry,
+	"flow_states" : compute_flow_states,
+	"path_incidence" : compute_path_incidence,
+	"link_loads" : compute_link_loads,
+	"node_latencies" : compute_node_latencies,
+	"state_latencies" : compute_state_latencies,
+	"state_latency_components" : compute_state_latency_components,
+	"flow_latencies" : compute_flow_latencies,
 	"area" : compute_area,
 	# Outputs
 	"area_summary" : compute_area_summary,
@@ -512,10 +1251,84 @@ metric_computation_functions = {
 	"link_summary" : compute_link_summary,
 	"cost" : compute_cost,
 	"latency" : compute_latency,
+	"latency_distribution" : compute_latency_distribution,
+	"sampled_latency" : compute_sampled_latency,
 	"throughput" : compute_throughput,
+	"fair_throughput" : compute_fair_throughput,
+	"throughput_bound" : compute_throughput_bound,
+	"link_sensitivity" : compute_link_sensitivity,
+	"link_failure_sweep" : compute_link_failure_sweep,
+	"latency_under_load" : compute_latency_under_load,
 	"booksim_simulation" : perform_booksim_simulation,
 }
 
+# Inputs and intermediates that each intermediate and metric depends on (used to schedule the computation).
+# The BookSim simulation additionally reads traffic_by_unit or trace, depending on its mode.
+metric_dependencies = {
+	# Intermediates
+	"ici_core" : {"inputs" : ["chiplets","placement","topology"], "intermediates" : []},
+	"placement_geometry" : {"inputs" : ["chiplets","placement"], "intermediates" : []},
+	"link_lengths" : {"inputs" : ["packaging","topology"], "intermediates" : ["ici_core","placement_geometry"]},
+	"link_latencies" : {"inputs" : ["packaging"], "intermediates" : ["link_lengths"]},
+	"link_bandwidths" : {"inputs" : ["chiplets","packaging","placement","topology"], "intermediates" : ["ici_core"]},
+	"traffic_flows" : {"inputs" : ["traffic_by_chiplet"], "intermediates" : []},
+	"compiled_routing_table" : {"inputs" : ["routing_table"], "intermediates" : ["ici_core"]},
+	"destination_trees" : {"inputs" : [], "intermediates" : ["ici_core","compiled_routing_table"]},
+	"symmetry" : {"inputs" : ["symmetry","routing_table"], "intermediates" : ["ici_core","node_latencies","link_latencies","traffic_flows"]},
+	"flow_states" : {"inputs" : [], "intermediates" : ["ici_core","destination_trees","traffic_flows"]},
+	"path_incidence" : {"inputs" : [], "intermediates" : ["ici_core","destination_trees","flow_states"]},
+	"link_loads" : {"inputs" : [], "intermediates" : ["ici_core","destination_trees","flow_states","traffic_flows"]},
+	"node_latencies" : {"inputs" : ["chiplets","packaging","placement","technologies"], "intermediates" : ["ici_core"]},
+	"state_latencies" : {"inputs" : [], "intermediates" : ["ici_core","destination_trees","link_latencies","node_latencies"]},
+	"state_latency_components" : {"inputs" : [], "intermediates" : ["ici_core","destination_trees","link_latencies","node_latencies"]},
+	"flow_latencies" : {"inputs" : [], "intermediates" : ["node_latencies","state_latencies","traffic_flows","flow_states"]},
+	"area" : {"inputs" : ["chiplets","placement"], "intermediates" : []},
+	# Outputs
+	"area_summary" : {"inputs" : [], "intermediates" : ["area"]},
+	"power_summary" : {"inputs" : ["chiplets","packaging","placement"], "intermediates" : ["link_lengths"]},
+	"link_summary" : {"inputs" : [], "intermediates" : ["link_lengths","link_bandwidths"]},
+	"cost" : {"inputs" : ["chiplets","packaging","placement","technologies"], "intermediates" : ["area"]},
+	"latency" : {"inputs" : [], "intermediates" : ["traffic_flows","flow_latencies"]},
+	"latency_distribution" : {"inputs" : [], "intermediates" : ["traffic_flows","flow_latencies"]},
+	"sampled_latency" : {"inputs" : ["routing_table"], "intermediates" : ["ici_core","link_latencies","node_latencies","traffic_flows"]},
+	"throughput" : {"inputs" : ["traffic_by_chiplet"], "intermediates" : ["link_bandwidths","link_loads"]},
+	"fair_throughput" : {"inputs" : [], "intermediates" : ["ici_core","link_bandwidths","path_incidence","traffic_flows"]},
+	"throughput_bound" : {"inputs" : [], "intermediates" : ["ici_core","link_bandwidths","traffic_flows"]},
+	"link_sensitivity" : {"inputs" : [], "intermediates" : ["ici_core","link_bandwidths","link_loads","traffic_flows"]},
+	"link_failure_sweep" : {"inputs" : [], "intermediates" : ["ici_core","link_latencies","link_bandwidths","link_loads","node_latencies","traffic_flows","flow_latencies","path_incidence"]},
+	"latency_under_load" : {"inputs" : ["chiplets","placement"], "intermediates" : ["link_bandwidths","link_loads","path_incidence","traffic_flows","flow_latencies"]},
+	"booksim_simulation" : {"inputs" : ["booksim_config","chiplets","packaging","placement","routing_table","technologies","topology"], "intermediates" : ["ici_core","link_latencies"]},
+}
+
+# Dependencies of intermediates that are computed from one representative destination per orbit if use_symmetry is set
+symmetric_metric_dependencies = {
+	"link_loads" : {"inputs" : [], "intermediates" : ["ici_core","symmetry","traffic_flows"]},
+	"flow_latencies" : {"inputs" : [], "intermediates" : ["ici_core","symmetry","traffic_flows","link_latencies","node_latencies"]},
+}
+
+# Dependencies of intermediates and metrics if latency_breakdown is set (the state latencies are the sum of the components)
+latency_breakdown_metric_dependencies = {
+	"state_latencies" : {"inputs" : [], "intermediates" : ["state_latency_components"]},
+	"latency" : {"inputs" : [], "intermediates" : ["traffic_flows","flow_latencies","node_latencies","state_latency_components","flow_states"]},
+}
+
+# Dependencies of metrics if throughput_bottlenecks is set
+throughput_bottlenecks_metric_dependencies = {
+	"throughput" : {"inputs" : ["traffic_by_chiplet"], "intermediates" : ["ici_core","link_bandwidths","link_loads","path_incidence","traffic_flows"]},
+}
+
+# Options (set in the inputs) that change the dependencies of intermediates and metrics
+option_metric_dependencies = {
+	"use_symmetry" : symmetric_metric_dependencies,
+	"latency_breakdown" : latency_breakdown_metric_dependencies,
+	"throughput_bottlenecks" : throughput_bottlenecks_metric_dependencies,
+}
+
+# Intermediates that are stored in the persistent cache. These only depend on small inputs (chiplets, placement,
+# topology, packaging, technologies). Intermediates that depend on the routing table or the traffic are not cached
+# since hashing these inputs takes longer than computing the intermediates.
+cached_intermediates = ["ici_core", "placement_geometry", "link_lengths", "link_latencies", "link_bandwidths", "node_latencies", "area"]
+
 if __name__ == "__main__":
 	# Read command line arguments
 	parser = argparse.ArgumentParser()
@@ -526,17 +1339,32 @@ if __name__ == "__main__":
 	parser.add_argument("-ls", "--link_summary", action="store_true", help = "Compute the link summary")
 	parser.add_argument("-c", "--cost", action="store_true", help = "Compute the manufacturing cost")
 	parser.add_argument("-l", "--latency", action="store_true", help = "Compute the ICI latency")
+	parser.add_argument("-lb", "--latency_breakdown", action="store_true", help = "Split the ICI latency into node, relay, link, and fixed latencies (aggregate and per flow)")
+	parser.add_argument("-ld", "--latency_distribution", action="store_true", help = "Compute the distribution of per-flow ICI latencies")
+	parser.add_argument("-sl", "--sampled_latency", action="store_true", help = "Estimate the ICI latency from a random sample of flows")
 	parser.add_argument("-t", "--throughput", action="store_true", help = "Compute the ICI throughput")
+	parser.add_argument("-tbn", "--throughput_bottlenecks", action="store_true", help = "Report the utilization of all links and the most utilized links together with the flows that use them")
+	parser.add_argument("-ft", "--fair_throughput", action="store_true", help = "Compute the max-min fair throughput of all flows")
+	parser.add_argument("-ftf", "--fair_throughput_flows", action="store_true", help = "Report the max-min fair throughput of each flow")
+	parser.add_argument("-tb", "--throughput_bound", action="store_true", help = "Compute the routing-independent throughput bound (maximum concurrent flow)")
+	parser.add_argument("-lse", "--link_sensitivity", action="store_true", help = "Compute the sensitivity of latency and throughput to the latency and bandwidth of every link")
+	parser.add_argument("-lfs", "--link_failure_sweep", action="store_true", help = "Compute latency and throughput if any single link fails")
+	parser.add_argument("-lul", "--latency_under_load", action="store_true", help = "Estimate the latency-vs-load curve using a queueing model")
 	parser.add_argument("-bs", "--booksim_simulation", action="store_true", help = "Simulate the design using BookSim")
+	parser.add_argument("-tbe", "--throughput_bound_epsilon", type = float, default = throughput_bound_epsilon, help = "Accuracy of the throughput bound (smaller is more accurate but slower)")
+	parser.add_argument("-slre", "--sampled_latency_relative_error", type = float, default = sampled_latency_relative_error, help = "Target relative error of the sampled latency (at a confidence level of 95%%)")
 	parser.add_argument("-nv", "--no_validation", action="store_true", help = "Skip the validation of the design")
+	parser.add_argument("-nw", "--n_workers", type = int, default = None, help = "Number of threads used to compute independent metrics concurrently (default: number of CPUs)")
+	parser.add_argument("-sym", "--use_symmetry", action="store_true", help = "Only evaluate one destination per orbit of the symmetries declared by the design (e.g., tori and hypercubes under uniform traffic)")
+	parser.add_argument("-uc", "--use_cache", action="store_true", help = "Use the persistent cache of intermediates (stored in ./cache/)")
 	args = parser.parse_args()
 	do_compute = {metric : getattr(args, metric) for metric in metrics}
 	validate = not args.no_validation
 	# Read the design file
-	inputs = {"design" : hlp.read_json(filename = args.design_file)}
+	inputs = {"design" : hlp.read_design(filename = args.design_file), "throughput_bound_epsilon" : args.throughput_bound_epsilon, "sampled_latency_relative_error" : args.sampled_latency_relative_error, "latency_breakdown" : args.latency_breakdown, "throughput_bottlenecks" : args.throughput_bottlenecks, "fair_throughput_flows" : args.fair_throughput_flows}
 	intermediates = {}
 	# Run the main function
-	results = rapidchiplet(inputs, intermediates, do_compute, args.results_file, verbose = True, validate = validate)
+	results = rapidchiplet(inputs, intermediates, do_compute, args.results_file, verbose = True, validate = validate, n_workers = args.n_workers, use_cache = args.use_cache, use_symmetry = args.use_symmetry)
 	# Store results
 	hlp.write_json("./results/%s.json" % args.results_file, results)
 
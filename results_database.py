@@ -0,0 +1,103 @@
+# Import python libraries
+import os
+import json
+import sqlite3
+
+# Import RapidChiplet files
+import helpers as hlp
+
+# Results database: The results of all experiments are stored in a single SQLite database instead of one JSON file
+# per run (i.e., per parameter combination of an experiment). The database consists of three tables:
+# - runs: One row per run with the name of the experiment, the name of the run, and all parameters of the run (JSON)
+# - parameters: One row per (run, parameter) with the JSON-encoded value of the parameter. The table is indexed by
+#   the parameter name and value such that queries that are filtered by parameters only read the matching runs.
+# - metrics: One row per (run, metric) with the JSON-encoded results of the metric
+# Runs are appended one by one and each run is committed on its own, i.e., the results of an interrupted experiment
+# are kept. Writing a run with the name of an existing run of the same experiment replaces the existing run.
+results_database_file = "./results/results.db"
+
+# Seconds to wait for a lock on the database (e.g., if multiple experiments are run at the same time)
+results_database_timeout = 60
+
+results_database_schema = [
+	"CREATE TABLE IF NOT EXISTS runs (run_id INTEGER PRIMARY KEY, experiment TEXT NOT NULL, run_name TEXT NOT NULL, parameters TEXT NOT NULL)",
+	"CREATE UNIQUE INDEX IF NOT EXISTS runs_by_name ON runs (experiment, run_name)",
+	"CREATE TABLE IF NOT EXISTS parameters (run_id INTEGER NOT NULL, name TEXT NOT NULL, value TEXT NOT NULL)",
+	"CREATE INDEX IF NOT EXISTS parameters_by_value ON parameters (name, value, run_id)",
+	"CREATE INDEX IF NOT EXISTS parameters_by_run ON parameters (run_id)",
+	"CREATE TABLE IF NOT EXISTS metrics (run_id INTEGER NOT NULL, metric TEXT NOT NULL, value TEXT NOT NULL, PRIMARY KEY (run_id, metric))",
+]
+
+# Encode a parameter value or the results of a metric
+def encode_value(value):
+	return json.dumps(hlp.encode_data(value))
+
+# Inverse of encode_value (decoded keys are shared through the key_cache, see hlp.read_json). Values without tuples
+# are decoded by json.loads alone.
+def decode_value(text, key_cache):
+	if "__tuple__" not in text:
+		return json.loads(text)
+	return json.loads(text, object_pairs_hook = lambda pairs: hlp.decode_json_object(pairs, key_cache))
+
+# Open the results database (it is created if it does not exist)
+def open_results_database(filename = results_database_file):
+	directory = os.path.dirname(filename)
+	if directory != "":
+		os.makedirs(directory, exist_ok = True)
+	database = sqlite3.connect(filename, timeout = results_database_timeout)
+	# Write-ahead logging makes committing a single run cheap
+	database.execute("PRAGMA journal_mode = WAL")
+	database.execute("PRAGMA synchronous = NORMAL")
+	for statement in results_database_schema:
+		database.execute(statement)
+	database.commit()
+	return database
+
+# Store the parameters and results of a run
+def write_run(database, experiment, run_name, parameters, results):
+	with database:
+		# Remove an existing run with the same name
+		row = database.execute("SELECT run_id FROM runs WHERE experiment = ? AND run_name = ?", (experiment, run_name)).fetchone()
+		if row is not None:
+			for table in ["runs", "parameters", "metrics"]:
+				database.execute("DELETE FROM %s WHERE run_id = ?" % table, row)
+		# Insert the run
+		cursor = database.execute("INSERT INTO runs (experiment, run_name, parameters) VALUES (?, ?, ?)", (experiment, run_name, encode_value(parameters)))
+		run_id = cursor.lastrowid
+		database.executemany("INSERT INTO parameters (run_id, name, value) VALUES (?, ?, ?)", [(run_id, name, encode_value(value)) for (name, value) in parameters.items()])
+		database.executemany("INSERT INTO metrics (run_id, metric, value) VALUES (?, ?, ?)", [(run_id, metric, encode_value(value)) for (metric, value) in results.items()])
+
+# Read the runs of an experiment. Only runs whose parameters have the given values (e.g., {"topology" : "mesh"})
+# are read. For each run, only the results of the given metrics are read (all metrics if metrics is None).
+# Returns a list of runs in the order in which they were written, each run is a dictionary with the keys
+# "run_name", "parameters", and "results".
+def read_runs(database, experiment, metrics = None, parameters = None):
+	# Select the runs
+	conditions = ["runs.experiment = ?"]
+	arguments = [experiment]
+	for (name, value) in (parameters or {}).items():
+		conditions.append("runs.run_id IN (SELECT run_id FROM parameters WHERE name = ? AND value = ?)")
+		arguments += [name, encode_value(value)]
+	condition = " AND ".join(conditions)
+	key_cache = {}
+	runs = {}
+	for (run_id, run_name, run_parameters) in database.execute("SELECT run_id, run_name, parameters FROM runs WHERE %s ORDER BY run_id" % condition, arguments):
+		runs[run_id] = {"run_name" : run_name, "parameters" : decode_value(run_parameters, key_cache), "results" : {}}
+	# Read the results of the selected runs
+	if metrics is not None:
+		if len(metrics) == 0:
+			return list(runs.values())
+		condition += " AND metrics.metric IN (%s)" % ", ".join("?" * len(metrics))
+		arguments += list(metrics)
+	query = "SELECT metrics.run_id, metrics.metric, metrics.value FROM metrics JOIN runs ON runs.run_id = metrics.run_id WHERE %s" % condition
+	for (run_id, metric, value) in database.execute(query, arguments):
+		runs[run_id]["results"][metric] = decode_value(value, key_cache)
+	return list(runs.values())
+
+# Read the results of a single run (None if the run does not exist)
+def read_run_results(database, experiment, run_name):
+	row = database.execute("SELECT run_id FROM runs WHERE experiment = ? AND run_name = ?", (experiment, run_name)).fetchone()
+	if row is None:
+		return None
+	key_cache = {}
+	return {metric : decode_value(value, key_cache) for (metric, value) in database.execute("SELECT metric, value FROM metrics WHERE run_id = ?", row)}
@@ -1,4 +1,5 @@
 # Python modules 
+import os
 import copy as cpy
 import argparse
 
@@ -7,6 +8,7 @@ import argparse
 import helpers as hlp
 import generate_inputs as igen
 import rapidchiplet as rc
+import results_database as rdb
 
 
 def split_parameters(experiment):
@@ -46,20 +48,22 @@ def compute_parameter_combinations(experiment, exp_name):
 	return experiments
 
 
-def run_single_configuration(params, metrics_to_compute, exp_name):
+def run_single_configuration(params, metrics_to_compute, exp_name, run_name, database, write_json = False):
 	# Generate the experiment setup
-	inputs = igen.generate_inputs(params, exp_name, do_write = False)
+	inputs = igen.generate_inputs(params, run_name, do_write = False)
 	# Arguments for the rapidchiplet function
 	intermediates = {}
 	do_compute = {metric : (metric in metrics_to_compute) for metric in rc.metrics}
-	results_file = exp_name
+	results_file = run_name
 	# Run RapidChiplet
 	results = rc.rapidchiplet(inputs, intermediates, do_compute, results_file, verbose = True, validate = params["do_validate"])
 	# Save the results
-	hlp.write_json("./results/%s.json" % exp_name, results)
+	rdb.write_run(database, exp_name, run_name, params, results)
+	if write_json:
+		hlp.write_json("./results/%s.json" % run_name, results)
 
 
-def run_experiment(experiment):
+def run_experiment(experiment, write_json = False, database_file = rdb.results_database_file):
 	# Extract the experiment name and metrics to compute
 	exp_name = experiment["exp_name"]
 	metrics_to_compute = experiment["metrics"]
@@ -67,22 +71,47 @@ def run_experiment(experiment):
 	del experiment["metrics"]
 	experiments = compute_parameter_combinations(experiment, exp_name)
 	n_exp = len(experiments)
-	# Run all experiments
+	# Run all experiments, the results are stored in the results database
+	database = rdb.open_results_database(database_file)
 	for (idx, new_exp_name) in enumerate(experiments):
 		print("=" * 100)
 		print("Running experiment %d/%d: %s" % (idx + 1, n_exp, new_exp_name))
 		print("=" * 100)
-		run_single_configuration(experiments[new_exp_name], metrics_to_compute, new_exp_name)
+		run_single_configuration(experiments[new_exp_name], metrics_to_compute, exp_name, new_exp_name, database, write_json)
+	database.close()
+
+
+def import_json_results(experiment, database_file = rdb.results_database_file):
+	# Import the results files (./results/<run_name>.json) of all runs of an experiment into the results database
+	exp_name = experiment["exp_name"]
+	del experiment["exp_name"]
+	del experiment["metrics"]
+	experiments = compute_parameter_combinations(experiment, exp_name)
+	database = rdb.open_results_database(database_file)
+	n_imported = 0
+	for (new_exp_name, params) in experiments.items():
+		results_file = "./results/%s.json" % new_exp_name
+		if os.path.isfile(results_file):
+			rdb.write_run(database, exp_name, new_exp_name, params, hlp.read_json(results_file))
+			n_imported += 1
+	database.close()
+	print("Imported the results of %d/%d runs" % (n_imported, len(experiments)))
 
 
 if __name__ == "__main__":
 	parser = argparse.ArgumentParser()
 	parser.add_argument("-e", "--experiment", required=True, help="Path to the \"experiment\" input file")
+	parser.add_argument("-db", "--database", default=rdb.results_database_file, help="Path to the results database (default: %s)" % rdb.results_database_file)
+	parser.add_argument("-wj", "--write_json", action="store_true", help="Additionally store the results of each run as JSON file in ./results/")
+	parser.add_argument("-ij", "--import_json", action="store_true", help="Import the JSON results files of the experiment into the results database instead of running it")
 	args = parser.parse_args()
 	# Load the experiment file
 	experiment = hlp.read_json(args.experiment)
-	# Run the experiment
-	run_experiment(experiment)
+	# Run the experiment or import its results
+	if args.import_json:
+		import_json_results(experiment, database_file = args.database)
+	else:
+		run_experiment(experiment, write_json = args.write_json, database_file = args.database)
 				
 			
 	
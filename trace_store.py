@@ -0,0 +1,212 @@
+# Import python libraries
+import os
+import sys
+import json
+import shutil
+import argparse
+import itertools
+import numpy as np
+
+# Import RapidChiplet files
+import helpers as hlp
+
+# Columnar trace store: A trace is stored as a directory with three NumPy .npy files that are memory-mapped when read,
+# i.e., only the parts of the trace that are accessed are loaded and traces that are larger than the memory can be used.
+# - packets.npy: Structured array with one entry per packet (see trace_packet_dtype)
+# - reverse_dependency_offsets.npy: The reverse dependencies of packet i are reverse_dependencies[offsets[i]:offsets[i+1]]
+# - reverse_dependencies.npy: Ids of the packets that depend on a packet (concatenated for all packets)
+# In memory, a trace is a dictionary with these three arrays. JSON traces (a list of per-packet dictionaries) are
+# converted to this representation chunk by chunk. Packets without an "id" get their position in the trace as id.
+trace_packet_dtype = np.dtype([
+	("id", np.int64),
+	("injection_cycle", np.int64),
+	("source_chiplet", np.int32),
+	("source_unit", np.int32),
+	("destination_chiplet", np.int32),
+	("destination_unit", np.int32),
+	("size_in_flits", np.int32),
+])
+trace_store_arrays = ["packets", "reverse_dependency_offsets", "reverse_dependencies"]
+
+# Number of packets that are processed at once when processing a trace
+trace_chunk_size = 2 ** 16
+# Number of packets that are parsed at once when reading or converting a JSON trace
+trace_parse_chunk_size = 2 ** 14
+# Number of characters that are read at once when parsing a JSON trace
+trace_read_block_size = 2 ** 22
+
+# Iterate over the entries of a JSON list without reading the whole file
+def iterate_json_list(filename):
+	decoder = json.JSONDecoder()
+	file = open(filename, "r")
+	buffer = file.read(trace_read_block_size)
+	pos = len(buffer) - len(buffer.lstrip())
+	if buffer[pos:pos + 1] != "[":
+		print("ERROR: The trace \"%s\" is not a JSON list." % filename)
+		sys.exit(1)
+	pos += 1
+	at_end = False
+	while True:
+		# Skip whitespace and separators
+		while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+			pos += 1
+		if pos < len(buffer) and buffer[pos] == "]":
+			break
+		# Decode the next entry, read more of the file if the entry is incomplete
+		try:
+			if pos == len(buffer):
+				raise ValueError
+			(entry, pos) = decoder.raw_decode(buffer, pos)
+		except ValueError:
+			if at_end:
+				print("ERROR: The trace \"%s\" is not a valid JSON list." % filename)
+				sys.exit(1)
+			block = file.read(trace_read_block_size)
+			at_end = len(block) == 0
+			buffer = buffer[pos:] + block
+			pos = 0
+			continue
+		yield entry
+	file.close()
+
+# Convert a list of packets (dictionaries) to the columns of a trace. The first_id is used for packets without an id.
+def convert_packets_to_columns(packets, first_id):
+	n = len(packets)
+	columns = np.empty(n, dtype = trace_packet_dtype)
+	columns["id"] = np.fromiter((packet.get("id", first_id + i) for (i, packet) in enumerate(packets)), dtype = np.int64, count = n)
+	for field in trace_packet_dtype.names[1:]:
+		columns[field] = np.fromiter((packet[field] for packet in packets), dtype = trace_packet_dtype[field], count = n)
+	counts = np.fromiter((len(packet["reverse_dependencies"]) for packet in packets), dtype = np.int64, count = n)
+	dependencies = itertools.chain.from_iterable(packet["reverse_dependencies"] for packet in packets)
+	reverse_dependencies = np.fromiter(dependencies, dtype = np.int64, count = int(counts.sum()))
+	return (columns, counts, reverse_dependencies)
+
+# Iterate over the packets of a JSON trace (or a list of packets) in chunks of columns
+def iterate_packet_chunks(packets):
+	first_id = 0
+	while True:
+		chunk = list(itertools.islice(packets, trace_parse_chunk_size))
+		if len(chunk) == 0:
+			break
+		yield convert_packets_to_columns(chunk, first_id)
+		first_id += len(chunk)
+
+# Build a trace from chunks of columns
+def build_trace(chunks):
+	(packets, counts, reverse_dependencies) = ([], [np.zeros(1, dtype = np.int64)], [])
+	for (chunk_packets, chunk_counts, chunk_reverse_dependencies) in chunks:
+		packets.append(chunk_packets)
+		counts.append(chunk_counts)
+		reverse_dependencies.append(chunk_reverse_dependencies)
+	return {
+		"packets" : np.concatenate(packets) if len(packets) > 0 else np.empty(0, dtype = trace_packet_dtype),
+		"reverse_dependency_offsets" : np.cumsum(np.concatenate(counts)),
+		"reverse_dependencies" : np.concatenate(reverse_dependencies) if len(packets) > 0 else np.empty(0, dtype = np.int64),
+	}
+
+# Read a trace store (memory-mapped)
+def read_trace_store(directory):
+	trace = {}
+	for name in trace_store_arrays:
+		path = os.path.join(directory, name + ".npy")
+		if not os.path.isfile(path):
+			print("ERROR: The trace store \"%s\" does not contain \"%s.npy\"." % (directory, name))
+			sys.exit(1)
+		trace[name] = np.load(path, mmap_mode = "r")
+	return trace
+
+# Read a trace: Trace stores are memory-mapped, JSON traces and traces in design bundles are converted chunk by chunk
+def read_trace(filename):
+	if os.path.isdir(filename):
+		return read_trace_store(filename)
+	if filename.rpartition("#")[0].endswith(".npz"):
+		return build_trace(iterate_packet_chunks(iter(hlp.read_input(filename))))
+	return build_trace(iterate_packet_chunks(iterate_json_list(filename)))
+
+# Write a trace to a trace store
+def write_trace_store(directory, trace):
+	os.makedirs(directory, exist_ok = True)
+	for name in trace_store_arrays:
+		np.save(os.path.join(directory, name + ".npy"), trace[name])
+
+# Convert a JSON trace to a trace store. The trace is converted chunk by chunk, i.e., the JSON trace is never fully
+# loaded and traces that are larger than the memory can be converted.
+def convert_json_trace_to_store(json_file, directory):
+	os.makedirs(directory, exist_ok = True)
+	# Append the chunks to raw files
+	raw_files = {name : open(os.path.join(directory, name + ".raw"), "wb") for name in trace_store_arrays}
+	(n_packets, n_reverse_dependencies) = (0, 0)
+	np.zeros(1, dtype = np.int64).tofile(raw_files["reverse_dependency_offsets"])
+	for (packets, counts, reverse_dependencies) in iterate_packet_chunks(iterate_json_list(json_file)):
+		packets.tofile(raw_files["packets"])
+		(n_reverse_dependencies + np.cumsum(counts)).tofile(raw_files["reverse_dependency_offsets"])
+		reverse_dependencies.tofile(raw_files["reverse_dependencies"])
+		n_packets += len(packets)
+		n_reverse_dependencies += len(reverse_dependencies)
+	# Prepend the .npy header to the raw files
+	shapes = {"packets" : n_packets, "reverse_dependency_offsets" : n_packets + 1, "reverse_dependencies" : n_reverse_dependencies}
+	dtypes = {"packets" : trace_packet_dtype, "reverse_dependency_offsets" : np.dtype(np.int64), "reverse_dependencies" : np.dtype(np.int64)}
+	for name in trace_store_arrays:
+		raw_files[name].close()
+		raw_path = os.path.join(directory, name + ".raw")
+		file = open(os.path.join(directory, name + ".npy"), "wb")
+		header = {"descr" : np.lib.format.dtype_to_descr(dtypes[name]), "fortran_order" : False, "shape" : (shapes[name],)}
+		np.lib.format.write_array_header_1_0(file, header)
+		raw_file = open(raw_path, "rb")
+		shutil.copyfileobj(raw_file, file)
+		raw_file.close()
+		file.close()
+		os.remove(raw_path)
+
+# Iterate over a trace in chunks. Yields the position of the first packet, the packets, the reverse dependency offsets
+# (relative to the start of the reverse dependencies of the chunk), and the reverse dependencies of the chunk.
+def iterate_trace_chunks(trace):
+	packets = trace["packets"]
+	offsets = trace["reverse_dependency_offsets"]
+	for start in range(0, len(packets), trace_chunk_size):
+		end = min(start + trace_chunk_size, len(packets))
+		chunk_offsets = np.array(offsets[start:end + 1])
+		chunk_reverse_dependencies = np.array(trace["reverse_dependencies"][chunk_offsets[0]:chunk_offsets[-1]])
+		yield (start, np.array(packets[start:end]), chunk_offsets - chunk_offsets[0], chunk_reverse_dependencies)
+
+# Iterate over the reverse dependencies of a trace in chunks
+def iterate_reverse_dependency_chunks(trace):
+	reverse_dependencies = trace["reverse_dependencies"]
+	for start in range(0, len(reverse_dependencies), trace_chunk_size):
+		yield np.array(reverse_dependencies[start:start + trace_chunk_size])
+
+# Packet ids in ascending order and the corresponding packet positions (None if the packets are already sorted by id)
+def get_sorted_packet_ids(trace):
+	ids = np.ascontiguousarray(trace["packets"]["id"])
+	starts = range(0, len(ids), trace_chunk_size)
+	if all(np.all(np.diff(ids[max(start - 1, 0):start + trace_chunk_size]) >= 0) for start in starts):
+		return (ids, None)
+	order = np.argsort(ids, kind = "stable")
+	return (ids[order], order)
+
+# Positions of the packets with the given ids (-1 for ids that do not exist)
+def get_packet_positions(sorted_ids, order, ids):
+	if len(sorted_ids) == 0:
+		return np.full(len(ids), -1, dtype = np.int64)
+	positions = np.minimum(np.searchsorted(sorted_ids, ids), len(sorted_ids) - 1)
+	found = sorted_ids[positions] == ids
+	positions = positions if order is None else order[positions]
+	return np.where(found, positions, -1)
+
+# Number of packets that each packet depends on (i.e., how often its id occurs as a reverse dependency)
+def get_dependency_counts(trace):
+	(sorted_ids, order) = get_sorted_packet_ids(trace)
+	counts = np.zeros(len(sorted_ids), dtype = np.int64)
+	for reverse_dependencies in iterate_reverse_dependency_chunks(trace):
+		positions = get_packet_positions(sorted_ids, order, reverse_dependencies)
+		counts += np.bincount(positions[positions >= 0], minlength = len(counts))
+	return counts
+
+if __name__ == "__main__":
+	# Read command line arguments
+	parser = argparse.ArgumentParser()
+	parser.add_argument("-if", "--input_file", required = True, help = "Path to the JSON trace that is converted")
+	parser.add_argument("-od", "--output_directory", required = True, help = "Path to the trace store that is created (directory)")
+	args = parser.parse_args()
+	# Convert the trace
+	convert_json_trace_to_store(args.input_file, args.output_directory)
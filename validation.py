@@ -1,9 +1,12 @@
 # Import python libraries
-import sys
 import math
+import numpy as np
 
 # Import RapidChiplet files
 import helpers as hlp
+import trace_store as trs
+import compact_routing_table as crt
+import ici_core as icc
 
 # Print validation error 
 def print_validation_error(message, args):
@@ -110,7 +113,7 @@ def validate_packaging(inputs):
 	# If the link_latency_type is function, the function must be valid
 	if packaging["link_latency_type"] == "function":
 		try:
-			tmp = int(math.ceil(eval(packaging["link_latency"])(3)))
+			tmp = int(math.ceil(hlp.compile_packaging_function(packaging["link_latency"])(3)))
 		except:
 			msg = "Invalid link latency function \"%s\". Unable to evaluate function."
 			args = (packaging["link_latency"], )
@@ -125,7 +128,7 @@ def validate_packaging(inputs):
 	# If the link_power_type is function, the function must be valid
 	if packaging["link_power_type"] == "function":
 		try:	
-			tmp = int(math.ceil(eval(packaging["link_power"])(3)))
+			tmp = int(math.ceil(hlp.compile_packaging_function(packaging["link_power"])(3)))
 		except:
 			msg = "Invalid link power function \"%s\". Unable to evaluate function."
 			args = (packaging["link_power"], )
@@ -187,31 +190,20 @@ def validate_placement(inputs):
 	print("Validating placement...", end = "") if inputs["verbose"] else None
 	# Count the number of errors
 	errors = 0
-	# Iterate over all chiplets to check for overlapping
-	for (cid1, cdesc1) in enumerate(placement["chiplets"]):
-		chiplet_1 = chiplets[cdesc1["name"]]
-		# Rotate the chiplet if needed
-		chiplet_1 = hlp.rotate_chiplet(chiplet_1, cdesc1["rotation"])
-		# Extract info
-		(x1,y1) = (cdesc1["position"]["x"], cdesc1["position"]["y"])				# x and y position
-		(w1,h1) = (chiplet_1["dimensions"]["x"], chiplet_1["dimensions"]["y"])		# with and height	
-		(l1,r1,t1,b1) = (x1, x1 + w1, y1, y1 + h1)									# left, right, top, bottom
-		# Iterate over all other chiplets
-		for cid2 in range(cid1+1, len(placement["chiplets"])):
-			cdesc2 = placement["chiplets"][cid2]
-			chiplet_2 = chiplets[cdesc2["name"]]
-			# Rotate the chiplet if needed
-			chiplet_2 = hlp.rotate_chiplet(chiplet_2, cdesc2["rotation"])
-			# Extract info
-			(x2,y2) = (cdesc2["position"]["x"], cdesc2["position"]["y"])			# x and y position
-			(w2,h2) = (chiplet_2["dimensions"]["x"], chiplet_2["dimensions"]["y"])	# with and height
-			(l2,r2,t2,b2) = (x2, x2 + w2, y2, y2 + h2)								# left, right, top, bottom
-			# Check for overlap
-			if not ((r1 <= l2) or (r2 <= l1) or (t1 <= b2) or (t2 <= b1)):
-				msg = "Chiplets %d and %d are overlapping"
-				args = (cid1, cid2)
-				print_validation_error(msg, args)
-				errors += 1
+	# Rotated dimensions of all chiplets
+	placement_geometry = hlp.compute_placement_geometry(chiplets, placement)
+	(x, y) = (placement_geometry["chiplet_positions"][:,0], placement_geometry["chiplet_positions"][:,1])			# x and y position
+	(w, h) = (placement_geometry["chiplet_dimensions"][:,0], placement_geometry["chiplet_dimensions"][:,1])		# with and height
+	(l, r, t, b) = (x, x + w, y, y + h)																			# left, right, top, bottom
+	# Check all pairs of chiplets for overlap
+	for cid1 in range(len(placement["chiplets"])):
+		cid2 = np.arange(cid1 + 1, len(placement["chiplets"]))
+		overlapping = ~((r[cid1] <= l[cid2]) | (r[cid2] <= l[cid1]) | (t[cid1] <= b[cid2]) | (t[cid2] <= b[cid1]))
+		for cid2 in cid2[overlapping]:
+			msg = "Chiplets %d and %d are overlapping"
+			args = (cid1, cid2)
+			print_validation_error(msg, args)
+			errors += 1
 	# Print validation result
 	print(" completed with %d errors." % errors) if inputs["verbose"] else None
 	if errors > 0:
@@ -227,108 +219,126 @@ def validate_routing_table(inputs):
 	hlp.read_required_inputs(inputs, required_inputs)
 	chiplets = inputs["chiplets"]
 	placement = inputs["placement"]
-	routing_table_ = inputs["routing_table"]
-	routing_table_type = routing_table_["type"]
-	routing_table = routing_table_["table"]
+	routing_table = crt.as_compact_routing_table(inputs["routing_table"])
 	topology = inputs["topology"]
 	print("Validating routing table...", end = "") if inputs["verbose"] else None
+	(n_chiplets, n_irouters) = (len(placement["chiplets"]), len(placement["interposer_routers"]))
+	extended = routing_table.routing_table_type == "extended"
+	# Whether a (node, destination)-pair has an entry in the routing table
+	has_destination = routing_table.has_destination if extended else (routing_table.next_hops != crt.no_entry)
 	# Count the number of errors
 	errors = 0
 	# Check that all chiplets contain a next-hop entry for all possible destinations	
 	for (cid1, cdesc1) in enumerate(placement["chiplets"]):
+		nid = crt.get_node_id(routing_table, ("chiplet", cid1))
 		# Check that the chiplet contains a routing table entry
-		if ("chiplet", cid1) not in routing_table:
+		if nid < 0 or not routing_table.has_node[nid]:
 			msg = "Chiplet %d does not contain a routing table entry."
 			args = (cid1, )
 			print_validation_error(msg, args)
 			errors += 1
 		else:
 			# Check that the routing table entry contains all possible destinations
-			for (cid2, cdesc2) in enumerate(placement["chiplets"]):
-				if cid1 != cid2 and ("chiplet", cid2) not in routing_table[("chiplet", cid1)]:
-					msg = "Chiplet %d does not contain a routing table entry for destination chiplet %d."
-					args = (cid1, cid2)
-					print_validation_error(msg, args)
-					errors += 1
+			present = np.zeros(n_chiplets, dtype = bool)
+			present[:routing_table.n_chiplets] = has_destination[nid, :n_chiplets]
+			present[cid1] = True
+			for cid2 in np.flatnonzero(~present).tolist():
+				msg = "Chiplet %d does not contain a routing table entry for destination chiplet %d."
+				args = (cid1, cid2)
+				print_validation_error(msg, args)
+				errors += 1
 	# Check that all interposer routers contain a next-hop entry for all possible destinations
 	for (rid, irouter) in enumerate(placement["interposer_routers"]):
+		nid = crt.get_node_id(routing_table, ("irouter", rid))
 		# Check that the interposer router contains a routing table entry
-		if ("irouter", rid) not in routing_table:
+		if nid < 0 or not routing_table.has_node[nid]:
 			msg = "Interposer router %d does not contain a routing table entry."
 			args = (rid, )
 			print_validation_error(msg, args)
 			errors += 1
 		else:
 			# Check that the routing table entry contains all possible destinations
-			for (cid, cdesc) in enumerate(placement["chiplets"]):
-				if ("chiplet", cid) not in routing_table[("irouter", rid)]:
-					msg = "Interposer router %d does not contain a routing table entry for destination chiplet %d."
-					args = (rid, cid)
-					print_validation_error(msg, args)
-					errors += 1
+			present = np.zeros(n_chiplets, dtype = bool)
+			present[:routing_table.n_chiplets] = has_destination[nid, :n_chiplets]
+			for cid in np.flatnonzero(~present).tolist():
+				msg = "Interposer router %d does not contain a routing table entry for destination chiplet %d."
+				args = (rid, cid)
+				print_validation_error(msg, args)
+				errors += 1
+	# Number of links in the topology between each pair of nodes (identified by min-id * n_nodes + max-id)
+	n_nodes = routing_table.n_nodes
+	endpoints = [[crt.get_node_id(routing_table, (link[ep]["type"], link[ep]["outer_id"])) for link in topology] for ep in ["ep1", "ep2"]]
+	(ep1, ep2) = (np.array(endpoints[0], dtype = np.int64), np.array(endpoints[1], dtype = np.int64))
+	known = (ep1 >= 0) & (ep2 >= 0)
+	(link_keys, link_counts) = np.unique(np.minimum(ep1, ep2)[known] * n_nodes + np.maximum(ep1, ep2)[known], return_counts = True)
+	(link_keys, link_counts) = (np.append(link_keys, np.iinfo(np.int64).max), np.append(link_counts, 0))
+	def count_links(nid, nxts):
+		keys = np.minimum(nid, nxts) * n_nodes + np.maximum(nid, nxts)
+		pos = np.searchsorted(link_keys, keys)
+		return np.where(link_keys[pos] == keys, link_counts[pos], 0)
+	# Whether a node-id is a valid chiplet or interposer router
+	valid_nodes = np.zeros(n_nodes, dtype = bool)
+	valid_nodes[:min(routing_table.n_chiplets, n_chiplets)] = True
+	valid_nodes[routing_table.n_chiplets:routing_table.n_chiplets + min(routing_table.n_irouters, n_irouters)] = True
 	# Check that the routing table does not contain entries that are not valid
-	max_chiplet_id = len(placement["chiplets"]) - 1
-	max_irouter_id = len(placement["interposer_routers"]) - 1
-	for node1 in routing_table:
+	for nid in np.flatnonzero(routing_table.has_node).tolist():
+		node1 = routing_table.get_node(nid)
 		# Check that the source node is valid
-		if node1[0] == "chiplet" and node1[1] > max_chiplet_id:
+		if node1[0] == "chiplet" and not valid_nodes[nid]:
 			msg = "Routing table contains an invalid source chiplet id %d."
 			args = (node1[1], )
 			print_validation_error(msg, args)
 			errors += 1
-		elif node1[0] == "irouter" and node1[1] > max_irouter_id:
+		elif node1[0] == "irouter" and not valid_nodes[nid]:
 			msg = "Routing table contains an invalid source interposer router id %d."
 			args = (node1[1], )
 			print_validation_error(msg, args)
 			errors += 1
-		# Check that the destination node is valid
-		for node2 in routing_table[node1]:
-			if node2[0] == "chiplet" and node2[1] > max_chiplet_id:
+		# Next-hop entries of this node (only if the source and destination are different and there is a next hop)
+		if extended:
+			row_ptr = routing_table.entry_ptr[nid * routing_table.n_chiplets:(nid + 1) * routing_table.n_chiplets + 1]
+			entry_dsts = np.repeat(np.arange(routing_table.n_chiplets), np.diff(row_ptr))
+			entry_nxts = routing_table.entry_next[row_ptr[0]:row_ptr[-1]].astype(np.int64)
+		else:
+			entry_dsts = np.arange(routing_table.n_chiplets)
+			entry_nxts = routing_table.next_hops[nid].astype(np.int64)
+		entry_valid = (entry_nxts >= 0) & (entry_dsts != nid)
+		entry_errors = entry_valid & ((~valid_nodes[np.maximum(entry_nxts, 0)]) | (count_links(nid, entry_nxts) != 1))
+		# Check only the destinations with errors one by one
+		dst_errors = has_destination[nid] & (np.arange(routing_table.n_chiplets) >= n_chiplets)
+		dst_errors[entry_dsts[entry_errors]] = True
+		for dst in np.flatnonzero(dst_errors).tolist():
+			# Check that the destination node is valid
+			if dst >= n_chiplets:
 				msg = "Routing table contains an invalid destination chiplet id %d."
-				args = (node2[1], )
+				args = (dst, )
 				print_validation_error(msg, args)
 				errors += 1
-			elif node2[0] == "irouter" and node2[1] > max_irouter_id:
-				msg = "Routing table contains an invalid destination interposer router id %d."
-				args = (node2[1], )
-				print_validation_error(msg, args)
-				errors += 1
-			# Do the following checks only if the source and destination are different
-			if node1 != node2:
-				# Check that the next-hop entry is valid	
-				if routing_table_type == "default":
-					possible_next_nodes = [routing_table[node1][node2]]
-				elif routing_table_type == "extended":
-					possible_next_nodes = [routing_table[node1][node2][prev] for prev in routing_table[node1][node2]]
-				else:
-					print("ERROR: Invalid routing table type \"%s\"." % routing_table_type)
-					sys.exit(1)
-				for node3 in possible_next_nodes:
-					if node3[0] == "chiplet" and node3[1] > max_chiplet_id:
-						msg = "Routing table contains an invalid next-hop chiplet id %d."
-						args = (node3[1], )
-						print_validation_error(msg, args)
-						errors += 1
-					elif node3[0] == "irouter" and node3[1] > max_irouter_id:
-						msg = "Routing table contains an invalid next-hop interposer router id %d."
-						args = (node3[1], )
-						print_validation_error(msg, args)
-						errors += 1
-					# Check that the link is present in the topology
-					cand_links = [l for l in topology if (l["ep1"]["type"] == node1[0] and l["ep1"]["outer_id"] == node1[1] and \
-														  l["ep2"]["type"] == node3[0] and l["ep2"]["outer_id"] == node3[1]) or \
-														 (l["ep1"]["type"] == node3[0] and l["ep1"]["outer_id"] == node3[1] and \
-														  l["ep2"]["type"] == node1[0] and l["ep2"]["outer_id"] == node1[1])]
-					if len(cand_links) == 0:
-						msg = "Routing table contains a next-hop entry for a link that is not present in the topology."
-						msg += "Link: %s -> %s"
-						print_validation_error(msg, (node1, node3))
-						errors += 1
-					elif len(cand_links) > 1:
-						msg = "Routing table contains a next-hop entry for a link that is present multiple times in the topology."
-						msg += "Link: %s -> %s"
-						print_validation_error(msg, (node1, node3))
-						errors += 1
+			# Check that the next-hop entry is valid
+			for nxt in entry_nxts[(entry_dsts == dst) & entry_valid].tolist():
+				node3 = routing_table.get_node(nxt)
+				if node3[0] == "chiplet" and not valid_nodes[nxt]:
+					msg = "Routing table contains an invalid next-hop chiplet id %d."
+					args = (node3[1], )
+					print_validation_error(msg, args)
+					errors += 1
+				elif node3[0] == "irouter" and not valid_nodes[nxt]:
+					msg = "Routing table contains an invalid next-hop interposer router id %d."
+					args = (node3[1], )
+					print_validation_error(msg, args)
+					errors += 1
+				# Check that the link is present in the topology
+				n_cand_links = count_links(nid, np.array([nxt]))[0]
+				if n_cand_links == 0:
+					msg = "Routing table contains a next-hop entry for a link that is not present in the topology."
+					msg += "Link: %s -> %s"
+					print_validation_error(msg, (node1, node3))
+					errors += 1
+				elif n_cand_links > 1:
+					msg = "Routing table contains a next-hop entry for a link that is present multiple times in the topology."
+					msg += "Link: %s -> %s"
+					print_validation_error(msg, (node1, node3))
+					errors += 1
 	# Print validation result
 	print(" completed with %d errors." % errors) if inputs["verbose"] else None
 	if errors > 0:
@@ -528,6 +538,60 @@ def validate_traffic_by_chiplet(inputs):
 
 
 
+# The declared symmetries must be permutations of the chiplets that are automorphisms of the topology and under which
+# the routing is invariant (RapidChiplet relies on this without checking it when evaluating symmetric designs).
+def validate_symmetry(inputs):
+	if not inputs["validate"]:
+		return
+	# Read the required inputs
+	required_inputs = ["chiplets", "placement", "routing_table", "symmetry", "topology"]
+	hlp.read_required_inputs(inputs, required_inputs)
+	chiplets = inputs["chiplets"]
+	placement = inputs["placement"]
+	routing_table = inputs["routing_table"]
+	symmetry = inputs["symmetry"]
+	topology = inputs["topology"]
+	print("Validating symmetry...", end = "") if inputs["verbose"] else None
+	n_chiplets = len(placement["chiplets"])
+	# Count the number of errors
+	errors = 0
+	# Declared symmetries are only supported for designs without interposer-routers
+	if len(placement["interposer_routers"]) > 0:
+		msg = "Declared symmetries are only supported for designs without interposer-routers, but the design has %d interposer-routers."
+		args = (len(placement["interposer_routers"]), )
+		print_validation_error(msg, args)
+		errors += 1
+	# Check that all generators are permutations of the chiplets
+	generators = []
+	for (gid, generator) in enumerate(symmetry["generators"]):
+		if sorted(generator) != list(range(n_chiplets)):
+			msg = "Generator %d of the symmetry is not a permutation of the %d chiplets."
+			args = (gid, n_chiplets)
+			print_validation_error(msg, args)
+			errors += 1
+		else:
+			generators.append((gid, np.array(generator, dtype = np.int64)))
+	# Check that the generators are automorphisms of the topology and that the routing is invariant under them
+	if errors == 0:
+		core = icc.construct_ici_core(chiplets, placement, topology)
+		compiled_routing_table = icc.compile_routing_table(core, routing_table)
+		for (gid, node_map) in generators:
+			link_map = icc.get_automorphism_link_map(core, node_map)
+			if link_map is None:
+				msg = "Generator %d of the symmetry is not an automorphism of the topology."
+				args = (gid, )
+				print_validation_error(msg, args)
+				errors += 1
+			elif not icc.is_routing_invariant(core, compiled_routing_table, node_map, link_map):
+				msg = "The routing table is not invariant under generator %d of the symmetry."
+				args = (gid, )
+				print_validation_error(msg, args)
+				errors += 1
+	# Print validation result
+	print(" completed with %d errors." % errors) if inputs["verbose"] else None
+	if errors > 0:
+		print("Note that RapidChiplet might produce incorrect results or crash when running with invalid inputs.")
+
 # TODO: The BookSim configuration is only partially validated.
 def validate_booksim_config(inputs):
 	if not inputs["validate"]:
@@ -560,45 +624,54 @@ def validate_trace(inputs):
 	placement = inputs["placement"]
 	trace = inputs["trace"]
 	print("Validating trace...", end = "") if inputs["verbose"] else None
+	# Number of units per chiplet (invalid chiplets have no units)
+	unit_counts = np.array([chiplets[chiplet_desc["name"]]["unit_count"] for chiplet_desc in placement["chiplets"]] + [0], dtype = np.int64)
+	n_chiplets = len(placement["chiplets"])
 	# Count the number of errors
 	errors = 0
-	for packet in trace:
-		# Check that the source chiplets are valid
-		if packet["source_chiplet"] >= len(placement["chiplets"]) or packet["source_chiplet"] < 0:
-			msg = "Invalid source chiplet id %d in trace. The maximum chiplet id is %d."
-			args = (packet["source_chiplet"], )
-			print_validation_error(msg, args)
-			errors += 1
-		# Check that the destination unit is valid
-		if packet["destination_chiplet"] >= len(placement["chiplets"]) or packet["destination_chiplet"] < 0:
-			msg = "Invalid destination chiplet id %d in trace. The maximum chiplet id is %d."
-			args = (packet["destination_chiplet"], )
-			print_validation_error(msg, args)
-			errors += 1
-		# Check that the source unit is valid
-		if packet["source_unit"] >= chiplets[placement["chiplets"][packet["source_chiplet"]]["name"]]["unit_count"] or packet["source_unit"] < 0:
-			msg = "Invalid source unit id %d in trace. The maximum unit id is %d."
-			args = (packet["source_unit"], )
-			print_validation_error(msg, args)
-			errors += 1
-		# Check that the destination unit is valid
-		if packet["destination_unit"] >= chiplets[placement["chiplets"][packet["destination_chiplet"]]["name"]]["unit_count"] or packet["destination_unit"] < 0:
-			msg = "Invalid destination unit id %d in trace. The maximum unit id is %d."
-			args = (packet["destination_unit"], )
-			print_validation_error(msg, args)
-			errors += 1
+	for (_, packets, _, _) in trs.iterate_trace_chunks(trace):
+		# Find packets with invalid chiplets or units (vectorized), only these packets are checked one by one
+		source_chiplets = np.where((packets["source_chiplet"] >= 0) & (packets["source_chiplet"] < n_chiplets), packets["source_chiplet"], n_chiplets)
+		destination_chiplets = np.where((packets["destination_chiplet"] >= 0) & (packets["destination_chiplet"] < n_chiplets), packets["destination_chiplet"], n_chiplets)
+		valid = (packets["source_unit"] >= 0) & (packets["source_unit"] < unit_counts[source_chiplets])
+		valid &= (packets["destination_unit"] >= 0) & (packets["destination_unit"] < unit_counts[destination_chiplets])
+		for packet in packets[~valid].tolist():
+			packet = dict(zip(trs.trace_packet_dtype.names, packet))
+			# Check that the source chiplets are valid
+			if packet["source_chiplet"] >= n_chiplets or packet["source_chiplet"] < 0:
+				msg = "Invalid source chiplet id %d in trace. The maximum chiplet id is %d."
+				args = (packet["source_chiplet"], n_chiplets - 1)
+				print_validation_error(msg, args)
+				errors += 1
+			# Check that the destination unit is valid
+			if packet["destination_chiplet"] >= n_chiplets or packet["destination_chiplet"] < 0:
+				msg = "Invalid destination chiplet id %d in trace. The maximum chiplet id is %d."
+				args = (packet["destination_chiplet"], n_chiplets - 1)
+				print_validation_error(msg, args)
+				errors += 1
+			# Check that the source unit is valid
+			if 0 <= packet["source_chiplet"] < n_chiplets and not 0 <= packet["source_unit"] < unit_counts[packet["source_chiplet"]]:
+				msg = "Invalid source unit id %d in trace. The maximum unit id is %d."
+				args = (packet["source_unit"], unit_counts[packet["source_chiplet"]] - 1)
+				print_validation_error(msg, args)
+				errors += 1
+			# Check that the destination unit is valid
+			if 0 <= packet["destination_chiplet"] < n_chiplets and not 0 <= packet["destination_unit"] < unit_counts[packet["destination_chiplet"]]:
+				msg = "Invalid destination unit id %d in trace. The maximum unit id is %d."
+				args = (packet["destination_unit"], unit_counts[packet["destination_chiplet"]] - 1)
+				print_validation_error(msg, args)
+				errors += 1
 	# Check that the reverse dependencies are valid
-	valid_packet_ids = sorted([packet["id"] for packet in trace])
-	all_rev_dep_ids = sorted(list(set([rev_dep for packet in trace for rev_dep in packet["reverse_dependencies"]])))
-	val_ptr = 0
-	for rev_ptr in range(len(all_rev_dep_ids)):
-		while valid_packet_ids[val_ptr] < all_rev_dep_ids[rev_ptr]:
-			val_ptr += 1
-		if valid_packet_ids[val_ptr] != all_rev_dep_ids[rev_ptr]:
-			msg = "Invalid reverse dependency %d in trace. No packet with this id exists."
-			args = (all_rev_dep_ids[rev_ptr], )
-			print_validation_error(msg, args)
-			errors += 1
+	(sorted_ids, order) = trs.get_sorted_packet_ids(trace)
+	invalid_rev_dep_ids = set()
+	for reverse_dependencies in trs.iterate_reverse_dependency_chunks(trace):
+		positions = trs.get_packet_positions(sorted_ids, order, reverse_dependencies)
+		invalid_rev_dep_ids.update(reverse_dependencies[positions < 0].tolist())
+	for rev_dep_id in sorted(invalid_rev_dep_ids):
+		msg = "Invalid reverse dependency %d in trace. No packet with this id exists."
+		args = (rev_dep_id, )
+		print_validation_error(msg, args)
+		errors += 1
 	# Print validation result
 	print(" completed with %d errors." % errors) if inputs["verbose"] else None
 	if errors > 0:
@@ -616,4 +689,20 @@ validation_functions = {
 	"traffic_by_chiplet": validate_traffic_by_chiplet,
 	"trace": validate_trace,
 	"booksim_config": validate_booksim_config,
+	"symmetry": validate_symmetry,
+}
+
+# Inputs that the validation of each input reads in addition to the input itself
+validation_dependencies = {
+	"chiplets": ["technologies"],
+	"packaging": ["technologies"],
+	"placement": ["chiplets"],
+	"routing_table": ["chiplets", "placement", "topology"],
+	"technologies": [],
+	"topology": ["chiplets", "placement"],
+	"traffic_by_unit": ["chiplets", "placement"],
+	"traffic_by_chiplet": ["placement"],
+	"trace": ["chiplets", "placement"],
+	"booksim_config": [],
+	"symmetry": ["chiplets", "placement", "routing_table", "topology"],
 }
@@ -10,6 +10,7 @@ import matplotlib.patches as ptch
 # Import RapidChiplet files
 import global_config as cfg
 import helpers as hlp
+import compact_routing_table as crt
 
 # Visualize a single chiplet
 def visualize_design(inputs, design_name, show_chiplet_id = False, show_phy_id = False):
@@ -25,29 +26,32 @@ def visualize_design(inputs, design_name, show_chiplet_id = False, show_phy_id =
 	plt.axis('equal')
 	(maxx, maxy) = (0,0)
 	phylocs = {}
+	# Rotated chiplet geometries and absolute PHY positions
+	placement_geometry = hlp.compute_placement_geometry(chiplets, placement)
 	# Iterate through chiplets
 	for (cid, chiplet_desc) in enumerate(placement["chiplets"]):
 		chiplet = chiplets[chiplet_desc["name"]]
 		pos = (chiplet_desc["position"]["x"], chiplet_desc["position"]["y"])
-		# Rotate the chiplet if needed
-		chiplet = hlp.rotate_chiplet(chiplet, chiplet_desc["rotation"])
+		(width, height) = placement_geometry["chiplet_dimensions"][cid]
 		# Draw the chiplet
 		col = cfg.chiplet_colors[chiplet["type"]] if chiplet["type"] in cfg.chiplet_colors else "#CCCCCC"
-		ax.add_patch(ptch.Rectangle(pos, chiplet["dimensions"]["x"], chiplet["dimensions"]["y"], edgecolor = "#000000", facecolor = col))
+		ax.add_patch(ptch.Rectangle(pos, width, height, edgecolor = "#000000", facecolor = col))
 		if show_chiplet_id:
-			ax.text(pos[0] + chiplet["dimensions"]["x"] / 2, pos[1] + chiplet["dimensions"]["y"] / 2, str(cid), ha = "center", va = "center", fontsize = 12, fontweight = "bold")
+			ax.text(pos[0] + width / 2, pos[1] + height / 2, str(cid), ha = "center", va = "center", fontsize = 12, fontweight = "bold")
 		# Update the canvas size
-		maxx = max(maxx, pos[0] + chiplet["dimensions"]["x"])
-		maxy = max(maxy, pos[1] + chiplet["dimensions"]["y"])
+		maxx = max(maxx, pos[0] + width)
+		maxy = max(maxy, pos[1] + height)
 		# Iterate through the chiplet's phys
 		radius = 0.3
-		for (pid, phy) in enumerate(chiplet["phys"]):
+		phy_offset = placement_geometry["phy_offsets"][cid]
+		for pid in range(len(chiplet["phys"])):
+			(phyx, phyy) = placement_geometry["phy_positions"][phy_offset + pid]
 			# Draw PHY
-			ax.add_patch(ptch.Circle((pos[0] + phy["x"], pos[1] + phy["y"]), radius = radius, edgecolor = "#000000", facecolor = "none"))
+			ax.add_patch(ptch.Circle((phyx, phyy), radius = radius, edgecolor = "#000000", facecolor = "none"))
 			if show_phy_id:
-				ax.text(pos[0] + phy["x"], pos[1] + phy["y"], str(pid), ha = "center", va = "center", fontsize = 6)
+				ax.text(phyx, phyy, str(pid), ha = "center", va = "center", fontsize = 6)
 			# Store PHY location (needed to draw links)
-			phylocs[(cid, pid)] = (pos[0] + phy["x"], pos[1] + phy["y"])
+			phylocs[(cid, pid)] = (phyx, phyy)
 	# Iterate trough interposer-routers
 	for (rid, irouter) in enumerate(placement["interposer_routers"]):
 		# Draw interposer-routers
@@ -145,7 +149,7 @@ if __name__ == "__main__":
 	# Check if the design_file argument was provided
 	if args.design_file != None:
 		# Read the design file
-		design = hlp.read_json(filename = args.design_file)
+		design = hlp.read_design(filename = args.design_file)
 		inputs = {"design":design,"verbose":True,"validate":True}
 		design_name = args.design_file.split("/")[-1].split(".")[0]
 		# Visualize the design
@@ -161,7 +165,7 @@ if __name__ == "__main__":
 			sys.exit()
 	elif args.routing_table_file != None:
 		# Read the routing table file
-		routing_table_ = hlp.read_json(filename = args.routing_table_file)
+		routing_table_ = crt.read_routing_table(args.routing_table_file)
 		routing_table_type = routing_table_["type"]
 		routing_table = routing_table_["table"]
 		# Visualize the routing tables